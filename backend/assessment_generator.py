@@ -1,10 +1,12 @@
 import os
 import json
-from google import genai
-from google.genai import types
+import logging
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field
 from pathlib import Path
+from llm import generate_json, LazyClient
+
+logger = logging.getLogger(__name__)
 
 # --- Data models ---
 class SelectedOptions(BaseModel):
@@ -35,15 +37,9 @@ class Assessment(BaseModel):
 
 # --- Assessment Generator ---
 class AssessmentGenerator:
-    """Generate self-assessment questions using Gemini 3 Preview."""
+    """Generate self-assessment questions using Gemini."""
 
-    def __init__(self):
-        try:
-            self.client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
-            self.model_name = "gemini-3-flash-preview" 
-        except Exception as e:
-            print(f"Error initializing Gemini client: {e}")
-            raise e
+    client = LazyClient()
 
     def _load_prompt(self, filename) -> str:
         prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', filename)
@@ -60,22 +56,9 @@ class AssessmentGenerator:
         )
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[formatted_prompt],
-                config={
-                    'response_mime_type': 'application/json',
-                    'response_schema': Questions
-                }
-            )
-            
-            if response.text:
-                # print("DEBUG: Gemini Topic Response:", response.text)
-                return json.loads(response.text)
-            else:
-                raise ValueError("Empty response from Gemini")
+            return generate_json(self.client, "assessment_questions", Questions, contents=[formatted_prompt])
         except Exception as e:
-            print(f"Error generating quiz: {e}")
+            logger.error(f"Error generating quiz: {e}")
             return {"error": str(e)}
 
     def evaluate_quiz(self, subject: str, grade_level: str, results_input: List[dict]) -> List[Result]:
@@ -100,25 +83,12 @@ class AssessmentGenerator:
         )
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[formatted_prompt],
-                config={
-                    'response_mime_type': 'application/json',
-                    'response_schema': Assessment
-                }
-            )
-            
-            if response.text:
-                # print("DEBUG: Gemini Topic Response:", response.text)
-                return json.loads(response.text)
-            else:
-                raise ValueError("Empty response from Gemini")
+            return generate_json(self.client, "assessment_evaluation", Assessment, contents=[formatted_prompt])
         except Exception as e:
-            print(f"Error generating quiz: {e}")
+            logger.error(f"Error generating quiz: {e}")
             return {"error": str(e)}
 
     def save_to_file(self, questions: dict, filename: str = "assessment.json"):
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(questions, f, indent=2, ensure_ascii=False)
-        print(f"✓ Assessment saved to {filename}")
+        logger.info(f"Assessment saved to {filename}")
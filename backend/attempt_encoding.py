@@ -0,0 +1,194 @@
+import hashlib
+import json
+from typing import Dict, Any, List, Optional
+
+from storage import storage_save, storage_load
+
+# Immutable quiz snapshots keyed by storage filename. Snapshots never change
+# once written, so entries can be kept for the life of the process.
+_SNAPSHOT_CACHE: Dict[str, dict] = {}
+_SNAPSHOT_CACHE_MAX = 256
+
+
+def quiz_version_id(quiz: dict) -> str:
+    """Content hash identifying one version of a module quiz."""
+    payload = {
+        "title": quiz.get("title", ""),
+        "multipleChoice": quiz.get("multipleChoice", []),
+        "freeResponse": quiz.get("freeResponse", []),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def quiz_snapshot_filename(course_id: str, unit_number: int, version: str) -> str:
+    return f"{course_id}_module_quiz_{unit_number}_v{version}.json"
+
+
+def _cache_snapshot(filename: str, quiz: dict) -> None:
+    if len(_SNAPSHOT_CACHE) >= _SNAPSHOT_CACHE_MAX:
+        _SNAPSHOT_CACHE.pop(next(iter(_SNAPSHOT_CACHE)))
+    _SNAPSHOT_CACHE[filename] = quiz
+
+
+def save_quiz_snapshot(course_id: str, unit_number: int, quiz: dict) -> str:
+    """Persist an immutable copy of the quiz and return its version id."""
+    version = quiz_version_id(quiz)
+    filename = quiz_snapshot_filename(course_id, unit_number, version)
+    if filename not in _SNAPSHOT_CACHE:
+        snapshot = {k: v for k, v in quiz.items() if k != "quizVersion"}
+        storage_save(filename, snapshot)
+        _cache_snapshot(filename, snapshot)
+    return version
+
+
+def load_quiz_snapshot(course_id: str, unit_number: int, version: str) -> Optional[dict]:
+    """Load a quiz snapshot by version, served from memory after the first read."""
+    filename = quiz_snapshot_filename(course_id, unit_number, version)
+    cached = _SNAPSHOT_CACHE.get(filename)
+    if cached is not None:
+        return cached
+    quiz = storage_load(filename)
+    if quiz is not None:
+        _cache_snapshot(filename, quiz)
+    return quiz
+
+
+def ensure_quiz_version(course_id: str, unit_number: int, quiz: dict) -> str:
+    """Return the quiz's version id, snapshotting quizzes saved before versioning."""
+    version = quiz.get("quizVersion")
+    if version:
+        return version
+    return save_quiz_snapshot(course_id, unit_number, quiz)
+
+
+def encode_attempt(quiz_version: str, mcq_results: List[dict],
+                   frq_evaluations: List[dict]) -> Dict[str, Any]:
+    """
+    Compact columns for a quiz_attempts row.
+
+    Question text, options and explanations live in the quiz snapshot; the
+    row only keeps what the learner did and how it was scored.
+    """
+    return {
+        "quiz_version": quiz_version,
+        "mcq_selected": [r["selectedIndex"] for r in mcq_results],
+        "mcq_correct": [r["correct"] for r in mcq_results],
+        "frq_scores": [e.get("score", 0) for e in frq_evaluations],
+        "frq_feedback": [e.get("feedback", "") for e in frq_evaluations],
+    }
+
+
+def rehydrate_attempt(row: dict, quiz: Optional[dict]) -> Dict[str, Any]:
+    """
+    Rebuild detailed mcqResults / frqEvaluations for an attempt row.
+
+    Rows written before the compact encoding still carry the full JSONB
+    results and are returned as stored.
+    """
+    if row.get("mcq_results") is not None:
+        return {
+            "mcqResults": row.get("mcq_results") or [],
+            "frqEvaluations": row.get("frq_evaluations") or [],
+            "frqQuestions": [],
+        }
+    if quiz is None:
+        raise ValueError(f"Quiz version {row.get('quiz_version')} not found")
+
+    mcq_questions = quiz.get("multipleChoice", [])
+    selected = row.get("mcq_selected") or []
+    correct = row.get("mcq_correct") or []
+    mcq_results = []
+    for i, q in enumerate(mcq_questions):
+        mcq_results.append({
+            "question": q["question"],
+            "options": q["options"],
+            "selectedIndex": selected[i] if i < len(selected) else -1,
+            "correctAnswerIndex": q["correctAnswerIndex"],
+            "explanation": q["explanation"],
+            "correct": correct[i] if i < len(correct) else False,
+            "relatedSubtopic": q.get("relatedSubtopic", "")
+        })
+
+    frq_questions = quiz.get("freeResponse", [])
+    feedback = row.get("frq_feedback") or []
+    frq_evaluations = []
+    for i, score in enumerate(row.get("frq_scores") or []):
+        max_points = frq_questions[i].get("maxPoints", 3) if i < len(frq_questions) else 3
+        frq_evaluations.append({
+            "questionIndex": i,
+            "score": score,
+            "maxPoints": max_points,
+            "feedback": feedback[i] if i < len(feedback) else ""
+        })
+
+    return {
+        "mcqResults": mcq_results,
+        "frqEvaluations": frq_evaluations,
+        "frqQuestions": frq_questions,
+    }
+
+
+def snapshot_from_legacy_row(row: dict) -> dict:
+    """Reconstruct a quiz snapshot from the JSONB results of a legacy row."""
+    multiple_choice = [{
+        "question": r["question"],
+        "options": r["options"],
+        "correctAnswerIndex": r["correctAnswerIndex"],
+        "explanation": r.get("explanation", ""),
+        "relatedSubtopic": r.get("relatedSubtopic", "")
+    } for r in row.get("mcq_results") or []]
+    # Legacy rows never stored the FRQ prompts, only their evaluations.
+    free_response = [{
+        "question": "",
+        "sampleAnswer": "",
+        "keyPoints": [],
+        "maxPoints": e.get("maxPoints", 3),
+        "relatedSubtopic": ""
+    } for e in row.get("frq_evaluations") or []]
+    return {"title": "", "multipleChoice": multiple_choice, "freeResponse": free_response}
+
+
+def row_size_bytes(row: dict) -> int:
+    """Approximate stored size of a row as its JSON encoding."""
+    return len(json.dumps(row, ensure_ascii=False).encode("utf-8"))
+
+
+def migrate_legacy_attempts(batch_size: int = 200) -> Dict[str, int]:
+    """
+    Convert legacy quiz_attempts rows to the compact encoding.
+
+    Run after sql/quiz_attempts_compact.sql. Safe to rerun: only rows without
+    a quiz_version are touched.
+    """
+    from database import supabase
+
+    migrated = 0
+    bytes_before = 0
+    bytes_after = 0
+    while True:
+        rows = supabase.table("quiz_attempts").select("*").is_(
+            "quiz_version", "null"
+        ).limit(batch_size).execute().data
+        if not rows:
+            break
+        for row in rows:
+            snapshot = snapshot_from_legacy_row(row)
+            version = save_quiz_snapshot(row["course_id"], row["unit_number"], snapshot)
+            compact = encode_attempt(version, row.get("mcq_results") or [],
+                                     row.get("frq_evaluations") or [])
+            bytes_before += row_size_bytes(row)
+            bytes_after += row_size_bytes({**row, **compact, "mcq_results": None, "frq_evaluations": None})
+            supabase.table("quiz_attempts").update({
+                **compact,
+                "mcq_results": None,
+                "frq_evaluations": None,
+            }).eq("id", row["id"]).execute()
+            migrated += 1
+    return {"migrated": migrated, "bytes_before": bytes_before, "bytes_after": bytes_after}
+
+
+if __name__ == '__main__':
+    stats = migrate_legacy_attempts()
+    print(f"Migrated {stats['migrated']} attempts: "
+          f"{stats['bytes_before']} -> {stats['bytes_after']} bytes")
@@ -0,0 +1,119 @@
+"""
+Request authentication.
+
+Callers send the Supabase access token as `Authorization: Bearer <token>` (the
+Next.js API routes forward the access_token cookie this way); the cookie itself
+is accepted too. `get_auth_id` is the FastAPI dependency that gates per-user
+routes: a client-supplied auth_id must match the verified token subject.
+
+Every authenticated request, and the rate limiter's key function, needs the
+verified claims, so a token's HS256 signature is checked once and its claims
+are cached by token hash until the token's `exp`, in a bounded LRU.
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import jwt
+from fastapi import HTTPException, Request
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+JWT_AUDIENCE = "authenticated"
+# Users allowed to act on other learners' results: class batch grading and cohort analytics
+GRADER_IDS = frozenset(filter(None, (i.strip() for i in os.getenv("GRADER_IDS", "").split(","))))
+
+
+class ClaimsCache:
+    """LRU of verified token claims, each dropped once its token expires."""
+
+    def __init__(self, max_size: int = AUTH_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        with self._lock:
+            claims = self._entries.get(key)
+            if claims is None:
+                return None
+            if claims["exp"] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, key: bytes, claims: dict) -> None:
+        # Tokens without an expiry are verified every time rather than trusted forever
+        if not isinstance(claims.get("exp"), (int, float)):
+            return
+        with self._lock:
+            self._entries[key] = claims
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+claims_cache = ClaimsCache()
+
+
+def verify_token(token: str) -> dict:
+    """Claims of a valid Supabase access token; raises jwt.PyJWTError otherwise."""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = claims_cache.get(key)
+    if claims is None:
+        claims = jwt.decode(token, os.environ["SUPABASE_SECRET_KEY"], algorithms=["HS256"], audience=JWT_AUDIENCE)
+        claims_cache.put(key, claims)
+    return claims
+
+
+def request_token(request: Request) -> Optional[str]:
+    """Bearer token from the Authorization header, else the access_token cookie."""
+    header = request.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip()
+    return request.cookies.get("access_token")
+
+
+def get_auth_id(request: Request) -> str:
+    """Dependency: the verified user id, or 401."""
+    token = request_token(request)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    try:
+        return verify_token(token)["sub"]
+    except (jwt.PyJWTError, KeyError):
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+def optional_auth_id(request: Request) -> Optional[str]:
+    """Dependency for routes that also serve anonymous callers: None without a token."""
+    if not request_token(request):
+        return None
+    return get_auth_id(request)
+
+
+def get_grader_id(request: Request) -> str:
+    """Dependency: the verified user id if they are in GRADER_IDS, else 403."""
+    auth_id = get_auth_id(request)
+    if auth_id not in GRADER_IDS:
+        raise HTTPException(status_code=403, detail="Restricted to graders")
+    return auth_id
+
+
+def check_auth_id(claimed: Optional[str], auth_id: Optional[str]) -> Optional[str]:
+    """The user a request acts for: the verified one. Claiming someone else is a 403."""
+    if claimed is not None and auth_id is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    if claimed is not None and claimed != auth_id:
+        raise HTTPException(status_code=403, detail="auth_id does not match the signed-in user")
+    return auth_id
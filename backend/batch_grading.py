@@ -0,0 +1,160 @@
+"""
+Batch grading of a class's module-quiz answer sheets.
+
+/evaluate_module_quiz grades one learner per request. For an in-class exam
+the sheets come in together, so grading is done per class instead:
+
+  MCQ  every sheet's selected indices form one sheets x questions matrix,
+       compared against the answer-key vector in a single NumPy operation
+  FRQ  answers are grouped per question, identical and blank answers are
+       collapsed, and each group is graded FRQ_BATCH_SIZE answers per LLM call
+       (CourseGenerator.evaluate_frq_batch), the calls running concurrently
+
+Scores, percentages, pass flags and weak subtopics come out of the resulting
+score matrices. The route stores every attempt with one bulk insert.
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Answers to one question graded per LLM call
+FRQ_BATCH_SIZE = int(os.getenv("FRQ_BATCH_SIZE", "25"))
+# Largest class accepted in one request
+MAX_SHEETS = int(os.getenv("BATCH_GRADING_MAX_SHEETS", "200"))
+# Rounds of re-asking for answers an LLM response left out
+MAX_ROUNDS = 2
+PASS_MARK = 80
+# An item score below this fraction of its points marks the subtopic as weak
+WEAK_BELOW = 0.8
+BLANK_FEEDBACK = "No answer was given."
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("FRQ_BATCH_WORKERS", "4")),
+                               thread_name_prefix="batch-grading")
+
+
+class GradingError(Exception):
+    """An FRQ batch could not be graded."""
+
+
+def check_mcq_answers(questions: List[dict], answers: List[List[int]]) -> None:
+    """Raise ValueError unless every selected index is an option of its question or -1 (unanswered)."""
+    for i, selected in enumerate(answers):
+        for j, (index, question) in enumerate(zip(selected, questions)):
+            if not -1 <= index < len(question.get("options", [])):
+                raise ValueError(f"Sheet {i}: answer {index} to question {j} is not one of its options")
+
+
+def answer_matrix(answers: List[List[int]], n_questions: int) -> np.ndarray:
+    """Selected option indices as a sheets x questions matrix; unanswered questions are -1."""
+    matrix = np.full((len(answers), n_questions), -1, dtype=np.int64)
+    for i, selected in enumerate(answers):
+        selected = selected[:n_questions]
+        matrix[i, :len(selected)] = selected
+    return matrix
+
+
+def score_mcq(questions: List[dict], answers: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(selected matrix, correct boolean matrix) for every sheet against the answer key."""
+    key = np.array([q.get("correctAnswerIndex", -2) for q in questions], dtype=np.int64)
+    selected = answer_matrix(answers, len(questions))
+    return selected, selected == key
+
+
+def _grade_distinct(generator, questions: List[dict], distinct: List[List[str]], skill_level: str,
+                    age_group: str) -> List[List[dict]]:
+    """Grades for each question's distinct answers. All batches of a round run concurrently."""
+    grades: List[Dict[int, dict]] = [{} for _ in questions]
+    pending = [list(range(len(answers))) for answers in distinct]
+    for _ in range(MAX_ROUNDS):
+        batches = [(j, indices[k:k + FRQ_BATCH_SIZE])
+                   for j, indices in enumerate(pending) for k in range(0, len(indices), FRQ_BATCH_SIZE)]
+        futures = [_executor.submit(generator.evaluate_frq_batch, questions[j], [distinct[j][k] for k in batch],
+                                    skill_level, age_group) for j, batch in batches]
+        for (j, batch), future in zip(batches, futures):
+            result = future.result()
+            if "error" in result:
+                raise GradingError(result["error"])
+            max_points = questions[j].get("maxPoints", 3)
+            for ev in result.get("evaluations", []):
+                if 0 <= ev["answerIndex"] < len(batch):
+                    grades[j][batch[ev["answerIndex"]]] = {
+                        "score": min(max(int(ev["score"]), 0), max_points),
+                        "feedback": ev.get("feedback", ""),
+                    }
+        # Answers a response left out are asked for again
+        pending = [[k for k in indices if k not in grades[j]] for j, indices in enumerate(pending)]
+        if not any(pending):
+            return [[grades[j][k] for k in range(len(answers))] for j, answers in enumerate(distinct)]
+    raise GradingError(f"No evaluation returned for {sum(map(len, pending))} answers")
+
+
+def grade_frqs(generator, questions: List[dict], answers: List[List[str]], skill_level: str,
+               age_group: str) -> Tuple[np.ndarray, List[List[dict]]]:
+    """
+    (score matrix, per-sheet frqEvaluations) for every sheet's free responses.
+    Blank answers score 0 without an LLM call; identical answers are graded
+    once. Raises GradingError if any batch fails.
+    """
+    texts = [[(sheet[j] if j < len(sheet) else "").strip() for sheet in answers] for j in range(len(questions))]
+    distinct = [list(dict.fromkeys(t for t in column if t)) for column in texts]
+    graded = _grade_distinct(generator, questions, distinct, skill_level, age_group)
+
+    scores = np.zeros((len(answers), len(questions)), dtype=np.int64)
+    evaluations: List[List[dict]] = [[] for _ in answers]
+    for j, question in enumerate(questions):
+        by_answer = dict(zip(distinct[j], graded[j]))
+        for i, text in enumerate(texts[j]):
+            grade = by_answer.get(text, {"score": 0, "feedback": BLANK_FEEDBACK})
+            scores[i, j] = grade["score"]
+            evaluations[i].append({"questionIndex": j, "score": grade["score"],
+                                   "maxPoints": question.get("maxPoints", 3), "feedback": grade["feedback"]})
+    return scores, evaluations
+
+
+def grade(generator, quiz: dict, mcq_answers: List[List[int]], frq_answers: List[List[str]],
+          skill_level: str, age_group: str) -> List[dict]:
+    """
+    Grade every sheet of a class against `quiz`. Returns one result per sheet,
+    in order, with what /evaluate_module_quiz reports for a single learner.
+    """
+    mcq_questions = quiz.get("multipleChoice", [])
+    frq_questions = quiz.get("freeResponse", [])
+    selected, correct = score_mcq(mcq_questions, mcq_answers)
+    frq_scores, frq_evaluations = grade_frqs(generator, frq_questions, frq_answers, skill_level, age_group)
+
+    max_points = np.array([q.get("maxPoints", 3) for q in frq_questions], dtype=np.int64)
+    mcq_score = correct.sum(axis=1)
+    frq_score = frq_scores.sum(axis=1)
+    total_score = mcq_score + frq_score
+    total_possible = len(mcq_questions) + int(max_points.sum())
+    percentage = np.round(total_score / total_possible * 100, 1) if total_possible else np.zeros(len(selected))
+
+    # Items missed per sheet, MCQs then FRQs, mapped to their subtopics
+    missed = np.hstack([~correct, frq_scores < max_points * WEAK_BELOW])
+    subtopics = np.array([q.get("relatedSubtopic", "") for q in mcq_questions + frq_questions], dtype=object)
+
+    results = []
+    for i in range(len(selected)):
+        mcq_results = [{
+            "selectedIndex": int(selected[i, j]), "correct": bool(correct[i, j]),
+            "options": q.get("options", []), "relatedSubtopic": q.get("relatedSubtopic", ""),
+        } for j, q in enumerate(mcq_questions)]
+        results.append({
+            "mcqResults": mcq_results,
+            "mcqScore": int(mcq_score[i]),
+            "mcqTotal": len(mcq_questions),
+            "frqEvaluations": frq_evaluations[i],
+            "frqScore": int(frq_score[i]),
+            "frqTotal": int(max_points.sum()),
+            "totalScore": int(total_score[i]),
+            "totalPossible": total_possible,
+            "percentage": float(percentage[i]),
+            "passed": bool(percentage[i] >= PASS_MARK),
+            "weakSubtopics": list(dict.fromkeys(s for s in subtopics[missed[i]] if s)),
+        })
+    return results
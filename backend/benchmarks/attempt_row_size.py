@@ -0,0 +1,83 @@
+"""
+Compare the stored size of a quiz_attempts row under the legacy JSONB
+encoding and the compact quiz-version encoding.
+
+Usage (from backend/):
+    python -m benchmarks.attempt_row_size
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_SECRET_KEY", "benchmark-key")
+
+from attempt_encoding import encode_attempt, row_size_bytes, quiz_version_id
+
+
+def sample_quiz(mcq_count: int = 10, frq_count: int = 3) -> dict:
+    explanation = ("The correct option follows from the definition introduced in the lesson; "
+                   "the other options describe related but distinct ideas. ") * 2
+    return {
+        "title": "Unit 1 Module Quiz",
+        "multipleChoice": [{
+            "question": f"Question {i}: which statement best describes the concept covered in this subtopic?",
+            "options": [f"Option {c} describing a plausible answer for question {i}" for c in "ABCD"],
+            "correctAnswerIndex": i % 4,
+            "explanation": explanation,
+            "relatedSubtopic": f"Subtopic {i % 3}"
+        } for i in range(mcq_count)],
+        "freeResponse": [{
+            "question": f"Explain how the ideas in subtopics {i} and {i + 1} relate.",
+            "sampleAnswer": "A strong answer connects both ideas with a concrete example. " * 4,
+            "keyPoints": ["Defines both ideas", "Connects them", "Gives an example"],
+            "maxPoints": 3,
+            "relatedSubtopic": f"Subtopic {i}"
+        } for i in range(frq_count)]
+    }
+
+
+def sample_results(quiz: dict):
+    mcq_results = []
+    for i, q in enumerate(quiz["multipleChoice"]):
+        selected = q["correctAnswerIndex"] if i % 3 else (q["correctAnswerIndex"] + 1) % 4
+        mcq_results.append({
+            "question": q["question"],
+            "options": q["options"],
+            "selectedIndex": selected,
+            "correctAnswerIndex": q["correctAnswerIndex"],
+            "explanation": q["explanation"],
+            "correct": selected == q["correctAnswerIndex"],
+            "relatedSubtopic": q["relatedSubtopic"]
+        })
+    frq_evaluations = [{
+        "questionIndex": i,
+        "score": 2,
+        "maxPoints": 3,
+        "feedback": "Good connection between the ideas; the example could be more specific."
+    } for i in range(len(quiz["freeResponse"]))]
+    return mcq_results, frq_evaluations
+
+
+def main():
+    base = {
+        "auth_id": "00000000-0000-0000-0000-000000000000",
+        "course_id": "20250101_000000_Intro_to_Chemistry_abcd1234",
+        "unit_number": 1,
+        "attempt_number": 3,
+        "mcq_score": 7, "mcq_total": 10, "frq_score": 6, "frq_total": 9,
+        "total_score": 13, "total_possible": 19, "percentage": 68.4, "passed": False,
+        "weak_subtopics": ["Subtopic 0", "Subtopic 1"],
+        "overall_feedback": "Solid progress; review the first subtopic before retaking.",
+    }
+    print(f"{'MCQ':>4} {'FRQ':>4} {'legacy':>8} {'compact':>8} {'saved':>7}")
+    for mcq_count, frq_count in [(8, 2), (10, 3), (12, 3)]:
+        quiz = sample_quiz(mcq_count, frq_count)
+        mcq_results, frq_evaluations = sample_results(quiz)
+        legacy = row_size_bytes({**base, "mcq_results": mcq_results, "frq_evaluations": frq_evaluations})
+        compact = row_size_bytes({**base, **encode_attempt(quiz_version_id(quiz), mcq_results, frq_evaluations)})
+        print(f"{mcq_count:>4} {frq_count:>4} {legacy:>8} {compact:>8} {1 - compact / legacy:>7.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Per-request authentication overhead: the `get_auth_id` dependency with a cold
+claims cache (full HS256 verification every call) against a warm one, and the
+same through a minimal FastAPI route.
+
+Usage (from backend/):
+    python -m benchmarks.auth_overhead
+    python -m benchmarks.auth_overhead --iterations 50000 --users 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("SUPABASE_SECRET_KEY", "benchmark-key-benchmark-key-benchmark-key")
+
+import jwt
+from fastapi import Depends, FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+
+import auth
+from auth import get_auth_id
+
+
+def make_tokens(users: int):
+    exp = int(time.time()) + 3600
+    return [jwt.encode({"sub": f"user-{i}", "aud": "authenticated", "exp": exp, "role": "authenticated"},
+                       os.environ["SUPABASE_SECRET_KEY"], algorithm="HS256") for i in range(users)]
+
+
+class _Request:
+    """Just enough of a Request for the dependency."""
+
+    def __init__(self, token: str):
+        self.headers = {"authorization": f"Bearer {token}"}
+        self.cookies = {}
+
+
+def time_dependency(tokens, iterations: int, cached: bool) -> float:
+    """Microseconds per get_auth_id call."""
+    requests = [_Request(token) for token in tokens]
+    auth.claims_cache.clear()
+    start = time.perf_counter()
+    for i in range(iterations):
+        if not cached:
+            auth.claims_cache.clear()
+        get_auth_id(requests[i % len(requests)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def time_route(tokens, iterations: int, cached: bool) -> float:
+    """Microseconds per request to a route that only resolves the dependency."""
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(request: Request, auth_id: str = Depends(get_auth_id)):
+        return {"auth_id": auth_id}
+
+    headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+    auth.claims_cache.clear()
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(iterations):
+            if not cached:
+                auth.claims_cache.clear()
+            await client.get("/me", headers=headers[i % len(headers)])
+        return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int, users: int) -> dict:
+    tokens = make_tokens(users)
+    route_iterations = max(1, iterations // 20)
+    return {
+        "dependency_cold_us": time_dependency(tokens, iterations, cached=False),
+        "dependency_warm_us": time_dependency(tokens, iterations, cached=True),
+        "route_cold_us": asyncio.run(time_route(tokens, route_iterations, cached=False)),
+        "route_warm_us": asyncio.run(time_route(tokens, route_iterations, cached=True)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=100, help="distinct tokens in rotation")
+    args = parser.parse_args()
+    result = run(args.iterations, args.users)
+    print(f"{'':<12} {'verify every call':>18} {'cached claims':>14}")
+    print(f"{'dependency':<12} {result['dependency_cold_us']:>15.1f} us {result['dependency_warm_us']:>11.1f} us")
+    print(f"{'route':<12} {result['route_cold_us']:>15.1f} us {result['route_warm_us']:>11.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Bytes on the wire and CPU per response for lesson, module quiz and course
+plan payloads: uncompressed, gzipped per request at several levels, and
+served from a body precompressed at save time. Also times the same payload
+through a route behind CompressionMiddleware, both ways.
+
+Usage (from backend/):
+    python -m benchmarks.compression
+    python -m benchmarks.compression --iterations 2000
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.attempt_row_size import sample_quiz
+from benchmarks.fakes import canned_course_plan
+from compression import CompressionMiddleware, precompressed_response
+from precompress import PRECOMPRESS_LEVEL, gzip_json, json_body
+
+LEVELS = (1, 6, 9)
+
+WORDS = ("atom molecule reaction coefficient equation mass conservation element compound product reactant "
+         "balance count side each both first then example because therefore notice that the a of to and is "
+         "we you can must equal number formula oxygen hydrogen carbon water energy bond electron charge").split()
+
+
+def prose(rng: random.Random, words: int) -> str:
+    """Varied sentences, so the payloads compress like real text rather than repeated strings."""
+    sentences, count = [], 0
+    while count < words:
+        length = rng.randint(8, 20)
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        count += length
+    return " ".join(sentences)
+
+
+def sample_lesson(sections: int = 6) -> dict:
+    """A complete lesson about the size Gemini writes: markdown sections, videos, quiz, attribution."""
+    rng = random.Random(sections)
+    return {
+        "title": "Balancing Chemical Equations",
+        "status": "complete",
+        "sections": [{
+            "heading": f"Section {i + 1}: Working with coefficients",
+            "content": f"## Section {i + 1}\n\n{prose(rng, 180)}\n\n- **Key idea:** {prose(rng, 12)}\n\n"
+                       f"{prose(rng, 180)}",
+            "videos": [{"title": f"Video {i + 1}", "url": f"https://www.youtube.com/watch?v=abc{i}def"}],
+        } for i in range(sections)],
+        "quiz": [{
+            "question": f"Check question {i + 1}: which coefficient balances the equation?",
+            "options": ["1", "2", "3", "4"],
+            "correctAnswerIndex": i % 4,
+            "explanation": prose(rng, 40),
+            "relatedSubtopic": "Balancing equations",
+        } for i in range(5)],
+        "searchAttribution": ('<style>.container{align-items:center;border-radius:8px;display:flex;}</style>'
+                              '<div class="container"><div class="headline"><svg class="logo">'
+                              '<path d="M12 2a10 10 0 1 0 0 20"/></svg></div>'
+                              '<div class="carousel"><a class="chip" href="https://www.google.com/search?q=x">'
+                              'balancing chemical equations</a></div></div>') * 3,
+    }
+
+
+def payloads() -> dict:
+    return {
+        "lesson": sample_lesson(),
+        "module quiz": sample_quiz(12, 3),
+        "course plan": {"course_id": "benchmark", **canned_course_plan(units=8, subtopics=5)},
+    }
+
+
+def cpu_per_call(fn, iterations: int) -> float:
+    """CPU microseconds per call."""
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1e6
+
+
+def measure_payload(data: dict, iterations: int) -> dict:
+    raw = json_body(data)
+    result = {"raw_bytes": len(raw)}
+    for level in LEVELS:
+        result[f"gzip{level}_bytes"] = len(gzip.compress(raw, compresslevel=level, mtime=0))
+        result[f"gzip{level}_us"] = cpu_per_call(lambda: gzip.compress(raw, compresslevel=level, mtime=0),
+                                                 iterations)
+    result["precompressed_bytes"] = len(gzip_json(data, PRECOMPRESS_LEVEL))
+    return result
+
+
+async def time_routes(data: dict, iterations: int) -> dict:
+    """CPU microseconds per request: JSON built and gzipped per request vs served precompressed."""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+    body = gzip_json(data)
+
+    @app.get("/dynamic")
+    async def dynamic():
+        return data
+
+    @app.get("/precompressed")
+    async def precompressed():
+        return precompressed_response(body)
+
+    result = {}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench",
+                           headers={"Accept-Encoding": "gzip"}) as client:
+        for path in ("/dynamic", "/precompressed"):
+            await client.get(path)
+            start = time.process_time()
+            for _ in range(iterations):
+                response = await client.get(path)
+            result[path.strip("/")] = (time.process_time() - start) / iterations * 1e6
+            result[f"{path.strip('/')}_wire_bytes"] = int(response.headers["content-length"])
+    return result
+
+
+def run(iterations: int) -> dict:
+    results = {}
+    for name, data in payloads().items():
+        results[name] = measure_payload(data, iterations)
+        results[name].update(asyncio.run(time_routes(data, max(1, iterations // 10))))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+    results = run(args.iterations)
+
+    print(f"{'payload':<12} {'raw':>8} " + " ".join(f"{f'gzip-{level}':>16}" for level in LEVELS))
+    for name, r in results.items():
+        cells = " ".join(f"{r[f'gzip{level}_bytes']:>7} {r[f'gzip{level}_us']:>6.0f} us" for level in LEVELS)
+        print(f"{name:<12} {r['raw_bytes']:>8} {cells}")
+    print()
+    print(f"{'payload':<12} {'per-request gzip':>22} {'precompressed':>22}")
+    for name, r in results.items():
+        print(f"{name:<12} {r['dynamic_wire_bytes']:>8} B {r['dynamic']:>7.0f} us "
+              f"{r['precompressed_wire_bytes']:>8} B {r['precompressed']:>7.0f} us")
+
+
+if __name__ == "__main__":
+    main()
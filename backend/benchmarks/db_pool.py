@@ -0,0 +1,194 @@
+"""
+Data-access latency against a local PostgREST/Storage-compatible stub.
+
+Simulates the reads of /evaluate_module_quiz (quiz file, course file, latest
+attempt number) through the real supabase-py clients:
+
+  sequential  the synchronous client called from the async route, one read
+              after another (the old path: each call blocks the event loop)
+  gathered    the async client on its keep-alive pool, reads issued together
+
+Both run `--concurrency` simulated requests at a time on one event loop, as
+a single uvicorn worker would.
+
+The stub runs in its own process and answers every request after a fixed
+delay standing in for network plus database time. It counts the TCP
+connections it accepts, which shows whether the pools are reusing them.
+
+Usage (from backend/):
+    python -m benchmarks.db_pool
+    python -m benchmarks.db_pool --latency-ms 30 --requests 100 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("SUPABASE_SECRET_KEY", "benchmark-key")
+
+import database
+from benchmarks.fakes import canned_course_plan, canned_module_quiz
+
+COURSE = json.dumps({"course_id": "bench", "course_plan": canned_course_plan()}).encode()
+QUIZ = json.dumps(canned_module_quiz()).encode()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, latency: float, connections):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.connections = connections
+
+
+def _serve(latency: float, connections, port_queue) -> None:
+    server = StubServer(latency, connections)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class Stub:
+    """The stub server in a child process, so it doesn't compete for the GIL with the clients."""
+
+    def __init__(self, latency: float):
+        self.connections = multiprocessing.Value("i", 0)
+        ports = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_serve, args=(latency, self.connections, ports), daemon=True)
+        self.process.start()
+        self.url = f"http://127.0.0.1:{ports.get(timeout=10)}"
+
+    def reset(self) -> None:
+        self.connections.value = 0
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.join()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; don't let Nagle hold the body back
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.connections.get_lock():
+            self.server.connections.value += 1
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        if self.path.startswith("/storage/"):
+            body = QUIZ if "module_quiz" in self.path else COURSE
+        elif self.path.startswith("/rest/v1/quiz_attempts"):
+            body = json.dumps([{"attempt_number": 2}]).encode()
+        else:
+            body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _sequential_reads(client):
+    bucket = client.storage.from_("course-data")
+    bucket.download("bench_module_quiz_1.json")
+    bucket.download("bench.json")
+    client.table("quiz_attempts").select("attempt_number").eq("auth_id", "u").eq(
+        "course_id", "bench").eq("unit_number", 1).order("attempt_number", desc=True).limit(1).execute()
+
+
+async def _gathered_reads(client):
+    bucket = client.storage.from_("course-data")
+    await asyncio.gather(
+        bucket.download("bench_module_quiz_1.json"),
+        bucket.download("bench.json"),
+        client.table("quiz_attempts").select("attempt_number").eq("auth_id", "u").eq(
+            "course_id", "bench").eq("unit_number", 1).order("attempt_number", desc=True).limit(1).execute(),
+    )
+
+
+def _summary(latencies, wall: float, connections: int) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[max(0, int(len(latencies) * 0.95) - 1)] * 1000,
+        "req_per_s": len(latencies) / wall,
+        "connections": connections,
+    }
+
+
+async def _drive(reads, requests: int, concurrency: int):
+    """Run `requests` calls of `reads` with `concurrency` in flight; returns (latencies, wall)."""
+    latencies = []
+    pending = iter(range(requests))
+
+    async def worker():
+        for _ in pending:
+            # Latency as a client sees it: from arrival, including time queued behind a blocked loop
+            start = time.perf_counter()
+            await reads()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - start
+
+
+async def run_sequential(stub: Stub, requests: int, concurrency: int) -> dict:
+    client = database.create_client(stub.url, os.environ["SUPABASE_SECRET_KEY"])
+    stub.reset()
+
+    async def reads():
+        await asyncio.sleep(0)
+        _sequential_reads(client)
+
+    latencies, wall = await _drive(reads, requests, concurrency)
+    return _summary(latencies, wall, stub.connections.value)
+
+
+async def run_gathered(stub: Stub, requests: int, concurrency: int) -> dict:
+    client = await database.create_async_client(stub.url, os.environ["SUPABASE_SECRET_KEY"])
+    stub.reset()
+    latencies, wall = await _drive(lambda: _gathered_reads(client), requests, concurrency)
+    await client.options.httpx_client.aclose()
+    return _summary(latencies, wall, stub.connections.value)
+
+
+def run(latency_ms: float, requests: int, concurrency: int) -> dict:
+    stub = Stub(latency_ms / 1000)
+    try:
+        return {
+            "sequential": asyncio.run(run_sequential(stub, requests, concurrency)),
+            "gathered": asyncio.run(run_gathered(stub, requests, concurrency)),
+        }
+    finally:
+        stub.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stub delay per request")
+    parser.add_argument("--requests", type=int, default=200, help="simulated endpoint calls per mode")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    results = run(args.latency_ms, args.requests, args.concurrency)
+    print(f"{'mode':<12} {'p50 ms':>8} {'p95 ms':>8} {'req/s':>8} {'connections':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<12} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['req_per_s']:>8.1f} {r['connections']:>12}")
+
+
+if __name__ == "__main__":
+    main()
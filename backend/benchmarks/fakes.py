@@ -0,0 +1,646 @@
+"""
+Deterministic stand-ins for the Gemini and Supabase clients, used by the
+benchmark scenarios so throughput can be measured without network access or
+API quota.
+
+Latencies are drawn from seeded log-normal distributions and applied with
+time.sleep, matching the blocking behaviour of the real synchronous SDKs.
+FakeAsyncSupabase serves the same data to the async client, running each
+call in a thread so its latency doesn't block the event loop.
+"""
+import asyncio
+import copy
+import json
+import math
+import operator
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+
+class Latency:
+    """Log-normal latency with the given median (seconds) and shape."""
+
+    def __init__(self, median: float, sigma: float = 0.35, seed: int = 0):
+        self.median = median
+        self.sigma = sigma
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        with self._lock:
+            return self.median * math.exp(self._rng.gauss(0.0, self.sigma))
+
+    def wait(self) -> None:
+        seconds = self.sample()
+        if seconds:
+            time.sleep(seconds)
+
+
+# --- Canned model outputs ---
+
+def canned_course_plan(topic: str = "Intro to Chemistry", units: int = 3, subtopics: int = 3) -> dict:
+    return {
+        "courseTitle": f"{topic}: A Guided Course",
+        "description": f"A structured introduction to {topic}.",
+        "metadata": {"skillLevel": "Beginner", "ageGroup": "Teen", "estimatedTotalDuration": "6 hours"},
+        "units": [{
+            "unitNumber": u + 1,
+            "title": f"Unit {u + 1}",
+            "description": f"Core ideas of unit {u + 1}.",
+            "duration": "2 hours",
+            "subtopics": [f"Subtopic {u + 1}.{s + 1}" for s in range(subtopics)],
+            "quiz": {"title": f"Unit {u + 1} Quiz", "questionCount": 10},
+        } for u in range(units)],
+    }
+
+
+def canned_topic_content(sections: int = 4) -> dict:
+    body = "This section explains the idea step by step with a worked example. " * 12
+    return {
+        "title": "Lesson",
+        "sections": [{"heading": f"Section {i + 1}", "content": body, "videos": []} for i in range(sections)],
+        "quiz": [{
+            "question": f"Check question {i + 1}?",
+            "options": ["A", "B", "C", "D"],
+            "correctAnswerIndex": i % 4,
+            "explanation": "Because of the definition.",
+            "relatedSubtopic": "",
+        } for i in range(3)],
+    }
+
+
+def canned_topic_opening(sections: int = 4) -> dict:
+    content = canned_topic_content(sections)
+    return {
+        "title": content["title"],
+        "outline": [section["heading"] for section in content["sections"]],
+        "firstSection": content["sections"][0],
+    }
+
+
+def canned_topic_remainder(sections: int = 4) -> dict:
+    content = canned_topic_content(sections)
+    return {"sections": content["sections"][1:], "quiz": content["quiz"], "firstSectionVideos": []}
+
+
+def canned_module_quiz(mcq: int = 10, frq: int = 3) -> dict:
+    return {
+        "title": "Module Quiz",
+        "multipleChoice": [{
+            "question": f"Module question {i + 1}?",
+            "options": ["Option A", "Option B", "Option C", "Option D"],
+            "correctAnswerIndex": i % 4,
+            "explanation": "The correct option follows from the lesson's definition.",
+            "relatedSubtopic": f"Subtopic 1.{i % 3 + 1}",
+        } for i in range(mcq)],
+        "freeResponse": [{
+            "question": f"Explain concept {i + 1}.",
+            "sampleAnswer": "A complete answer defines the concept and gives an example.",
+            "keyPoints": ["Definition", "Example", "Connection"],
+            "maxPoints": 3,
+            "relatedSubtopic": f"Subtopic 1.{i + 1}",
+        } for i in range(frq)],
+    }
+
+
+def canned_quiz_evaluation(frq: int = 3) -> dict:
+    return {
+        "frqEvaluations": [{"questionIndex": i, "score": 2, "maxPoints": 3, "feedback": "Good start."}
+                           for i in range(frq)],
+        "overallFeedback": "Solid understanding with a few gaps.",
+    }
+
+
+def canned_batch_evaluation(answers: int) -> dict:
+    return {"evaluations": [{"answerIndex": i, "score": 2, "feedback": "Good start."} for i in range(answers)]}
+
+
+def canned_assessment_questions() -> dict:
+    return {
+        "gradeLevel": "4th Grade",
+        "subject": "Chemistry",
+        "questions": [{"id": str(i), "question": f"Q{i}?", "options": ["a", "b", "c", "d"],
+                       "correctAnswer": "a", "difficulty": "Easy"} for i in range(10)],
+    }
+
+
+def canned_assessment() -> dict:
+    return {"strengths": ["Vocabulary"], "weaknesses": ["Reactions"], "recommendation": "Review reactions."}
+
+
+CANNED_VIDEOS = """**video name:** Intro video
+**video creator:** Science Channel
+**video summary:** A short overview.
+**video url:** https://www.youtube.com/watch?v=AAAAAAAAAAA
+"""
+
+
+class FakeGenaiClient:
+    """
+    Mimics `genai.Client().models.generate_content` (and `files.upload`).
+
+    The response is chosen from the requested response_schema; calls without
+    a schema get tutor text, or the video list when search tools are set.
+    """
+
+    def __init__(self, latencies: Optional[Dict[str, Latency]] = None, seed: int = 0,
+                 failure_rate: float = 0.0, frq_count: int = 3):
+        self.latencies = latencies or {}
+        self.default_latency = Latency(0.0)
+        self.failure_rate = failure_rate
+        self.frq_count = frq_count
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls: List[Dict[str, Any]] = []
+        self.models = SimpleNamespace(generate_content=self.generate_content,
+                                      count_tokens=self.count_tokens)
+        self.files = SimpleNamespace(upload=self.upload_file, delete=lambda **kwargs: None)
+        self.caches = SimpleNamespace(create=self.create_cache, delete=lambda **kwargs: None)
+
+    def _task_for(self, config) -> str:
+        schema = None
+        tools = None
+        if isinstance(config, dict):
+            schema = config.get("response_schema")
+            tools = config.get("tools")
+        elif config is not None:
+            schema = getattr(config, "response_schema", None)
+            tools = getattr(config, "tools", None)
+        if schema is not None:
+            return getattr(schema, "__name__", str(schema))
+        if tools:
+            return "videos"
+        return "text"
+
+    def _payload(self, task: str, prompt: str = "") -> str:
+        if task == "CoursePlan":
+            return json.dumps(canned_course_plan())
+        if task == "TopicContent":
+            return json.dumps(canned_topic_content())
+        if task == "TopicOpening":
+            return json.dumps(canned_topic_opening())
+        if task == "TopicRemainder":
+            return json.dumps(canned_topic_remainder())
+        if task == "ModuleQuizContent":
+            return json.dumps(canned_module_quiz(frq=self.frq_count))
+        if task == "QuizEvaluationResult":
+            return json.dumps(canned_quiz_evaluation(self.frq_count))
+        if task == "BatchEvaluationResult":
+            return json.dumps(canned_batch_evaluation(prompt.count('"answerIndex":')))
+        if task == "Questions":
+            return json.dumps(canned_assessment_questions())
+        if task == "Assessment":
+            return json.dumps(canned_assessment())
+        if task == "videos":
+            return CANNED_VIDEOS
+        return "What do you already know about this idea? Try restating the question in your own words."
+
+    def generate_content(self, model: str, contents=None, config=None, **kwargs):
+        task = self._task_for(config)
+        self.latencies.get(task, self.latencies.get("default", self.default_latency)).wait()
+        with self._lock:
+            self.calls.append({"model": model, "task": task})
+            fail = self._rng.random() < self.failure_rate
+        if fail:
+            raise RuntimeError("503 UNAVAILABLE: injected fault")
+        text = self._payload(task, str(contents))
+        prompt_chars = len(str(contents)) if contents is not None else 0
+        return SimpleNamespace(
+            text=text,
+            candidates=[],
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_chars // 4,
+                candidates_token_count=len(text) // 4,
+                thoughts_token_count=None,
+            ),
+        )
+
+    def count_tokens(self, model: str, contents=None, **kwargs):
+        return SimpleNamespace(total_tokens=len(str(contents)) // 4)
+
+    def upload_file(self, file=None, config=None, **kwargs):
+        return SimpleNamespace(name=f"files/{uuid.uuid4().hex[:8]}", uri="https://example/file",
+                               mime_type=(config or {}).get("mime_type") if isinstance(config, dict) else None)
+
+    def create_cache(self, model: str, config=None, **kwargs):
+        return SimpleNamespace(name=f"cachedContents/{uuid.uuid4().hex[:8]}")
+
+
+# --- Supabase ---
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+        self.error = None
+
+
+_COMPARISONS = {"eq": operator.eq, "neq": operator.ne, "lt": operator.lt,
+                "lte": operator.le, "gt": operator.gt, "gte": operator.ge}
+
+
+def _split_terms(text: str) -> list:
+    """Split a PostgREST logic filter on the commas outside parentheses and quotes."""
+    terms, depth, quoted, escaped, start = [], 0, False, False, 0
+    for i, ch in enumerate(text):
+        if escaped:
+            escaped = False
+        elif quoted and ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+        elif not quoted and ch in "()":
+            depth += 1 if ch == "(" else -1
+        elif not quoted and not depth and ch == ",":
+            terms.append(text[start:i])
+            start = i + 1
+    return terms + [text[start:]]
+
+
+def _term_filter(term: str):
+    for logic, combine in (("and(", all), ("or(", any)):
+        if term.startswith(logic):
+            parts = [_term_filter(t) for t in _split_terms(term[len(logic):-1])]
+            return lambda r: combine(p(r) for p in parts)
+    column, op, value = term.split(".", 2)
+    if value.startswith('"') and value.endswith('"'):
+        value = re.sub(r"\\(.)", r"\1", value[1:-1])
+    compare = _COMPARISONS[op]
+    return lambda r: r.get(column) is not None and compare(str(r.get(column)), value)
+
+
+def _or_filter(filters: str):
+    """The subset of PostgREST's or=(...) syntax the app uses; values compare as strings."""
+    parts = [_term_filter(t) for t in _split_terms(filters)]
+    return lambda r: any(p(r) for p in parts)
+
+
+class FakeQuery:
+    """Chainable query builder supporting the subset of PostgREST the app uses."""
+
+    def __init__(self, db: "FakeSupabase", table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+        self.order_by = []
+        self.max_rows = None
+        self.offset = 0
+        self.on_conflict = None
+
+    # Operations
+    def select(self, columns: str = "*", **kwargs):
+        self.op, self.columns = "select", columns
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def update(self, payload, **kwargs):
+        self.op, self.payload = "update", payload
+        return self
+
+    def upsert(self, payload, on_conflict: str = "", **kwargs):
+        self.op, self.payload, self.on_conflict = "upsert", payload, on_conflict
+        return self
+
+    def delete(self, **kwargs):
+        self.op = "delete"
+        return self
+
+    # Filters
+    def eq(self, column, value):
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda r: r.get(column) != value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and r.get(column) < value)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        self.filters.append(lambda r: r.get(column) in values)
+        return self
+
+    def is_(self, column, value):
+        expected = None if value in ("null", None) else value
+        self.filters.append(lambda r: r.get(column) is expected)
+        return self
+
+    def or_(self, filters: str, **kwargs):
+        self.filters.append(_or_filter(filters))
+        return self
+
+    def order(self, column, desc: bool = False, **kwargs):
+        self.order_by.append((column, desc))
+        return self
+
+    def limit(self, count, **kwargs):
+        self.max_rows = count
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset, self.max_rows = start, end - start + 1
+        return self
+
+    def _project(self, row: dict) -> dict:
+        if self.columns.strip() == "*":
+            return copy.deepcopy(row)
+        return {c.strip(): copy.deepcopy(row.get(c.strip())) for c in self.columns.split(",")}
+
+    def execute(self):
+        self.db.latency.wait()
+        with self.db.lock:
+            self.db.call_count += 1
+            rows = self.db.tables.setdefault(self.table, [])
+            matched = [r for r in rows if all(f(r) for f in self.filters)]
+            if self.op == "select":
+                # Stable sorts, last key first
+                for column, desc in reversed(self.order_by):
+                    matched.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+                matched = matched[self.offset:]
+                if self.max_rows is not None:
+                    matched = matched[:self.max_rows]
+                return _Result([self._project(r) for r in matched])
+            if self.op == "insert":
+                new_rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = []
+                # A statement inserts all of its rows or none of them
+                for i, row in enumerate(new_rows):
+                    self.db.check_unique(self.table, row, new_rows[:i])
+                for row in new_rows:
+                    stored = {"id": str(uuid.uuid4()), "created_at": _now(), **copy.deepcopy(row)}
+                    if self.table in self.db.IDENTITY_COLUMNS:
+                        self.db.sequence += 1
+                        stored[self.db.IDENTITY_COLUMNS[self.table]] = self.db.sequence
+                    if self.table == "user_courses":
+                        stored.setdefault("enrolled_at", _now())
+                    rows.append(stored)
+                    inserted.append(copy.deepcopy(stored))
+                return _Result(inserted)
+            if self.op == "update":
+                for row in matched:
+                    row.update(copy.deepcopy(self.payload))
+                return _Result(copy.deepcopy(matched))
+            if self.op == "upsert":
+                keys = [k.strip() for k in (self.on_conflict or "id").split(",")]
+                written = []
+                for row in (self.payload if isinstance(self.payload, list) else [self.payload]):
+                    existing = next((r for r in rows if all(r.get(k) == row.get(k) for k in keys)), None)
+                    if existing:
+                        existing.update(copy.deepcopy(row))
+                    else:
+                        existing = {"id": str(uuid.uuid4()), "created_at": _now(), **copy.deepcopy(row)}
+                        rows.append(existing)
+                    written.append(copy.deepcopy(existing))
+                return _Result(written)
+            if self.op == "delete":
+                for row in matched:
+                    rows.remove(row)
+                return _Result(copy.deepcopy(matched))
+        raise ValueError(f"Unsupported operation {self.op}")
+
+
+class _FakeRpc:
+    def __init__(self, db: "FakeSupabase", fn: str, params: dict):
+        self.db, self.fn, self.params = db, fn, params
+
+    def execute(self):
+        self.db.latency.wait()
+        handler = self.db.rpc_handlers.get(self.fn)
+        if handler is None:
+            raise ValueError(f"Unknown rpc {self.fn}")
+        with self.db.lock:
+            self.db.call_count += 1
+            return _Result(handler(self.db, self.params))
+
+
+def _apply_progress_deltas(db: "FakeSupabase", params: dict):
+    """Python port of sql/progress_bitmap.sql."""
+    courses = db.tables.setdefault("user_courses", [])
+    attempts = db.tables.setdefault("quiz_attempts", [])
+    for delta in params["deltas"]:
+        row = next((r for r in courses if r["auth_id"] == delta["auth_id"]
+                    and r["course_id"] == delta["course_id"]), None)
+        if row is None:
+            continue
+        width = delta["width"]
+        current = row.get("completed_bitmap")
+        if current is None:
+            legacy = set(row.get("completed_topics") or [])
+            current = "".join("1" if t in legacy else "0" for t in delta["topic_ids"])
+        bits = []
+        for i in range(width):
+            bit = current[i] == "1" if i < len(current) else False
+            if delta["set_mask"][i] == "1":
+                bit = True
+            if delta["clear_mask"][i] == "1":
+                bit = False
+            bits.append("1" if bit else "0")
+        row["completed_bitmap"] = "".join(bits)
+        row["completed_topics"] = [t for t, b in zip(delta["topic_ids"], bits) if b == "1"]
+        if delta.get("last_visited") is not None:
+            row["last_visited"] = delta["last_visited"]
+        passed = {a["unit_number"] for a in attempts if a["auth_id"] == row["auth_id"]
+                  and a["course_id"] == row["course_id"] and a.get("passed")}
+        row["is_completed"] = (width > 0 and all(b == "1" for b in bits)
+                               and set(delta["unit_numbers"]).issubset(passed))
+    return None
+
+
+def _apply_mastery_observations(db: "FakeSupabase", params: dict):
+    """Python port of apply_mastery_observations (sql/subtopic_mastery.sql)."""
+    from learner_model import update
+    rows = db.tables.setdefault("subtopic_mastery", [])
+    for obs in params["observations"]:
+        key = (obs["auth_id"], obs["course_id"], obs["subtopic"])
+        row = next((r for r in rows if (r["auth_id"], r["course_id"], r["subtopic"]) == key), None)
+        if row is None:
+            row = {"auth_id": key[0], "course_id": key[1], "subtopic": key[2],
+                   "mastery": params["p_init"], "observations": 0}
+            rows.append(row)
+        row["mastery"] = update(row["mastery"], obs["correct"], obs["guess"],
+                                slip=params["slip"], learn=params["learn"])
+        row["observations"] += 1
+        row["updated_at"] = _now()
+    return None
+
+
+def _latest_attempt_numbers(db: "FakeSupabase", params: dict):
+    """Python port of sql/latest_attempt_numbers.sql."""
+    latest: Dict[str, int] = {}
+    for row in db.tables.setdefault("quiz_attempts", []):
+        if (row["auth_id"] in params["learner_ids"] and row["course_id"] == params["quiz_course_id"]
+                and row["unit_number"] == params["quiz_unit_number"]):
+            latest[row["auth_id"]] = max(latest.get(row["auth_id"], 0), row["attempt_number"])
+    return [{"auth_id": auth_id, "attempt_number": n} for auth_id, n in latest.items()]
+
+
+class _FakeBucket:
+    def __init__(self, storage: "FakeStorage"):
+        self.storage = storage
+
+    def upload(self, path, file, file_options=None):
+        self.storage.latency.wait()
+        with self.storage.lock:
+            self.storage.call_count += 1
+            self.storage.objects[path] = bytes(file)
+        return SimpleNamespace(path=path)
+
+    def download(self, path, **kwargs):
+        self.storage.latency.wait()
+        with self.storage.lock:
+            self.storage.call_count += 1
+            if path not in self.storage.objects:
+                raise FileNotFoundError(path)
+            return self.storage.objects[path]
+
+    def list(self, path="", options=None):
+        options = options or {}
+        offset = options.get("offset", 0)
+        with self.storage.lock:
+            names = sorted(self.storage.objects)
+        return [{"name": name} for name in names[offset:offset + options.get("limit", 100)]]
+
+    def remove(self, paths):
+        with self.storage.lock:
+            for path in paths:
+                self.storage.objects.pop(path, None)
+        return []
+
+
+class FakeStorage:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.objects: Dict[str, bytes] = {}
+        self.buckets = set()
+        self.call_count = 0
+
+    def get_bucket(self, name):
+        if name not in self.buckets:
+            raise ValueError(f"Bucket {name} not found")
+        return SimpleNamespace(name=name)
+
+    def create_bucket(self, name, options=None):
+        self.buckets.add(name)
+        return SimpleNamespace(name=name)
+
+    def from_(self, bucket):
+        return _FakeBucket(self)
+
+
+class FakeSupabase:
+    """In-memory tables plus object storage behind the supabase-py call surface."""
+
+    UNIQUE_KEYS = {
+        "user_courses": ("auth_id", "course_id"),
+        "quiz_attempts": ("auth_id", "course_id", "unit_number", "attempt_number"),
+    }
+    # GENERATED ALWAYS AS IDENTITY columns, numbered on insert
+    IDENTITY_COLUMNS = {"quiz_attempts": "seq"}
+
+    def __init__(self, db_latency: Optional[Latency] = None, storage_latency: Optional[Latency] = None):
+        self.latency = db_latency or Latency(0.0)
+        self.lock = threading.RLock()
+        self.tables: Dict[str, List[dict]] = {}
+        self.storage = FakeStorage(storage_latency or Latency(0.0))
+        self.call_count = 0
+        self.sequence = 0
+        self.rpc_handlers = {"apply_progress_deltas": _apply_progress_deltas,
+                             "latest_attempt_numbers": _latest_attempt_numbers,
+                             "apply_mastery_observations": _apply_mastery_observations}
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None, **kwargs) -> _FakeRpc:
+        return _FakeRpc(self, fn, params or {})
+
+    def check_unique(self, table: str, row: dict, pending: List[dict] = ()) -> None:
+        keys = self.UNIQUE_KEYS.get(table)
+        if not keys:
+            return
+        for existing in [*self.tables.get(table, []), *pending]:
+            if all(existing.get(k) == row.get(k) for k in keys):
+                raise Exception("duplicate key value violates unique constraint (23505)")
+
+
+class _AsyncCall:
+    """Wraps a fake query builder; chaining stays synchronous, execute() is awaitable."""
+
+    def __init__(self, call):
+        self._call = call
+
+    def __getattr__(self, name):
+        attr = getattr(self._call, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._call else result
+        return chained
+
+    async def execute(self):
+        return await asyncio.to_thread(self._call.execute)
+
+
+class _AsyncBucket:
+    def __init__(self, bucket: _FakeBucket):
+        self._bucket = bucket
+
+    async def upload(self, path, file, file_options=None):
+        return await asyncio.to_thread(self._bucket.upload, path, file, file_options)
+
+    async def download(self, path, **kwargs):
+        return await asyncio.to_thread(self._bucket.download, path, **kwargs)
+
+
+class _AsyncStorage:
+    def __init__(self, storage: FakeStorage):
+        self._storage = storage
+
+    def from_(self, bucket):
+        return _AsyncBucket(self._storage.from_(bucket))
+
+
+class FakeAsyncSupabase:
+    """The async supabase-py call surface over a FakeSupabase's data."""
+
+    def __init__(self, db: FakeSupabase):
+        self.db = db
+        self.storage = _AsyncStorage(db.storage)
+        self.options = SimpleNamespace(httpx_client=None)
+
+    def table(self, name: str) -> _AsyncCall:
+        return _AsyncCall(self.db.table(name))
+
+    def rpc(self, fn: str, params: Optional[dict] = None, **kwargs) -> _AsyncCall:
+        return _AsyncCall(self.db.rpc(fn, params, **kwargs))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
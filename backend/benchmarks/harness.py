@@ -0,0 +1,99 @@
+"""
+Loads the FastAPI app against the fakes in benchmarks/fakes.py and records
+per-endpoint latency for the scenarios in benchmarks/scenarios.py.
+"""
+import importlib
+import os
+import sys
+import time
+from contextlib import ExitStack
+from typing import Dict, List, Tuple
+from unittest.mock import patch
+
+from benchmarks.fakes import FakeAsyncSupabase
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+os.environ.setdefault("SUPABASE_URL", "https://benchmark.supabase.co")
+os.environ.setdefault("SUPABASE_SECRET_KEY", "benchmark-key")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+# Modules that capture the Supabase or Gemini client at import time and must
+# be re-imported for the fakes to take effect.
+APP_MODULES = (
+    "llm", "database", "storage", "data_access", "attempt_encoding", "course_index", "course_cache", "progress_buffer",
+    "learner_model", "question_bank", "retake_quizzes", "course_generator", "assessment_generator",
+    "tutor_sessions", "quiz_helper", "cohort_analytics", "main",
+)
+
+
+def load_app(fake_genai, fake_supabase, stack: ExitStack):
+    """Import `main` wired to the given fakes. Patches live as long as `stack`."""
+    for name in APP_MODULES:
+        sys.modules.pop(name, None)
+    stack.enter_context(patch("supabase.create_client", lambda *args, **kwargs: fake_supabase))
+
+    async def acreate_client(*args, **kwargs):
+        return FakeAsyncSupabase(fake_supabase)
+    stack.enter_context(patch("supabase.acreate_client", acreate_client))
+    stack.enter_context(patch("google.genai.Client", lambda *args, **kwargs: fake_genai))
+    main = importlib.import_module("main")
+    # Video links are checked with real HTTP requests; treat them all as valid
+    stack.enter_context(patch.object(
+        sys.modules["course_generator"].CourseGenerator, "_validate_video_url", lambda self, url: True
+    ))
+    main.limiter.enabled = False
+    return main
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Collects (endpoint, status, seconds) samples for one scenario run."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[int, float]]] = {}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    async def call(self, client, method: str, endpoint: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.samples.setdefault(endpoint, []).append((response.status_code, time.perf_counter() - start))
+        return response
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    def summary(self) -> List[dict]:
+        wall = (self.finished or time.perf_counter()) - self.started
+        rows = []
+        for endpoint, samples in self.samples.items():
+            latencies = sorted(seconds for _, seconds in samples)
+            errors = sum(1 for status, _ in samples if status >= 400)
+            rows.append({
+                "endpoint": endpoint,
+                "requests": len(samples),
+                "errors": errors,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "rps": len(samples) / wall if wall > 0 else 0.0,
+            })
+        return rows
+
+
+def format_summary(name: str, rows: List[dict]) -> str:
+    lines = [f"== {name} ==",
+             f"{'endpoint':<34} {'reqs':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8}"]
+    for r in rows:
+        lines.append(f"{r['endpoint']:<34} {r['requests']:>5} {r['errors']:>4} {r['p50_ms']:>9.1f} "
+                     f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['rps']:>8.1f}")
+    return "\n".join(lines)
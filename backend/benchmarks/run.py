@@ -0,0 +1,85 @@
+"""
+Offline load test: runs classroom scenarios against the app with fake Gemini
+and Supabase clients and reports p50/p95/p99 latency and requests/second per
+endpoint.
+
+Usage (from backend/):
+    python -m benchmarks.run                       # all scenarios, 30 students
+    python -m benchmarks.run --scenario quiz_burst --students 100 --llm-median 2.0
+    python -m benchmarks.run --json results.json   # machine-readable output
+"""
+import argparse
+import asyncio
+import json
+from contextlib import ExitStack
+
+from benchmarks.harness import load_app, Recorder, format_summary
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, Latency
+from benchmarks.scenarios import SCENARIOS
+
+
+def build_fakes(args):
+    seed = args.seed
+    llm = {
+        "default": Latency(args.llm_median, args.llm_sigma, seed),
+        # Tutor replies and video search are shorter generations
+        "text": Latency(args.llm_median / 2, args.llm_sigma, seed + 1),
+        "videos": Latency(args.llm_median / 2, args.llm_sigma, seed + 2),
+    }
+    genai = FakeGenaiClient(latencies=llm, seed=seed, failure_rate=args.failure_rate)
+    supabase = FakeSupabase(db_latency=Latency(args.db_median, 0.3, seed + 3),
+                            storage_latency=Latency(args.storage_median, 0.3, seed + 4))
+    return genai, supabase
+
+
+async def run_scenario(name: str, args) -> dict:
+    from httpx import ASGITransport, AsyncClient
+
+    genai, supabase = build_fakes(args)
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        recorder = Recorder()
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://bench",
+                               timeout=None) as client:
+            await SCENARIOS[name](client, main, recorder, students=args.students, turns=args.turns)
+        recorder.stop()
+        await main.progress_buffer.stop()
+    return {
+        "scenario": name,
+        "endpoints": recorder.summary(),
+        "llm_calls": len(genai.calls),
+        "db_calls": supabase.call_count,
+        "storage_calls": supabase.storage.call_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--turns", type=int, default=6, help="tutor turns per student")
+    parser.add_argument("--llm-median", type=float, default=0.5, help="median Gemini latency (s)")
+    parser.add_argument("--llm-sigma", type=float, default=0.4)
+    parser.add_argument("--db-median", type=float, default=0.02, help="median Supabase query latency (s)")
+    parser.add_argument("--storage-median", type=float, default=0.04, help="median storage latency (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of Gemini calls that fail")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = []
+    for name in names:
+        result = asyncio.run(run_scenario(name, args))
+        results.append(result)
+        print(format_summary(name, result["endpoints"]))
+        print(f"   Gemini calls: {result['llm_calls']}  Supabase queries: {result['db_calls']}  "
+              f"storage calls: {result['storage_calls']}\n")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
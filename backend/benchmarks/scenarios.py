@@ -0,0 +1,103 @@
+"""
+Load scenarios. Each takes an httpx.AsyncClient bound to the app, the loaded
+`main` module and a Recorder, and simulates a classroom's worth of traffic.
+"""
+import asyncio
+import os
+import time
+
+import jwt
+
+from benchmarks.fakes import canned_course_plan
+
+
+def seed_course(main) -> str:
+    """Store a canned course plan and return its id."""
+    return main.save_course_plan_locally(canned_course_plan(), "Benchmark Course")
+
+
+def auth_headers(auth_id: str) -> dict:
+    """A signed access token for `auth_id`, as the Next.js API routes forward it."""
+    token = jwt.encode({"sub": auth_id, "aud": "authenticated", "exp": int(time.time()) + 3600},
+                       os.environ["SUPABASE_SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _enroll(client, recorder, course_id: str, auth_id: str, headers: dict):
+    await recorder.call(client, "POST", "/enroll", "/enroll", headers=headers,
+                        json={"auth_id": auth_id, "course_id": course_id})
+
+
+async def class_opens_topic(client, main, recorder, students: int = 30, **kwargs):
+    """A class opens the course and the same lesson at the same moment."""
+    course_id = seed_course(main)
+
+    async def student(i: int):
+        auth_id = f"00000000-0000-0000-0000-{i:012d}"
+        headers = auth_headers(auth_id)
+        await recorder.call(client, "GET", "/course/{course_id}", f"/course/{course_id}")
+        await _enroll(client, recorder, course_id, auth_id, headers)
+        await recorder.call(client, "POST", "/generate_topic", "/generate_topic",
+                            json={"courseId": course_id, "unitNumber": 1, "subtopicIndex": 0})
+        await recorder.call(client, "POST", "/update_progress/topic", "/update_progress/topic",
+                            headers=headers,
+                            json={"auth_id": auth_id, "course_id": course_id,
+                                  "topic_id": "1-0", "completed": True, "last_visited": "1-0"})
+
+    await asyncio.gather(*(student(i) for i in range(students)))
+
+
+async def quiz_submission_burst(client, main, recorder, students: int = 30, **kwargs):
+    """Everyone submits the unit quiz within the same few seconds."""
+    course_id = seed_course(main)
+    quiz = (await recorder.call(client, "POST", "/generate_module_quiz", "/generate_module_quiz",
+                                json={"courseId": course_id, "unitNumber": 1})).json()
+    mcq_count = len(quiz.get("multipleChoice", []))
+    frq_count = len(quiz.get("freeResponse", []))
+
+    async def student(i: int):
+        auth_id = f"00000000-0000-0000-0001-{i:012d}"
+        headers = auth_headers(auth_id)
+        await _enroll(client, recorder, course_id, auth_id, headers)
+        await recorder.call(client, "POST", "/evaluate_module_quiz", "/evaluate_module_quiz", headers=headers, json={
+            "courseId": course_id,
+            "unitNumber": 1,
+            "mcqAnswers": [(i + q) % 4 for q in range(mcq_count)],
+            "frqAnswers": [f"Student {i} answer {q}" for q in range(frq_count)],
+            "auth_id": auth_id,
+        })
+        await recorder.call(client, "GET", "/module_quiz_status/{course_id}",
+                            f"/module_quiz_status/{course_id}", params={"auth_id": auth_id},
+                            headers=headers)
+
+    await asyncio.gather(*(student(i) for i in range(students)))
+
+
+async def tutor_chat(client, main, recorder, students: int = 30, turns: int = 6, **kwargs):
+    """Learners hold multi-turn Socratic tutor conversations on quiz questions."""
+    course_id = seed_course(main)
+    await recorder.call(client, "POST", "/generate_module_quiz", "/generate_module_quiz",
+                        json={"courseId": course_id, "unitNumber": 1})
+
+    async def student(i: int):
+        session_id = None
+        for turn in range(turns):
+            message = f"I'm stuck on this question, hint {turn + 1} please?"
+            response = await recorder.call(client, "POST", "/quiz_help/text", "/quiz_help/text", json={
+                "courseId": course_id,
+                "unitNumber": 1,
+                "questionIndex": i % 3,
+                "questionType": "mcq",
+                "sessionId": session_id,
+                "studentMessage": message,
+            })
+            session_id = response.json().get("sessionId")
+
+    await asyncio.gather(*(student(i) for i in range(students)))
+
+
+SCENARIOS = {
+    "class_topic": class_opens_topic,
+    "quiz_burst": quiz_submission_burst,
+    "tutor_chat": tutor_chat,
+}
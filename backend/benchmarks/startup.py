@@ -0,0 +1,95 @@
+"""
+Cold-start benchmark: imports `main` in fresh interpreters and reports the
+wall time of the import plus a per-module breakdown from `python -X importtime`.
+
+No network access is needed; clients are built lazily and the storage bucket
+check runs after startup.
+
+Usage (from backend/):
+    python -m benchmarks.startup                 # 5 runs, top 15 modules
+    python -m benchmarks.startup --runs 10 --top 25 --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+TIMED_IMPORT = (
+    "import time; start = time.perf_counter(); import main; "
+    "import sys; print(time.perf_counter() - start); "
+    "print(int('google.genai' in sys.modules), int('supabase' in sys.modules))"
+)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark-key")
+    env.setdefault("SUPABASE_URL", "https://benchmark.supabase.co")
+    env.setdefault("SUPABASE_SECRET_KEY", "benchmark-key")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def time_import() -> dict:
+    """Import main once in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-c", TIMED_IMPORT], cwd=BACKEND_DIR, env=_env(),
+                            capture_output=True, text=True, check=True)
+    seconds, loaded = result.stdout.strip().splitlines()[-2:]
+    genai_loaded, supabase_loaded = loaded.split()
+    return {"seconds": float(seconds), "genai_loaded": genai_loaded == "1",
+            "supabase_loaded": supabase_loaded == "1"}
+
+
+def module_breakdown(top: int) -> list:
+    """
+    Modules imported directly by main (and their transitive imports) ranked
+    by cumulative import time, from `python -X importtime`.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+                            env=_env(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        # main itself has no indent; its direct imports are one level (2 spaces) deeper
+        if len(indent) == 3:
+            rows.append({"module": name, "self_ms": int(self_us) / 1000,
+                         "cumulative_ms": int(cumulative_us) / 1000})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    runs = [time_import() for _ in range(args.runs)]
+    seconds = sorted(r["seconds"] for r in runs)
+    modules = module_breakdown(args.top)
+
+    print(f"import main: median {statistics.median(seconds) * 1000:.0f} ms, "
+          f"min {seconds[0] * 1000:.0f} ms, max {seconds[-1] * 1000:.0f} ms over {args.runs} runs")
+    print(f"google.genai imported at startup: {runs[0]['genai_loaded']}  "
+          f"supabase imported at startup: {runs[0]['supabase_loaded']}\n")
+    print(f"{'module imported by main':<36} {'cumulative ms':>14} {'self ms':>9}")
+    for row in modules:
+        print(f"{row['module']:<36} {row['cumulative_ms']:>14.1f} {row['self_ms']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": runs, "modules": modules}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Generate many courses at once from a CSV or JSONL file.
+
+Each row needs topic, skill_level and age_group; notes (or additional_notes)
+is optional. Course plans, and with --lessons / --quizzes every lesson and
+unit quiz, are generated on a bounded worker pool and written through the
+storage layer under the same filenames the API uses; unit quizzes are also
+banked for personal retakes. Progress is checkpointed after every item, so
+rerunning the same command resumes where it stopped. Rows repeating an
+earlier row's fields are generated once.
+
+Usage (from backend/):
+    python bulk_generate.py courses.csv --lessons --quizzes --workers 8
+    python bulk_generate.py courses.jsonl --checkpoint school_a.checkpoint.json
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+import metrics
+import question_bank
+from attempt_encoding import save_quiz_snapshot
+from course_cache import get_course_data, save_course_plan
+from storage import storage_save
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ("topic", "skill_level", "age_group")
+
+
+def job_key(job: dict) -> str:
+    """Stable id for an input row, so a rerun matches rows to checkpointed courses."""
+    fields = [job["topic"], job["skill_level"], job["age_group"], job["notes"]]
+    return hashlib.sha256(json.dumps(fields).encode("utf-8")).hexdigest()[:16]
+
+
+def read_jobs(path: str) -> List[dict]:
+    """Read course requests from a .csv (with a header row) or .jsonl file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    jobs = []
+    for line, row in enumerate(rows, start=1):
+        missing = [field for field in REQUIRED_FIELDS if not (row.get(field) or "").strip()]
+        if missing:
+            raise ValueError(f"{path} row {line}: missing {', '.join(missing)}")
+        job = {
+            "topic": row["topic"].strip(),
+            "skill_level": row["skill_level"].strip(),
+            "age_group": row["age_group"].strip(),
+            "notes": (row.get("notes") or row.get("additional_notes") or "").strip(),
+        }
+        job["key"] = job_key(job)
+        jobs.append(job)
+    return jobs
+
+
+class Checkpoint:
+    """
+    JSON file mapping each job key to its course id, the items finished so far
+    and the last error of each item that failed. Rewritten atomically after
+    every item so a crash loses at most the items that were in flight.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.jobs: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.jobs = json.load(f)
+
+    def course_id(self, key: str) -> Optional[str]:
+        return self.jobs.get(key, {}).get("course_id")
+
+    def is_done(self, key: str, item: str) -> bool:
+        return item in self.jobs.get(key, {}).get("done", [])
+
+    def set_course(self, key: str, course_id: str) -> None:
+        with self._lock:
+            failed = self.jobs.get(key, {}).get("failed", {})
+            failed.pop("plan", None)
+            self.jobs[key] = {"course_id": course_id, "done": [], "failed": failed}
+            self._save()
+
+    def mark_done(self, key: str, item: str) -> None:
+        with self._lock:
+            self.jobs[key]["done"].append(item)
+            self.jobs[key].get("failed", {}).pop(item, None)
+            self._save()
+
+    def mark_failed(self, key: str, item: str, error: str) -> None:
+        with self._lock:
+            job = self.jobs.setdefault(key, {"course_id": None, "done": []})
+            job.setdefault("failed", {})[item] = error
+            self._save()
+
+    def _save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.jobs, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def course_items(course_plan: dict, lessons: bool, quizzes: bool) -> List[str]:
+    """Checkpoint ids of the lessons ("lesson:<unit>:<index>") and quizzes ("quiz:<unit>") to generate."""
+    items = []
+    for unit in course_plan.get("units", []):
+        unit_number = unit.get("unitNumber")
+        if lessons:
+            items += [f"lesson:{unit_number}:{i}" for i in range(len(unit.get("subtopics", [])))]
+        if quizzes:
+            items.append(f"quiz:{unit_number}")
+    return items
+
+
+def generate_plan(generator, job: dict) -> dict:
+    result = generator.generate_course(
+        topic=job["topic"],
+        skill_level=job["skill_level"],
+        age_group=job["age_group"],
+        additional_notes=job["notes"],
+    )
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
+
+
+def generate_item(generator, course_id: str, course_plan: dict, item: str) -> None:
+    """Generate one lesson or unit quiz and save it where the API would look for it."""
+    kind, unit_number, *rest = item.split(":")
+    unit_number = int(unit_number)
+    unit = next(u for u in course_plan.get("units", []) if u.get("unitNumber") == unit_number)
+    skill_level = course_plan.get("metadata", {}).get("skillLevel", "Intermediate")
+    age_group = course_plan.get("metadata", {}).get("ageGroup", "Adult")
+
+    if kind == "lesson":
+        subtopic_index = int(rest[0])
+        content = generator.generate_topic_content(
+            course_title=course_plan.get("courseTitle"),
+            unit_title=unit.get("title"),
+            subtopic=unit["subtopics"][subtopic_index],
+            skill_level=skill_level,
+            age_group=age_group,
+            additional_context=course_plan.get("description", "")
+        )
+        if "error" in content:
+            raise RuntimeError(content["error"])
+        storage_save(f"{course_id}_topic_{unit_number}_{subtopic_index}.json", content, precompress=True)
+    else:
+        quiz = generator.generate_module_quiz(
+            course_title=course_plan.get("courseTitle"),
+            unit_title=unit.get("title"),
+            unit_description=unit.get("description", ""),
+            subtopics=unit.get("subtopics", []),
+            skill_level=skill_level,
+            age_group=age_group
+        )
+        if "error" in quiz:
+            raise RuntimeError(quiz["error"])
+        question_bank.deposit(course_id, unit_number, quiz)
+        quiz["quizVersion"] = save_quiz_snapshot(course_id, unit_number, quiz)
+        storage_save(f"{course_id}_module_quiz_{unit_number}.json", quiz)
+
+
+def run(jobs: List[dict], checkpoint: Checkpoint, generator, workers: int = 4,
+        lessons: bool = False, quizzes: bool = False) -> dict:
+    """Generate everything `jobs` asks for that `checkpoint` doesn't already have."""
+    stats = {"courses": 0, "courses_resumed": 0, "lessons": 0, "quizzes": 0,
+             "skipped": 0, "duplicates": 0, "failures": []}
+    started = time.perf_counter()
+    tokens_before = metrics.LLM_TOKENS.total()
+    cost_before = metrics.LLM_COST.total()
+
+    unique: Dict[str, dict] = {}
+    for job in jobs:
+        if job["key"] in unique:
+            logger.warning(f"Skipping duplicate row for {job['topic']}")
+            stats["duplicates"] += 1
+        else:
+            unique[job["key"]] = job
+
+    def fail(job: dict, item: str, e: Exception) -> None:
+        logger.error(f"{job['topic']} {item} failed: {e}")
+        stats["failures"].append({"topic": job["topic"], "item": item, "error": str(e)})
+        try:
+            checkpoint.mark_failed(job["key"], item, str(e))
+        except Exception as checkpoint_error:
+            logger.error(f"Could not checkpoint the failure of {job['topic']} {item}: {checkpoint_error}")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk") as pool:
+        futures = {}
+
+        def submit_items(job: dict, course_id: str, course_plan: dict) -> None:
+            for item in course_items(course_plan, lessons, quizzes):
+                if checkpoint.is_done(job["key"], item):
+                    stats["skipped"] += 1
+                    continue
+                futures[pool.submit(generate_item, generator, course_id, course_plan, item)] = (job, item)
+
+        for job in unique.values():
+            course_id = checkpoint.course_id(job["key"])
+            course_data = get_course_data(course_id) if course_id else None
+            if course_data:
+                stats["courses_resumed"] += 1
+                submit_items(job, course_id, course_data["course_plan"])
+            else:
+                futures[pool.submit(generate_plan, generator, job)] = (job, "plan")
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, item = futures.pop(future)
+                try:
+                    result = future.result()
+                    if item == "plan":
+                        course_id = save_course_plan(result, job["topic"])
+                        checkpoint.set_course(job["key"], course_id)
+                    else:
+                        checkpoint.mark_done(job["key"], item)
+                except Exception as e:
+                    fail(job, item, e)
+                    continue
+                if item == "plan":
+                    stats["courses"] += 1
+                    logger.info(f"Planned {job['topic']} as {course_id}")
+                    submit_items(job, course_id, result)
+                else:
+                    stats["lessons" if item.startswith("lesson") else "quizzes"] += 1
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["tokens"] = metrics.LLM_TOKENS.total() - tokens_before
+    stats["cost_usd"] = metrics.LLM_COST.total() - cost_before
+    return stats
+
+
+def format_summary(stats: dict) -> str:
+    generated = stats["courses"] + stats["lessons"] + stats["quizzes"]
+    minutes = max(stats["seconds"], 1e-9) / 60
+    lines = [
+        f"Courses planned: {stats['courses']} (resumed: {stats['courses_resumed']})",
+        f"Lessons: {stats['lessons']}  Quizzes: {stats['quizzes']}  "
+        f"Already done: {stats['skipped']}  Duplicate rows: {stats['duplicates']}  "
+        f"Failed: {len(stats['failures'])}",
+        f"Elapsed: {stats['seconds']:.1f}s  Throughput: {generated / minutes:.1f} items/min "
+        f"({stats['courses'] / minutes:.1f} courses/min)",
+        f"Gemini tokens: {stats['tokens']:.0f}  Estimated cost: ${stats['cost_usd']:.4f}",
+    ]
+    for failure in stats["failures"]:
+        lines.append(f"  FAILED {failure['topic']} [{failure['item']}]: {failure['error']}")
+    if stats["failures"]:
+        lines.append("Rerun the same command to retry failed items.")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or JSONL file of courses to generate")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent generation calls")
+    parser.add_argument("--lessons", action="store_true", help="also generate every lesson")
+    parser.add_argument("--quizzes", action="store_true", help="also generate every unit quiz")
+    parser.add_argument("--checkpoint", help="progress file (default: <input>.checkpoint.json)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    from log_config import setup_logging
+    setup_logging()
+    from course_generator import CourseGenerator
+
+    jobs = read_jobs(args.input)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.input}.checkpoint.json")
+    stats = run(jobs, checkpoint, CourseGenerator(), workers=args.workers,
+                lessons=args.lessons, quizzes=args.quizzes)
+    print(format_summary(stats))
+    sys.exit(1 if stats["failures"] else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+"""
+Cohort analytics over quiz attempts.
+
+Loads a course's quiz_attempts into columnar NumPy arrays, one response
+matrix (attempts x questions) per quiz version, and folds them into additive
+sufficient statistics:
+
+  units      attempts, passes, score sum and a 10-point score histogram
+  questions  keyed by question_bank.question_id, so a question reused across
+             quiz versions is one item: responses, sums of the item score x,
+             x^2, x*y and misses, plus sums of the attempt percentage y and y^2
+  subtopics  responses and misses per relatedSubtopic
+
+Difficulty (mean item score), discrimination (correlation of item score with
+the attempt percentage) and miss rates are derived from these when a report is
+built, so new attempts are folded in without revisiting old ones. Statistics
+and the last processed attempt `seq` are cached per course in storage.
+
+Needs the seq column from sql/cohort_analytics.sql. Refresh courses offline
+(from backend/):
+    python cohort_analytics.py <course_id> [<course_id> ...]
+"""
+import sys
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from attempt_encoding import load_quiz_snapshot
+from database import supabase
+from question_bank import question_id
+from storage import storage_save, storage_load
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+BATCH_SIZE = 1000
+# Attempts newer than this are left for the next refresh, so one whose insert
+# commits after a later-numbered attempt isn't skipped past by the cursor
+SETTLE_SECONDS = 10
+# An item score below this counts as a miss (the weak-subtopic bar used when grading)
+MISS_BELOW = 0.8
+HISTOGRAM_BINS = np.arange(0, 101, 10)
+
+ATTEMPT_COLUMNS = "seq,unit_number,quiz_version,percentage,passed,mcq_correct,frq_scores,created_at"
+
+
+def cache_filename(course_id: str) -> str:
+    return f"{course_id}_cohort_analytics.json"
+
+
+def empty_stats() -> dict:
+    return {"version": CACHE_VERSION, "cursor": 0, "attempts": 0, "units": {}, "questions": {}, "subtopics": {}}
+
+
+def fetch_attempts(course_id: str, after: int, limit: int = BATCH_SIZE) -> List[dict]:
+    """Attempts for the course with seq > `after`, oldest first."""
+    return supabase.table("quiz_attempts").select(ATTEMPT_COLUMNS).eq("course_id", course_id).gt(
+        "seq", after
+    ).order("seq", desc=False).limit(limit).execute().data
+
+
+def settled(rows: List[dict], now: Optional[datetime] = None) -> List[dict]:
+    """The leading rows old enough to be folded in; stops at the first recent one."""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(seconds=SETTLE_SECONDS)
+    for i, row in enumerate(rows):
+        created = row.get("created_at")
+        if created and datetime.fromisoformat(created) > cutoff:
+            return rows[:i]
+    return rows
+
+
+def _items(quiz: dict) -> List[dict]:
+    """Question descriptors in response-matrix column order: MCQs, then FRQs."""
+    items = [{"id": question_id("mcq", q), "kind": "mcq", "subtopic": q.get("relatedSubtopic", ""),
+              "question": q.get("question", "")} for q in quiz.get("multipleChoice", [])]
+    items += [{"id": question_id("frq", q), "kind": "frq", "subtopic": q.get("relatedSubtopic", ""),
+               "question": q.get("question", ""), "maxPoints": q.get("maxPoints", 3)}
+              for q in quiz.get("freeResponse", [])]
+    return items
+
+
+def _responses(rows: List[dict], items: List[dict]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Item scores in [0, 1] as an attempts x items matrix, and the attempt
+    percentages. Rows whose answers don't line up with the quiz are dropped.
+    """
+    n_mcq = sum(1 for item in items if item["kind"] == "mcq")
+    max_points = np.array([item["maxPoints"] for item in items[n_mcq:]], dtype=float)
+    fitting = [r for r in rows if len(r.get("mcq_correct") or []) == n_mcq
+               and len(r.get("frq_scores") or []) == len(max_points)]
+    if not fitting:
+        return None
+    mcq = np.array([r["mcq_correct"] for r in fitting], dtype=float).reshape(len(fitting), n_mcq)
+    frq = np.array([r["frq_scores"] for r in fitting], dtype=float).reshape(len(fitting), len(max_points))
+    percentages = np.array([r["percentage"] for r in fitting], dtype=float)
+    return np.hstack([mcq, frq / np.maximum(max_points, 1)]), percentages
+
+
+def _fold_scores(stats: dict, unit_number: int, y: np.ndarray, passed: np.ndarray) -> None:
+    unit = stats["units"].setdefault(str(unit_number), {
+        "attempts": 0, "passed": 0, "scoreSum": 0.0, "histogram": [0] * (len(HISTOGRAM_BINS) - 1),
+    })
+    unit["attempts"] += int(y.size)
+    unit["passed"] += int(passed.sum())
+    unit["scoreSum"] += float(y.sum())
+    counts, _ = np.histogram(np.clip(y, 0, 100), bins=HISTOGRAM_BINS)
+    unit["histogram"] = (np.array(unit["histogram"]) + counts).tolist()
+
+
+def _fold_items(stats: dict, unit_number: int, items: List[dict], x: np.ndarray, y: np.ndarray) -> None:
+    n = x.shape[0]
+    sx, sxx, sxy = x.sum(axis=0), (x * x).sum(axis=0), x.T @ y
+    misses = (x < MISS_BELOW).sum(axis=0)
+    sy, syy = float(y.sum()), float((y * y).sum())
+    for j, item in enumerate(items):
+        q = stats["questions"].setdefault(item["id"], {
+            "unitNumber": unit_number, "kind": item["kind"], "subtopic": item["subtopic"],
+            "question": item["question"], "n": 0, "sx": 0.0, "sxx": 0.0, "sxy": 0.0, "sy": 0.0, "syy": 0.0,
+            "misses": 0,
+        })
+        q["n"] += n
+        q["sx"] += float(sx[j])
+        q["sxx"] += float(sxx[j])
+        q["sxy"] += float(sxy[j])
+        q["sy"] += sy
+        q["syy"] += syy
+        q["misses"] += int(misses[j])
+
+    # Per-subtopic totals from the per-item columns
+    names = sorted({item["subtopic"] for item in items if item["subtopic"]})
+    if not names:
+        return
+    index = {name: i for i, name in enumerate(names)}
+    known = np.array([bool(item["subtopic"]) for item in items])
+    columns = np.array([index.get(item["subtopic"], 0) for item in items])[known]
+    answered = np.bincount(columns, minlength=len(names)) * n
+    missed = np.bincount(columns, weights=misses[known], minlength=len(names))
+    for name, i in index.items():
+        sub = stats["subtopics"].setdefault(name, {"responses": 0, "misses": 0})
+        sub["responses"] += int(answered[i])
+        sub["misses"] += int(missed[i])
+
+
+def fold(stats: dict, course_id: str, rows: List[dict],
+         load_quiz: Callable[[str, int, str], Optional[dict]] = load_quiz_snapshot) -> dict:
+    """Add a batch of attempt rows to `stats` (in place) and advance its cursor."""
+    groups: Dict[tuple, List[dict]] = defaultdict(list)
+    for row in rows:
+        groups[(row["unit_number"], row.get("quiz_version"))].append(row)
+
+    for (unit_number, version), group in groups.items():
+        y = np.array([r["percentage"] for r in group], dtype=float)
+        _fold_scores(stats, unit_number, y, np.array([bool(r["passed"]) for r in group]))
+        quiz = load_quiz(course_id, unit_number, version) if version else None
+        if quiz is None:
+            # Legacy rows (see attempt_encoding.py) count toward scores only
+            continue
+        items = _items(quiz)
+        matrix = _responses(group, items) if items else None
+        if matrix is not None:
+            _fold_items(stats, unit_number, items, *matrix)
+
+    stats["attempts"] += len(rows)
+    if rows:
+        stats["cursor"] = max(stats["cursor"], max(r["seq"] for r in rows))
+    return stats
+
+
+def refresh(course_id: str, batch_size: int = BATCH_SIZE) -> dict:
+    """The course's cached statistics with every settled attempt since the last refresh folded in."""
+    stats = storage_load(cache_filename(course_id))
+    if not stats or stats.get("version") != CACHE_VERSION:
+        stats = empty_stats()
+
+    changed = False
+    while True:
+        rows = fetch_attempts(course_id, stats["cursor"], batch_size)
+        ready = settled(rows)
+        if ready:
+            fold(stats, course_id, ready)
+            changed = True
+        if len(ready) < batch_size:
+            break
+    if changed:
+        storage_save(cache_filename(course_id), stats)
+    return stats
+
+
+def report(stats: dict) -> dict:
+    """Derived cohort statistics: score distributions, subtopic miss rates, item difficulty and discrimination."""
+    units = [{
+        "unitNumber": int(number),
+        "attempts": unit["attempts"],
+        "passRate": unit["passed"] / unit["attempts"] if unit["attempts"] else None,
+        "meanScore": unit["scoreSum"] / unit["attempts"] if unit["attempts"] else None,
+        "histogram": [{"from": int(lo), "to": int(hi), "count": count}
+                      for lo, hi, count in zip(HISTOGRAM_BINS[:-1], HISTOGRAM_BINS[1:], unit["histogram"])],
+    } for number, unit in sorted(stats["units"].items(), key=lambda kv: int(kv[0]))]
+
+    subtopics = sorted(({
+        "subtopic": name,
+        "responses": sub["responses"],
+        "missRate": sub["misses"] / sub["responses"] if sub["responses"] else None,
+    } for name, sub in stats["subtopics"].items()), key=lambda s: -(s["missRate"] or 0))
+
+    ids = list(stats["questions"])
+    questions = []
+    if ids:
+        q = stats["questions"]
+        n, sx, sxx, sxy, sy, syy = (np.array([q[i][k] for i in ids], dtype=float)
+                                    for k in ("n", "sx", "sxx", "sxy", "sy", "syy"))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            difficulty = sx / n
+            # Pearson r between item score and attempt percentage (point-biserial for MCQs)
+            discrimination = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+        for j, i in enumerate(ids):
+            questions.append({
+                "questionId": i,
+                "unitNumber": q[i]["unitNumber"],
+                "kind": q[i]["kind"],
+                "subtopic": q[i]["subtopic"],
+                "question": q[i]["question"],
+                "responses": q[i]["n"],
+                "difficulty": float(difficulty[j]) if np.isfinite(difficulty[j]) else None,
+                "discrimination": float(discrimination[j]) if np.isfinite(discrimination[j]) else None,
+            })
+        questions.sort(key=lambda item: (item["difficulty"] is None, item["difficulty"]))
+
+    return {
+        "attempts": stats["attempts"],
+        "units": units,
+        "subtopics": subtopics,
+        "questions": questions,
+    }
+
+
+def cohort_report(course_id: str) -> dict:
+    return report(refresh(course_id))
+
+
+if __name__ == '__main__':
+    for course in sys.argv[1:]:
+        result = refresh(course)
+        print(f"{course}: {result['attempts']} attempts through seq {result['cursor']}")
@@ -0,0 +1,118 @@
+"""
+Gzip for response bodies.
+
+Lessons (several markdown sections, a quiz and the searchAttribution HTML)
+and module quizzes (full explanations) are tens of kilobytes of JSON that
+compress 4-8x. `CompressionMiddleware` gzips responses of a compressible
+content type once they reach MIN_SIZE, for clients that accept gzip.
+
+Objects that are read far more often than written (course plans, complete
+lessons) are compressed once, at maximum level, when they are saved
+(precompress.py via storage.save_compressed), and the routes serve those
+bytes as they are through `precompressed_response`; the middleware leaves
+any response that already has a Content-Encoding alone.
+
+Compare bytes on the wire and CPU per response with:
+    python -m benchmarks.compression
+"""
+import os
+import gzip
+import zlib
+
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+# Smaller bodies fit in a packet or two; gzip's header and CPU aren't worth it
+MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+# Per-request level: most of level 9's ratio at a fraction of its CPU
+LEVEL = int(os.getenv("RESPONSE_COMPRESSION_LEVEL", "6"))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def accepts_gzip(headers) -> bool:
+    """Whether an Accept-Encoding header allows gzip (and doesn't refuse it with q=0)."""
+    for part in headers.get("accept-encoding", "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def precompressed_response(body: bytes) -> Response:
+    """A JSON response from an already gzipped body."""
+    return Response(content=body, media_type="application/json",
+                    headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+
+
+def _compressible(headers: MutableHeaders) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware gzipping compressible responses for clients that accept it.
+
+    A body sent in one piece is compressed when it reaches `minimum_size`; a
+    streamed body is compressed chunk by chunk, each flushed so the client
+    still sees it as soon as it is sent.
+    """
+
+    def __init__(self, app, minimum_size: int = MIN_SIZE, level: int = LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not accepts_gzip(Headers(scope=scope)):
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _GzipResponder(send, self.minimum_size, self.level).send)
+
+
+class _GzipResponder:
+    def __init__(self, send, minimum_size: int, level: int):
+        self._send = send
+        self.minimum_size = minimum_size
+        self.level = level
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+        body, more = message.get("body", b""), message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            if not _compressible(headers) or (not more and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            if not more:
+                body = gzip.compress(body, compresslevel=self.level, mtime=0)
+                headers["Content-Length"] = str(len(body))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            self.compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            await self._send(self.start)
+
+        chunk = self.compressor.compress(body)
+        chunk += self.compressor.flush(zlib.Z_SYNC_FLUSH if more else zlib.Z_FINISH)
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more})
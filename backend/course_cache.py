@@ -0,0 +1,72 @@
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from course_index import index_course
+from storage import save_compressed, storage_load, storage_save
+from topic_bitmap import topic_ids, topic_positions
+
+# Course plans are written once by /generate_course and never modified, so
+# they can be cached for the life of the process.
+_COURSE_CACHE: Dict[str, dict] = {}
+_COURSE_CACHE_MAX = 512
+_TOPIC_INDEX: Dict[str, Tuple[List[str], Dict[str, int]]] = {}
+
+
+def get_course_data(course_id: str) -> Optional[dict]:
+    """Load `{course_id}.json` from storage, served from memory after the first read."""
+    cached = _COURSE_CACHE.get(course_id)
+    if cached is not None:
+        return cached
+    data = storage_load(f"{course_id}.json")
+    if data is not None:
+        if len(_COURSE_CACHE) >= _COURSE_CACHE_MAX:
+            evicted = next(iter(_COURSE_CACHE))
+            _COURSE_CACHE.pop(evicted)
+            _TOPIC_INDEX.pop(evicted, None)
+        _COURSE_CACHE[course_id] = data
+    return data
+
+
+def save_course_plan(course_plan: dict, topic: str) -> str:
+    """
+    Save a course plan to Supabase Storage and add it to the search index.
+    Returns the course ID (filename without extension).
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    unique_id = str(uuid.uuid4())[:8]
+    safe_topic = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in topic)[:50]
+    course_id = f"{timestamp}_{safe_topic}_{unique_id}"
+
+    data_to_save = {
+        "course_id": course_id,
+        "saved_at": datetime.now().isoformat(),
+        "topic": topic,
+        "course_plan": course_plan
+    }
+
+    storage_save(f"{course_id}.json", data_to_save)
+    # What GET /course/{course_id} returns, compressed once for every later read
+    save_compressed(f"{course_id}.json", {"course_id": course_id, **course_plan})
+    index_course(course_id, course_plan, topic, data_to_save["saved_at"])
+    return course_id
+
+
+def unit_numbers(course_id: str) -> List[int]:
+    data = get_course_data(course_id)
+    if not data:
+        return []
+    return [u.get("unitNumber") for u in data.get("course_plan", {}).get("units", [])]
+
+
+def topic_index(course_id: str) -> Tuple[List[str], Dict[str, int]]:
+    """Topic ids in bitmap order and their positions, computed once per course."""
+    cached = _TOPIC_INDEX.get(course_id)
+    if cached is not None:
+        return cached
+    data = get_course_data(course_id)
+    if not data:
+        return [], {}
+    ids = topic_ids(data.get("course_plan", {}))
+    _TOPIC_INDEX[course_id] = (ids, topic_positions(ids))
+    return _TOPIC_INDEX[course_id]
@@ -1,12 +1,14 @@
 import os
-import re
 import json
-import requests
-from google import genai
-from google.genai import types
+import re
+import logging
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field
 from pathlib import Path
+from llm import generate_content, generate_json, LazyClient
+from prompt_budget import fit
+
+logger = logging.getLogger(__name__)
 
 # --- Pydantic Models for Structured Output ---
 
@@ -55,6 +57,16 @@ class TopicContent(BaseModel):
     sections: List[TopicSection] = Field(description="Content sections")
     quiz: List[QuizQuestion] = Field(description="Quiz questions for this topic")
 
+class TopicOpening(BaseModel):
+    title: str = Field(description="Title of the topic/lesson")
+    outline: List[str] = Field(description="Headings of all sections of the lesson, in order, starting with the first")
+    firstSection: TopicSection = Field(description="The introduction and first section, written in full")
+
+class TopicRemainder(BaseModel):
+    sections: List[TopicSection] = Field(description="The sections after the first, in outline order")
+    quiz: List[QuizQuestion] = Field(description="Quiz questions for this topic")
+    firstSectionVideos: List[VideoReference] = Field(default=[], description="Videos relevant to the first section, selected from provided options")
+
 class FreeResponseQuestion(BaseModel):
     question: str = Field(description="The free response question prompt")
     sampleAnswer: str = Field(description="A complete sample correct answer")
@@ -77,14 +89,16 @@ class QuizEvaluationResult(BaseModel):
     frqEvaluations: List[FRQEvaluation] = Field(description="Evaluation for each free response question")
     overallFeedback: str = Field(description="Overall feedback on the student's performance")
 
+class AnswerEvaluation(BaseModel):
+    answerIndex: int = Field(description="Index of the student answer (0-based)")
+    score: int = Field(description="Score awarded (0 to maxPoints)")
+    feedback: str = Field(description="Feedback explaining what the student got right or wrong")
+
+class BatchEvaluationResult(BaseModel):
+    evaluations: List[AnswerEvaluation] = Field(description="Evaluation for each student answer")
+
 class CourseGenerator:
-    def __init__(self):
-        try:
-            self.client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
-            self.model_name = "gemini-3-flash-preview" 
-        except Exception as e:
-            print(f"Error initializing Gemini client: {e}")
-            raise e
+    client = LazyClient()
 
     def _load_prompt(self) -> str:
         prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'course_plan.txt')
@@ -93,52 +107,48 @@ class CourseGenerator:
 
     def generate_course(self, topic: str, skill_level: str, age_group: str, 
                        additional_notes: str = "", materials_text: str = "",
-                       file_data: bytes = None, mime_type: str = None) -> Dict[str, Any]:
+                       file_data: bytes = None, mime_type: str = None,
+                       file_uri: str = None) -> Dict[str, Any]:
         
         system_template = self._load_prompt()
         
-        # Format the prompt with user inputs
+        # Format the prompt with user inputs, cut down to the task's token budget
         formatted_prompt = system_template.format(
             topic=topic,
             skill_level=skill_level,
             age_group=age_group,
-            additional_notes=additional_notes,
-            materials_text=materials_text
+            additional_notes=fit(additional_notes, "course_plan", "additional_notes"),
+            materials_text=fit(materials_text, "course_plan", "materials_text",
+                               query=f"{topic} {additional_notes}")
         )
 
         contents = [formatted_prompt]
 
-        if file_data and mime_type:
+        from google.genai import types
+
+        if file_uri and mime_type:
+            # Reference a file already uploaded through the Files API
+            contents.append(
+                types.Part.from_uri(file_uri=file_uri, mime_type=mime_type)
+            )
+        elif file_data and mime_type:
             # Add the file content to the request
             contents.append(
                 types.Part.from_bytes(data=file_data, mime_type=mime_type)
             )
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=contents,
-                config={
-                    'response_mime_type': 'application/json',
-                    'response_schema': CoursePlan 
-                }
-            )
-            
-            # Parse the JSON response
-            if response.text:
-                print("DEBUG: Gemini Response:", response.text)
-                # When using response_schema, the text is a JSON string matching the schema
-                return json.loads(response.text)
-            else:
-                raise ValueError("Empty response from Gemini")
+            return generate_json(self.client, "course_plan", CoursePlan, contents=contents)
 
         except Exception as e:
-            print(f"Error generating course: {e}")
+            logger.error(f"Error generating course: {e}")
             # Fallback or error handling
             return {"error": str(e)}
 
     def _validate_video_url(self, url: str) -> bool:
         """Check if a video URL is valid and accessible."""
+        import requests
+
         try:
             # For YouTube URLs, use the oEmbed endpoint (fast, no API key needed)
             yt_match = re.search(r'(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]{11})', url)
@@ -153,7 +163,9 @@ class CourseGenerator:
             return False
 
     def fetch_videos(self, topic: str, course_title: str = "") -> Dict[str, Any]:
-        """Fetch relevant educational videos using Gemini 2.5 Flash with Google Search grounding."""
+        """Fetch relevant educational videos using Gemini with Google Search grounding."""
+        from google.genai import types
+
         search_tool = types.Tool(
             google_search=types.GoogleSearch()
         )
@@ -173,8 +185,8 @@ For each video, provide the following in this exact format:
 Only include videos that are directly educational and relevant to the topic."""
 
         try:
-            response = self.client.models.generate_content(
-                model='gemini-2.5-flash',
+            response = generate_content(
+                self.client, "video_search",
                 contents=prompt,
                 config=types.GenerateContentConfig(
                     tools=[search_tool]
@@ -198,7 +210,7 @@ Only include videos that are directly educational and relevant to the topic."""
                                 "creatorName": creator_match.group(1).strip() if creator_match else "Unknown"
                             })
                         else:
-                            print(f"Skipping unavailable video: {video_url}")
+                            logger.info(f"Skipping unavailable video: {video_url}")
 
             # Extract Google Search attribution
             search_attribution = ""
@@ -212,7 +224,7 @@ Only include videos that are directly educational and relevant to the topic."""
             return {"videos": videos, "searchAttribution": search_attribution}
 
         except Exception as e:
-            print(f"Error fetching videos: {e}")
+            logger.error(f"Error fetching videos: {e}")
             return {"videos": [], "searchAttribution": ""}
 
     def _load_topic_prompt(self) -> str:
@@ -228,14 +240,7 @@ Only include videos that are directly educational and relevant to the topic."""
         available_videos = video_data.get("videos", [])
         search_attribution = video_data.get("searchAttribution", "")
 
-        # Format video list for the prompt
-        if available_videos:
-            video_list_text = "\n".join(
-                f"- Title: {v['title']}, Creator: {v['creatorName']}, URL: {v['url']}"
-                for v in available_videos
-            )
-        else:
-            video_list_text = "No videos available."
+        video_list_text = self._format_video_list(available_videos)
 
         system_template = self._load_topic_prompt()
 
@@ -245,29 +250,80 @@ Only include videos that are directly educational and relevant to the topic."""
             subtopic=subtopic,
             skill_level=skill_level,
             age_group=age_group,
-            additional_context=additional_context,
+            additional_context=fit(additional_context, "topic_content", "additional_context"),
             available_videos=video_list_text
         )
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[formatted_prompt],
-                config={
-                    'response_mime_type': 'application/json',
-                    'response_schema': TopicContent
-                }
-            )
+            result = generate_json(self.client, "topic_content", TopicContent, contents=[formatted_prompt])
+            # Attach search attribution for Google branding
+            result["searchAttribution"] = search_attribution
+            return result
+        except Exception as e:
+            logger.error(f"Error generating topic content: {e}")
+            return {"error": str(e)}
 
-            if response.text:
-                result = json.loads(response.text)
-                # Attach search attribution for Google branding
-                result["searchAttribution"] = search_attribution
-                return result
-            else:
-                raise ValueError("Empty response from Gemini")
+    def _format_video_list(self, videos: List[Dict[str, str]]) -> str:
+        if not videos:
+            return "No videos available."
+        return "\n".join(
+            f"- Title: {v['title']}, Creator: {v['creatorName']}, URL: {v['url']}"
+            for v in videos
+        )
+
+    def _load_topic_opening_prompt(self) -> str:
+        prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'topic_opening.txt')
+        with open(prompt_path, 'r') as f:
+            return f.read()
+
+    def _load_topic_remainder_prompt(self) -> str:
+        prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'topic_remainder.txt')
+        with open(prompt_path, 'r') as f:
+            return f.read()
+
+    def generate_topic_opening(self, course_title: str, unit_title: str, subtopic: str,
+                               skill_level: str, age_group: str, additional_context: str = "") -> Dict[str, Any]:
+        """Outline plus the first section of a lesson; a short call so reading can start quickly."""
+        formatted_prompt = self._load_topic_opening_prompt().format(
+            course_title=course_title,
+            unit_title=unit_title,
+            subtopic=subtopic,
+            skill_level=skill_level,
+            age_group=age_group,
+            additional_context=fit(additional_context, "topic_content", "additional_context")
+        )
+
+        try:
+            return generate_json(self.client, "topic_opening", TopicOpening, contents=[formatted_prompt])
+        except Exception as e:
+            logger.error(f"Error generating topic opening: {e}")
+            return {"error": str(e)}
+
+    def generate_topic_remainder(self, course_title: str, unit_title: str, subtopic: str,
+                                 skill_level: str, age_group: str, title: str, outline: List[str],
+                                 first_section: Dict[str, Any], additional_context: str = "") -> Dict[str, Any]:
+        """The sections after `first_section`, the topic quiz and video placement."""
+        video_data = self.fetch_videos(subtopic, course_title)
+
+        formatted_prompt = self._load_topic_remainder_prompt().format(
+            course_title=course_title,
+            unit_title=unit_title,
+            subtopic=subtopic,
+            skill_level=skill_level,
+            age_group=age_group,
+            additional_context=fit(additional_context, "topic_content", "additional_context"),
+            title=title,
+            outline="\n".join(f"{i + 1}. {heading}" for i, heading in enumerate(outline)),
+            first_section=f"## {first_section.get('heading', '')}\n\n{first_section.get('content', '')}",
+            available_videos=self._format_video_list(video_data.get("videos", []))
+        )
+
+        try:
+            result = generate_json(self.client, "topic_remainder", TopicRemainder, contents=[formatted_prompt])
+            result["searchAttribution"] = video_data.get("searchAttribution", "")
+            return result
         except Exception as e:
-            print(f"Error generating topic content: {e}")
+            logger.error(f"Error generating remaining topic content: {e}")
             return {"error": str(e)}
 
     def _load_module_quiz_prompt(self) -> str:
@@ -286,10 +342,10 @@ Only include videos that are directly educational and relevant to the topic."""
             "",
             "**ADAPTIVE RETAKE INSTRUCTIONS:**",
             f"This is a retake quiz. The student's most recent score was {last_score}%.",
-            "The student struggled with these subtopics (number = how many recent attempts missed it):"
+            "The student has not yet mastered these subtopics (estimated mastery, weakest first):"
         ]
-        for subtopic, count in sorted(weak.items(), key=lambda x: -x[1]):
-            lines.append(f"  - {subtopic} (missed {count} time{'s' if count > 1 else ''})")
+        for subtopic, mastery in sorted(weak.items(), key=lambda x: x[1]):
+            lines.append(f"  - {subtopic} ({round(mastery * 100)}% mastered)")
         lines.append("")
         lines.append("Please:")
         lines.append("- Allocate MORE questions to the weak subtopics listed above.")
@@ -305,7 +361,7 @@ Only include videos that are directly educational and relevant to the topic."""
         formatted_prompt = system_template.format(
             course_title=course_title,
             unit_title=unit_title,
-            unit_description=unit_description,
+            unit_description=fit(unit_description, "module_quiz", "unit_description"),
             subtopics="\n".join(f"- {s}" for s in subtopics),
             skill_level=skill_level,
             age_group=age_group,
@@ -313,20 +369,9 @@ Only include videos that are directly educational and relevant to the topic."""
         )
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[formatted_prompt],
-                config={
-                    'response_mime_type': 'application/json',
-                    'response_schema': ModuleQuizContent
-                }
-            )
-            if response.text:
-                return json.loads(response.text)
-            else:
-                raise ValueError("Empty response from Gemini")
+            return generate_json(self.client, "module_quiz", ModuleQuizContent, contents=[formatted_prompt])
         except Exception as e:
-            print(f"Error generating module quiz: {e}")
+            logger.error(f"Error generating module quiz: {e}")
             return {"error": str(e)}
 
     def _load_quiz_evaluation_prompt(self) -> str:
@@ -338,13 +383,14 @@ Only include videos that are directly educational and relevant to the topic."""
                             skill_level: str, age_group: str) -> Dict[str, Any]:
         system_template = self._load_quiz_evaluation_prompt()
 
-        questions_text = ""
-        for i, (q, ans) in enumerate(zip(frq_questions, frq_answers)):
-            questions_text += f"\n--- Question {i+1} (Max {q['maxPoints']} points) ---\n"
-            questions_text += f"Question: {q['question']}\n"
-            questions_text += f"Sample Answer: {q['sampleAnswer']}\n"
-            questions_text += f"Key Points: {', '.join(q['keyPoints'])}\n"
-            questions_text += f"Student's Answer: {ans}\n"
+        questions_text = "".join(
+            f"\n--- Question {i+1} (Max {q['maxPoints']} points) ---\n"
+            f"Question: {q['question']}\n"
+            f"Sample Answer: {fit(q['sampleAnswer'], 'quiz_evaluation', 'sample_answer')}\n"
+            f"Key Points: {', '.join(q['keyPoints'])}\n"
+            f"Student's Answer: {fit(ans, 'quiz_evaluation', 'student_answer')}\n"
+            for i, (q, ans) in enumerate(zip(frq_questions, frq_answers))
+        )
 
         formatted_prompt = system_template.format(
             questions_text=questions_text,
@@ -353,18 +399,37 @@ Only include videos that are directly educational and relevant to the topic."""
         )
 
         try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[formatted_prompt],
-                config={
-                    'response_mime_type': 'application/json',
-                    'response_schema': QuizEvaluationResult
-                }
-            )
-            if response.text:
-                return json.loads(response.text)
-            else:
-                raise ValueError("Empty response from Gemini")
+            return generate_json(self.client, "quiz_evaluation", QuizEvaluationResult, contents=[formatted_prompt])
+        except Exception as e:
+            logger.error(f"Error evaluating quiz: {e}")
+            return {"error": str(e)}
+
+    def evaluate_frq_batch(self, question: Dict, answers: List[str],
+                           skill_level: str, age_group: str) -> Dict[str, Any]:
+        """Grade many students' answers to one free response question in a single call (batch_grading.py)."""
+        prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'batch_quiz_evaluation.txt')
+        with open(prompt_path, 'r') as f:
+            system_template = f.read()
+
+        # JSON-encoded so an answer can't close its own entry and pose as another one
+        answers_text = json.dumps([
+            {"answerIndex": i, "answer": fit(ans, 'quiz_evaluation', 'student_answer')}
+            for i, ans in enumerate(answers)
+        ], ensure_ascii=False, indent=1)
+
+        formatted_prompt = system_template.format(
+            question=question['question'],
+            max_points=question.get('maxPoints', 3),
+            sample_answer=fit(question['sampleAnswer'], 'quiz_evaluation', 'sample_answer'),
+            key_points=', '.join(question['keyPoints']),
+            answers_text=answers_text,
+            skill_level=skill_level,
+            age_group=age_group
+        )
+
+        try:
+            return generate_json(self.client, "quiz_evaluation_batch", BatchEvaluationResult,
+                                 contents=[formatted_prompt])
         except Exception as e:
-            print(f"Error evaluating quiz: {e}")
+            logger.error(f"Error evaluating answer batch: {e}")
             return {"error": str(e)}
@@ -0,0 +1,245 @@
+"""
+Search index over generated courses.
+
+Course plans are stored under opaque ids, so before paying for a generation
+we look for an existing course on the same subject. Every saved course plan
+is added to an inverted index: its topic, title, description, unit titles
+and subtopics are tokenised into per-course term frequencies (weighted by
+field, see FIELD_WEIGHTS) and stored as postings next to the course's skill
+level and age group. A query only reads the postings of its own terms and
+ranks the courses with BM25.
+
+The index lives in a SQLite file (WAL mode) shared by every worker on the
+host and is updated by course_cache.save_course_plan. A new host starts
+empty; fill it from storage (from backend/):
+    python course_index.py [<course_id> ...]
+"""
+import os
+import re
+import sys
+import math
+import sqlite3
+import logging
+import tempfile
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from storage import storage_list, storage_load
+
+logger = logging.getLogger(__name__)
+
+COURSE_INDEX_PATH = os.getenv(
+    "COURSE_INDEX_PATH", os.path.join(tempfile.gettempdir(), "claritas-course-index.db")
+)
+# Term weight by the field it occurs in
+FIELD_WEIGHTS = {"topic": 3.0, "title": 3.0, "unit": 2.0, "subtopic": 1.0, "description": 1.0}
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# A course counts as similar when it matches this share of the requested topic's terms
+SIMILAR_COVERAGE = float(os.getenv("SIMILAR_COURSE_COVERAGE", "0.6"))
+MAX_RESULTS = 50
+# Distinct query terms a search looks up; keeps the IN (...) lists well under
+# SQLite's bound-variable limit however long the query string is
+MAX_QUERY_TERMS = 32
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in into intro introduction is it of on or the to with your".split()
+)
+
+
+def normalize(term: str) -> str:
+    """Fold a plural onto its singular, so "atoms" finds "atom"."""
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def tokens(text: str) -> List[str]:
+    return [normalize(w) for w in _WORD.findall((text or "").lower()) if w not in STOPWORDS]
+
+
+def course_terms(course_plan: dict, topic: str = "") -> Dict[str, float]:
+    """Field-weighted term frequencies of a course plan."""
+    fields = [("topic", topic), ("title", course_plan.get("courseTitle", "")),
+              ("description", course_plan.get("description", ""))]
+    for unit in course_plan.get("units", []):
+        fields.append(("unit", unit.get("title", "")))
+        fields += [("subtopic", s) for s in unit.get("subtopics", [])]
+    weights: Dict[str, float] = defaultdict(float)
+    for field, text in fields:
+        for term in tokens(text):
+            weights[term] += FIELD_WEIGHTS[field]
+    return dict(weights)
+
+
+def _key(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+class CourseIndex:
+    """
+    Inverted index of course plans in a SQLite file.
+
+    Each thread keeps its own connection; a course's postings are replaced in
+    one IMMEDIATE transaction, so a search never sees a half-indexed course.
+    """
+
+    def __init__(self, path: str = COURSE_INDEX_PATH, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._ready:
+            with self._init_lock:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS courses (course_id TEXT PRIMARY KEY, title TEXT, description TEXT, "
+                    "skill_level TEXT, age_group TEXT, skill_key TEXT, age_key TEXT, unit_count INTEGER, "
+                    "length REAL NOT NULL, saved_at TEXT)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, course_id TEXT NOT NULL, "
+                    "tf REAL NOT NULL, PRIMARY KEY (term, course_id)) WITHOUT ROWID"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS postings_course ON postings (course_id)")
+                self._ready = True
+        return conn
+
+    def add(self, course_id: str, course_plan: dict, topic: str = "", saved_at: Optional[str] = None) -> None:
+        """Index a course plan, replacing any earlier entry for the course."""
+        terms = course_terms(course_plan, topic)
+        metadata = course_plan.get("metadata", {})
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM postings WHERE course_id = ?", (course_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO courses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (course_id, course_plan.get("courseTitle", ""), course_plan.get("description", ""),
+                 metadata.get("skillLevel", ""), metadata.get("ageGroup", ""),
+                 _key(metadata.get("skillLevel")), _key(metadata.get("ageGroup")),
+                 len(course_plan.get("units", [])), sum(terms.values()), saved_at),
+            )
+            conn.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                             [(term, course_id, tf) for term, tf in terms.items()])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def remove(self, course_id: str) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM postings WHERE course_id = ?", (course_id,))
+            conn.execute("DELETE FROM courses WHERE course_id = ?", (course_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM courses").fetchone()[0]
+
+    def search(self, query: str, skill_level: Optional[str] = None, age_group: Optional[str] = None,
+               limit: int = 10) -> List[dict]:
+        """
+        Courses matching `query`, best first, optionally limited to a skill
+        level and age group (case-insensitive). `coverage` is the share of the
+        query's terms a course contains. Only the first MAX_QUERY_TERMS
+        distinct terms of the query are used.
+        """
+        terms = sorted(list(dict.fromkeys(tokens(query)))[:MAX_QUERY_TERMS])
+        if not terms:
+            return []
+        conn = self._connection()
+        placeholders = ",".join("?" * len(terms))
+        total, average_length = conn.execute("SELECT COUNT(*), AVG(length) FROM courses").fetchone()
+        document_frequency = dict(conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+        ).fetchall())
+
+        sql = (f"SELECT p.term, p.course_id, p.tf, c.length FROM postings p JOIN courses c USING (course_id) "
+               f"WHERE p.term IN ({placeholders})")
+        params: list = list(terms)
+        if skill_level:
+            sql += " AND c.skill_key = ?"
+            params.append(_key(skill_level))
+        if age_group:
+            sql += " AND c.age_key = ?"
+            params.append(_key(age_group))
+
+        scores: Dict[str, float] = defaultdict(float)
+        matched: Dict[str, int] = Counter()
+        for term, course_id, tf, length in conn.execute(sql, params):
+            df = document_frequency[term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            norm = K1 * (1 - B + B * length / (average_length or 1))
+            scores[course_id] += idf * tf * (K1 + 1) / (tf + norm)
+            matched[course_id] += 1
+
+        ranked = sorted(scores, key=lambda c: -scores[c])[:min(limit, MAX_RESULTS)]
+        if not ranked:
+            return []
+        rows = {row[0]: row for row in conn.execute(
+            f"SELECT course_id, title, description, skill_level, age_group, unit_count, saved_at FROM courses "
+            f"WHERE course_id IN ({','.join('?' * len(ranked))})", ranked
+        )}
+        return [{
+            "courseId": course_id,
+            "courseTitle": rows[course_id][1],
+            "description": rows[course_id][2],
+            "skillLevel": rows[course_id][3],
+            "ageGroup": rows[course_id][4],
+            "unitCount": rows[course_id][5],
+            "savedAt": rows[course_id][6],
+            "score": round(scores[course_id], 4),
+            "coverage": round(matched[course_id] / len(terms), 2),
+        } for course_id in ranked]
+
+    def similar(self, topic: str, skill_level: str, age_group: str, limit: int = 3) -> List[dict]:
+        """Existing courses close enough to a requested generation to offer instead."""
+        results = self.search(topic, skill_level, age_group, limit=MAX_RESULTS)
+        return [r for r in results if r["coverage"] >= SIMILAR_COVERAGE][:limit]
+
+
+course_index = CourseIndex()
+
+
+def index_course(course_id: str, course_plan: dict, topic: str = "", saved_at: Optional[str] = None) -> None:
+    """Add a saved course to the index. Failures are logged: the course itself is already saved."""
+    try:
+        course_index.add(course_id, course_plan, topic, saved_at)
+    except Exception as e:
+        logger.warning(f"Failed to index course {course_id}: {e}")
+
+
+def rebuild(course_ids: Optional[List[str]] = None) -> int:
+    """Index the given courses, or every course plan in storage. Returns how many were indexed."""
+    if course_ids is None:
+        course_ids = [name[:-len(".json")] for name in storage_list() if name.endswith(".json")]
+    indexed = 0
+    for course_id in course_ids:
+        data = storage_load(f"{course_id}.json")
+        # Topic, quiz and analytics files share the bucket; only course plans carry their own id
+        if not data or data.get("course_id") != course_id or "course_plan" not in data:
+            continue
+        course_index.add(course_id, data["course_plan"], data.get("topic", ""), data.get("saved_at"))
+        indexed += 1
+    return indexed
+
+
+if __name__ == '__main__':
+    count = rebuild(sys.argv[1:] or None)
+    print(f"Indexed {count} courses into {course_index.path}")
@@ -0,0 +1,130 @@
+"""
+Async reads for the request path.
+
+The synchronous `database.supabase` client blocks the event loop for a full
+round trip per query, and a route's independent reads (course plan, cached
+quiz, the user's past attempts) run one after another. The helpers here go
+through the async client and its keep-alive pool, and `gather` issues
+independent reads together, so a route pays one round trip instead of one
+per read.
+
+    course, cached = await gather(load_json(f"{course_id}.json"), load_json(quiz_file))
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Optional
+
+from database import get_async_supabase
+from learner_model import by_subtopic
+from storage import BUCKET_NAME, compressed_filename
+
+logger = logging.getLogger(__name__)
+
+
+async def gather(*reads: Awaitable):
+    """Run independent reads concurrently; results come back in argument order."""
+    return await asyncio.gather(*reads)
+
+
+async def optional(read: Awaitable, default=None, what: str = "read"):
+    """Await `read`, logging a failure and returning `default` instead of raising."""
+    try:
+        return await read
+    except Exception as e:
+        logger.warning(f"Failed to {what}: {e}")
+        return default
+
+
+async def load_json(filename: str) -> Optional[dict]:
+    """Async counterpart of storage.storage_load; None if the file is missing or unreadable."""
+    client = await get_async_supabase()
+    try:
+        return json.loads(await client.storage.from_(BUCKET_NAME).download(filename))
+    except Exception:
+        return None
+
+
+async def load_compressed(filename: str) -> Optional[bytes]:
+    """
+    The precompressed response body stored for `filename`
+    (storage.save_compressed), or None. Always read from storage, in one
+    request: another worker or bulk_generate may have rewritten it.
+    """
+    client = await get_async_supabase()
+    try:
+        return await client.storage.from_(BUCKET_NAME).download(compressed_filename(filename))
+    except Exception:
+        return None
+
+
+async def latest_attempt_number(auth_id: str, course_id: str, unit_number: int) -> int:
+    """Highest stored attempt number for the quiz, 0 if there are none."""
+    client = await get_async_supabase()
+    result = await client.table("quiz_attempts").select("attempt_number").eq(
+        "auth_id", auth_id
+    ).eq("course_id", course_id).eq(
+        "unit_number", unit_number
+    ).order("attempt_number", desc=True).limit(1).execute()
+    return result.data[0]["attempt_number"] if result.data else 0
+
+
+async def recent_attempts(auth_id: str, course_id: str, unit_number: int, limit: int = 3) -> list:
+    """Attempt numbers, weak subtopics and scores of the user's most recent attempts, newest first."""
+    client = await get_async_supabase()
+    result = await client.table("quiz_attempts").select("attempt_number,weak_subtopics,percentage").eq(
+        "auth_id", auth_id
+    ).eq("course_id", course_id).eq(
+        "unit_number", unit_number
+    ).order("attempt_number", desc=True).limit(limit).execute()
+    return result.data
+
+
+async def subtopic_mastery(auth_id: str, course_id: str) -> dict:
+    """The user's mastery estimates for the course, {subtopic: {mastery, observations}} (learner_model.py)."""
+    client = await get_async_supabase()
+    result = await client.table("subtopic_mastery").select("subtopic,mastery,observations").eq(
+        "auth_id", auth_id
+    ).eq("course_id", course_id).execute()
+    return by_subtopic(result.data)
+
+
+async def latest_attempt_numbers(auth_ids: list, course_id: str, unit_number: int) -> dict:
+    """Highest stored attempt number for each of the users on the quiz (0 if none), in one query."""
+    client = await get_async_supabase()
+    # Grouped in the database (sql/latest_attempt_numbers.sql): one row per learner, so the
+    # response stays far below PostgREST's max-rows cap however many attempts they have
+    result = await client.rpc("latest_attempt_numbers", {
+        "learner_ids": auth_ids, "quiz_course_id": course_id, "quiz_unit_number": unit_number,
+    }).execute()
+    latest = dict.fromkeys(auth_ids, 0)
+    for row in result.data or []:
+        latest[row["auth_id"]] = row["attempt_number"]
+    return latest
+
+
+async def bank_questions(course_id: str, unit_number: int) -> list:
+    """Every banked question for the unit (question_bank.py)."""
+    client = await get_async_supabase()
+    result = await client.table("question_bank").select("id,subtopic,kind,question").eq(
+        "course_id", course_id
+    ).eq("unit_number", unit_number).execute()
+    return result.data
+
+
+async def seen_question_ids(auth_id: str, course_id: str, unit_number: int) -> set:
+    """Ids of the banked questions the user has already been graded on."""
+    client = await get_async_supabase()
+    result = await client.table("question_bank_seen").select("question_id").eq("auth_id", auth_id).eq(
+        "course_id", course_id
+    ).eq("unit_number", unit_number).execute()
+    return {row["question_id"] for row in result.data}
+
+
+async def _nothing():
+    return None
+
+
+def skip():
+    """Placeholder for a read a route doesn't need this time, so `gather` arity stays fixed."""
+    return _nothing()
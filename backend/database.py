@@ -1,10 +1,111 @@
 import os
+import asyncio
+import threading
 from dotenv import load_dotenv
-from supabase import create_client, Client
+
+import metrics
 
 load_dotenv()
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SECRET_KEY = os.getenv("SUPABASE_SECRET_KEY")  # new secret key
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
+# Connection pool shared by PostgREST and Storage calls. Idle connections are
+# kept open so back-to-back and concurrent queries skip the TCP/TLS handshake.
+POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "50"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "60"))
+
+_client = None
+_client_lock = threading.Lock()
+_async_client = None
+_async_loop = None
+
+
+def _http_options() -> dict:
+    import httpx
+    return {
+        "timeout": httpx.Timeout(30.0, connect=5.0),
+        "limits": httpx.Limits(max_connections=POOL_MAX_CONNECTIONS,
+                               max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                               keepalive_expiry=POOL_KEEPALIVE_EXPIRY),
+    }
+
+
+def create_client(url: str, key: str):
+    """Build the Supabase client. The SDK is only imported here, on first use."""
+    import httpx
+    from supabase import create_client as _create_client
+    from supabase.lib.client_options import SyncClientOptions
+
+    # Shared HTTP client for PostgREST and Storage; the hooks time every call for /metrics
+    http_client = httpx.Client(
+        **_http_options(),
+        event_hooks={
+            "request": [metrics.httpx_request_hook],
+            "response": [metrics.httpx_response_hook],
+        },
+    )
+    return _create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
+
+
+def get_supabase():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
+    return _client
+
+
+async def create_async_client(url: str, key: str):
+    """Build the async Supabase client on its own keep-alive pool."""
+    import httpx
+    from supabase import acreate_client
+    from supabase.lib.client_options import AsyncClientOptions
+
+    http_client = httpx.AsyncClient(
+        **_http_options(),
+        event_hooks={
+            "request": [metrics.async_httpx_request_hook],
+            "response": [metrics.async_httpx_response_hook],
+        },
+    )
+    return await acreate_client(url, key, options=AsyncClientOptions(httpx_client=http_client))
+
+
+async def get_async_supabase():
+    """The async client for the running event loop (its connections can't cross loops)."""
+    global _async_client, _async_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        client = await create_async_client(SUPABASE_URL, SUPABASE_SECRET_KEY)
+        if _async_client is not None and _async_loop is loop:
+            # Another request built one while this one was awaiting
+            await _close(client)
+        else:
+            _async_client, _async_loop = client, loop
+    return _async_client
+
+
+async def _close(client) -> None:
+    http_client = getattr(getattr(client, "options", None), "httpx_client", None)
+    if http_client is not None:
+        await http_client.aclose()
+
+
+async def close_async_supabase() -> None:
+    global _async_client, _async_loop
+    client, _async_client, _async_loop = _async_client, None, None
+    if client is not None:
+        await _close(client)
+
+
+class _LazySupabase:
+    """Stands in for the client so importing a module doesn't connect or import the SDK."""
+
+    def __getattr__(self, name):
+        return getattr(get_supabase(), name)
+
+
+supabase = _LazySupabase()
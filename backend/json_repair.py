@@ -0,0 +1,95 @@
+"""
+Local repair of malformed or truncated JSON from the model.
+
+Structured responses occasionally come back wrapped in a markdown fence, with
+a trailing comma or a raw newline inside a string, or cut off mid-document
+when the output limit is hit. `repair` fixes what can be fixed in one pass
+over the text, without another model call:
+
+  - anything before the first { or [ and after the document closes is dropped
+  - control characters inside strings are escaped
+  - commas directly before a closing bracket are removed
+  - a truncated document is cut back to its last complete element and its
+    open brackets are closed
+
+The caller is told when the document was truncated, since closing it drops
+whatever the model had not written yet (llm.generate_json asks for the rest).
+"""
+from typing import List, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _strip_trailing_comma(out: List[str]) -> None:
+    end = len(out)
+    while end and out[end - 1].isspace():
+        end -= 1
+    if end and out[end - 1] == ",":
+        del out[end - 1:]
+
+
+def repair(text: str) -> Tuple[str, bool]:
+    """
+    (repaired JSON text, whether the document was truncated). Text with no
+    JSON object or array in it is returned unchanged.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text, False
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escaped = False
+    # Where the output could be cut and closed: after the root bracket or a complete element
+    safe: Tuple[int, Tuple[str, ...]] = (0, ())
+    for ch in text[min(starts):]:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch in _ESCAPES:
+                ch = _ESCAPES[ch]
+            elif ch < " ":
+                ch = f"\\u{ord(ch):04x}"
+            out.append(ch)
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+            if len(stack) == 1:
+                safe = (len(out), tuple(stack))
+        elif ch in "}]":
+            if not stack or stack[-1] != ch:
+                break
+            _strip_trailing_comma(out)
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return "".join(out), False
+            safe = (len(out), tuple(stack))
+        elif ch == ",":
+            safe = (len(out), tuple(stack))
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    length, open_brackets = safe
+    out = out[:length]
+    _strip_trailing_comma(out)
+    return "".join(out) + "".join(reversed(open_brackets)), True
+
+
+def clean_continuation(text: str) -> str:
+    """A continuation of a JSON document, without the markdown fence the model may wrap it in."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
@@ -0,0 +1,118 @@
+"""
+Per-learner subtopic mastery.
+
+Bayesian knowledge tracing over (auth_id, course_id, subtopic): each row of
+`subtopic_mastery` holds the probability that the learner has mastered the
+subtopic and how many graded questions it rests on. Scoring a module quiz
+runs every question's outcome through the BKT update for its
+relatedSubtopic, so an attempt costs O(questions), and a learner's mastery is
+one indexed read instead of a re-aggregation of their attempt history.
+
+Outcomes are written with the apply_mastery_observations function, which
+runs the same update against the stored row under a row lock, so concurrent
+submissions for one learner can't overwrite each other's update. `apply`
+computes the same result locally for the response.
+
+Schema: sql/subtopic_mastery.sql.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from database import supabase
+
+logger = logging.getLogger(__name__)
+
+# Knowledge-tracing parameters
+P_INIT = 0.3    # mastery before any evidence
+P_LEARN = 0.1   # chance of learning the subtopic between two questions
+P_SLIP = 0.1    # chance of missing a question on a mastered subtopic
+FRQ_GUESS = 0.05  # chance of a passing free response without mastery
+# At or above this a subtopic no longer counts as weak
+MASTERED = 0.8
+
+Observation = Tuple[str, bool, float]  # (subtopic, correct, guess probability)
+
+
+def update(p: float, correct: bool, guess: float, slip: float = P_SLIP, learn: float = P_LEARN) -> float:
+    """One BKT step: condition P(mastered) on an answer, then allow for learning."""
+    if correct:
+        posterior = p * (1 - slip) / (p * (1 - slip) + (1 - p) * guess)
+    else:
+        posterior = p * slip / (p * slip + (1 - p) * (1 - guess))
+    return posterior + (1 - posterior) * learn
+
+
+def observations(mcq_results: List[dict], frq_questions: List[dict], frq_evaluations: List[dict]) -> List[Observation]:
+    """Per-question outcomes of a scored module quiz, in the form `apply` takes."""
+    obs = [
+        (r.get("relatedSubtopic", ""), r["correct"], 1 / max(2, len(r.get("options", []))))
+        for r in mcq_results
+    ]
+    for i, ev in enumerate(frq_evaluations):
+        if i < len(frq_questions):
+            # The same bar evaluate_module_quiz uses for weak subtopics
+            obs.append((frq_questions[i].get("relatedSubtopic", ""), ev["score"] >= ev["maxPoints"] * 0.8, FRQ_GUESS))
+    return obs
+
+
+def apply(current: Dict[str, dict], obs: Iterable[Observation]) -> Dict[str, dict]:
+    """Updated rows ({subtopic: {mastery, observations}}) for the subtopics in `obs`."""
+    updated: Dict[str, dict] = {}
+    for subtopic, correct, guess in obs:
+        if not subtopic:
+            continue
+        row = updated.get(subtopic) or current.get(subtopic) or {"mastery": P_INIT, "observations": 0}
+        updated[subtopic] = {
+            "mastery": update(row["mastery"], correct, guess),
+            "observations": row["observations"] + 1,
+        }
+    return updated
+
+
+def by_subtopic(rows: List[dict]) -> Dict[str, dict]:
+    return {r["subtopic"]: {"mastery": r["mastery"], "observations": r["observations"]} for r in rows}
+
+
+def record(auth_id: str, course_id: str, obs: Iterable[Observation]) -> None:
+    record_many(course_id, {auth_id: obs})
+
+
+def record_many(course_id: str, obs: Dict[str, Iterable[Observation]]) -> None:
+    """Fold several learners' outcomes ({auth_id: observations}) into their stored mastery in one request."""
+    rows = [
+        {"auth_id": auth_id, "course_id": course_id, "subtopic": subtopic, "correct": correct, "guess": guess}
+        for auth_id, learner in obs.items()
+        for subtopic, correct, guess in learner
+        if subtopic
+    ]
+    if not rows:
+        return
+    try:
+        supabase.rpc("apply_mastery_observations", {
+            "observations": rows, "p_init": P_INIT, "slip": P_SLIP, "learn": P_LEARN,
+        }).execute()
+    except Exception as e:
+        logger.warning(f"Failed to update mastery for {', '.join(obs)}: {e}")
+
+
+def weakness(mastery: Dict[str, dict], subtopics: List[str], last_score: float,
+             missed: Iterable[str] = ()) -> Optional[dict]:
+    """
+    Retake weighting for a unit: {"weak_subtopics": {subtopic: mastery}, "last_score"},
+    or None if nothing is weak. Subtopics with no estimate yet that were
+    `missed` in the latest attempt count as unmastered at the prior.
+    """
+    weak = {}
+    for subtopic in subtopics:
+        if subtopic in mastery:
+            if mastery[subtopic]["mastery"] < MASTERED:
+                weak[subtopic] = round(mastery[subtopic]["mastery"], 2)
+        elif subtopic in missed:
+            weak[subtopic] = P_INIT
+    return {"weak_subtopics": weak, "last_score": last_score} if weak else None
+
+
+def recommendations(mastery: Dict[str, dict], limit: int = 3) -> List[str]:
+    """The learner's weakest subtopics still below MASTERED, weakest first."""
+    weak = [s for s, row in mastery.items() if row["mastery"] < MASTERED]
+    return sorted(weak, key=lambda s: mastery[s]["mastery"])[:limit]
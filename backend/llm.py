@@ -0,0 +1,508 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Tuple, Union, get_args, get_origin
+
+from pydantic import BaseModel, ValidationError
+
+import metrics
+from json_repair import clean_continuation, repair
+
+logger = logging.getLogger(__name__)
+
+# --- Per-task deadlines (seconds), overridable with LLM_DEADLINES='{"task": s}' ---
+
+DEFAULT_DEADLINE = 60.0
+DEADLINES: Dict[str, float] = {
+    "course_plan": 120.0,
+    "topic_content": 90.0,
+    "topic_opening": 45.0,
+    "topic_remainder": 90.0,
+    "module_quiz": 90.0,
+    "quiz_evaluation": 45.0,
+    "quiz_evaluation_batch": 90.0,
+    "assessment_questions": 60.0,
+    "assessment_evaluation": 45.0,
+    "video_search": 30.0,
+    "tutor": 25.0,
+    "tutor_summary": 30.0,
+    "freeform": 60.0,
+}
+DEADLINES.update({k: float(v) for k, v in json.loads(os.getenv("LLM_DEADLINES", "{}")).items()})
+
+# Tasks that send a hedged duplicate request once the first one is slower than
+# that task's recent p95. Hedging costs extra tokens, so it is limited to short,
+# latency-sensitive calls unless configured otherwise.
+HEDGED_TASKS = set(filter(None, os.getenv("LLM_HEDGED_TASKS", "tutor,quiz_evaluation").split(",")))
+
+# --- Model routing, overridable with LLM_MODEL_ROUTES='{"task": {"model": ...}}' ---
+#
+# model:    used for the first attempt
+# fallback: used for retries after a transient error or timeout on `model`;
+#           None retries on `model` itself
+# escalate: used to regenerate once when a JSON response fails schema validation
+
+STRONG_MODEL = os.getenv("LLM_STRONG_MODEL", "gemini-3-flash-preview")
+FAST_MODEL = os.getenv("LLM_FAST_MODEL", "gemini-2.5-flash")
+
+# Long-form generation needs the strong model; a retry on the fast one would
+# quietly lower quality on exactly these prompts
+DEFAULT_ROUTE = {"model": STRONG_MODEL, "fallback": None, "escalate": None}
+MODEL_ROUTES: Dict[str, dict] = {
+    "course_plan": DEFAULT_ROUTE,
+    "topic_content": DEFAULT_ROUTE,
+    "topic_opening": DEFAULT_ROUTE,
+    "topic_remainder": DEFAULT_ROUTE,
+    "module_quiz": DEFAULT_ROUTE,
+    "assessment_questions": DEFAULT_ROUTE,
+    "assessment_evaluation": DEFAULT_ROUTE,
+    # Short, latency-sensitive work runs on the fast model and falls back to or
+    # escalates to the strong one
+    "quiz_evaluation": {"model": FAST_MODEL, "fallback": STRONG_MODEL, "escalate": STRONG_MODEL},
+    "quiz_evaluation_batch": {"model": FAST_MODEL, "fallback": STRONG_MODEL, "escalate": STRONG_MODEL},
+    "video_search": {"model": FAST_MODEL, "fallback": STRONG_MODEL, "escalate": None},
+    "tutor": {"model": FAST_MODEL, "fallback": STRONG_MODEL, "escalate": None},
+    "tutor_summary": {"model": FAST_MODEL, "fallback": STRONG_MODEL, "escalate": None},
+    "freeform": {"model": FAST_MODEL, "fallback": STRONG_MODEL, "escalate": None},
+}
+for _task, _override in json.loads(os.getenv("LLM_MODEL_ROUTES", "{}")).items():
+    if isinstance(_override, str):
+        _override = {"model": _override}
+    MODEL_ROUTES[_task] = {**MODEL_ROUTES.get(_task, DEFAULT_ROUTE), **_override}
+
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Follow-up calls allowed to recover an invalid structured response before regenerating it
+MAX_CONTINUATIONS = int(os.getenv("LLM_MAX_CONTINUATIONS", "2"))
+MAX_PATCHES = int(os.getenv("LLM_MAX_PATCHES", "3"))
+
+CONTINUE_PROMPT = (
+    "Your JSON response was cut off. Continue it from exactly where it stopped, without repeating "
+    "anything already written, and finish the JSON document. Output only the continuation."
+)
+PATCH_PROMPT = (
+    "Part of your JSON response failed validation.\n\n"
+    "Location: {location}\n"
+    "Errors:\n{errors}\n\n"
+    "Invalid part:\n{fragment}\n\n"
+    "Return only a corrected version of this part as a JSON object, keeping its valid content unchanged."
+)
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+RETRYABLE_STATUSES = ("UNAVAILABLE", "RESOURCE_EXHAUSTED", "DEADLINE_EXCEEDED", "INTERNAL")
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+class SchemaValidationError(ValueError):
+    pass
+
+
+def route(task: str) -> dict:
+    return MODEL_ROUTES.get(task, DEFAULT_ROUTE)
+
+
+class RetryBudget:
+    """
+    Token bucket limiting retries and hedges to a fraction of total calls.
+
+    Every first attempt deposits `ratio` tokens and every extra request
+    withdraws one, so during an outage at most ~ratio extra load is added on
+    top of normal traffic instead of multiplying it by the retry count.
+    """
+
+    def __init__(self, ratio: float = 0.1, max_tokens: float = 20.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies per task."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def observe(self, task: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(task, deque(maxlen=self._window)).append(seconds)
+
+    def p95(self, task: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(task, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[int(0.95 * (len(samples) - 1))]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Shared google-genai client; the SDK is imported and the client built on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+                _client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    return _client
+
+
+class LazyClient:
+    """
+    Class attribute that resolves to the shared client on first access.
+    Assigning `instance.client` (e.g. a fake in tests) overrides it.
+    """
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return get_client()
+
+
+retry_budget = RetryBudget(float(os.getenv("LLM_RETRY_BUDGET_RATIO", "0.1")))
+latency_tracker = LatencyTracker()
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_MAX_CONCURRENCY", "32")),
+                               thread_name_prefix="llm")
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, LLMDeadlineExceeded):
+        return False
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_CODES
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    # httpx transport errors (connect/read failures) surface from the SDK unwrapped
+    if type(exc).__module__.startswith(("httpx", "httpcore")):
+        return True
+    message = str(exc)
+    return any(status in message for status in RETRYABLE_STATUSES)
+
+
+def _with_timeout(config, seconds: float):
+    """Apply the remaining deadline as the SDK's HTTP timeout so a stuck call can't pin a thread."""
+    timeout_ms = max(1000, int(seconds * 1000))
+    if config is None:
+        return {"http_options": {"timeout": timeout_ms}}
+    if isinstance(config, dict):
+        http_options = {**config.get("http_options", {}), "timeout": timeout_ms}
+        return {**config, "http_options": http_options}
+    from google.genai import types
+    return config.model_copy(update={"http_options": types.HttpOptions(timeout=timeout_ms)})
+
+
+def _timed_call(client, task: str, kwargs: dict):
+    model = kwargs.get("model", "")
+    start = time.perf_counter()
+    try:
+        response = client.models.generate_content(**kwargs)
+    except Exception:
+        metrics.observe_llm_call(task, model, time.perf_counter() - start, outcome="error")
+        raise
+    elapsed = time.perf_counter() - start
+    usage = getattr(response, "usage_metadata", None)
+    metrics.observe_llm_call(task, model, elapsed, usage)
+    latency_tracker.observe(task, elapsed)
+    logger.debug("llm task=%s model=%s latency=%.2fs input_tokens=%s output_tokens=%s",
+                 task, model, elapsed,
+                 getattr(usage, "prompt_token_count", None),
+                 getattr(usage, "candidates_token_count", None))
+    return response
+
+
+def _attempt(client, task: str, kwargs: dict, deadline_at: float, deadline: float, hedge: bool):
+    """One logical attempt: the primary request plus at most one hedge."""
+    remaining = deadline_at - time.monotonic()
+    call_kwargs = {**kwargs, "config": _with_timeout(kwargs.get("config"), remaining)}
+    pending = {_executor.submit(_timed_call, client, task, call_kwargs)}
+
+    hedge_after = latency_tracker.p95(task) if hedge else None
+    if hedge_after is not None and hedge_after < remaining:
+        done, pending = wait(pending, timeout=hedge_after)
+        if not done and retry_budget.try_spend():
+            metrics.LLM_HEDGES.inc(task, kwargs.get("model", ""))
+            pending.add(_executor.submit(_timed_call, client, task, call_kwargs))
+        else:
+            pending |= done
+
+    error = None
+    while pending:
+        timeout = deadline_at - time.monotonic()
+        if timeout <= 0:
+            break
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                # Whichever request finishes first wins; a slower twin is left to
+                # finish against its own HTTP timeout and is discarded.
+                return future.result()
+            error = future.exception()
+    if error is not None and not pending:
+        raise error
+    raise LLMDeadlineExceeded(f"{task} exceeded its {deadline:.0f}s deadline")
+
+
+def generate_content(client, task: str, deadline: Optional[float] = None,
+                     max_retries: int = MAX_RETRIES, hedge: Optional[bool] = None,
+                     pinned: bool = False, **kwargs):
+    """
+    Call `client.models.generate_content(**kwargs)` with a deadline, bounded
+    exponential-backoff retries on transient errors and optional hedging.
+
+    `model` defaults to the task's route in MODEL_ROUTES; retries of the routed
+    model go to the route's fallback model, if it has one, unless `pinned`
+    (a request that only works on its model, such as one using a context
+    cache). Latency, token usage and estimated cost are recorded under `task`
+    (e.g. "course_plan", "tutor"). Retries and hedges draw from a shared
+    retry budget so they can't amplify an upstream outage.
+    """
+    deadline = deadline if deadline is not None else DEADLINES.get(task, DEFAULT_DEADLINE)
+    deadline_at = time.monotonic() + deadline
+    hedge = task in HEDGED_TASKS if hedge is None else hedge
+    task_route = route(task)
+    model = kwargs.get("model") or task_route["model"]
+    kwargs["model"] = model
+    # An explicitly chosen model (e.g. an escalation) is retried as-is
+    fallback = task_route.get("fallback") if model == task_route["model"] and not pinned else None
+
+    retry_budget.record_call()
+    attempt = 0
+    while True:
+        try:
+            return _attempt(client, task, kwargs, deadline_at, deadline, hedge)
+        except Exception as e:
+            if attempt >= max_retries or not _is_retryable(e):
+                raise
+            # Full jitter keeps synchronized clients from retrying in lockstep
+            backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+            if time.monotonic() + backoff >= deadline_at:
+                raise
+            if not retry_budget.try_spend():
+                logger.warning(f"Retry budget exhausted; not retrying {task}: {e}")
+                raise
+            metrics.LLM_RETRIES.inc(task, kwargs["model"])
+            if fallback:
+                kwargs["model"] = fallback
+            logger.info(f"Retrying {task} on {kwargs['model']} after {type(e).__name__}: {e}")
+            time.sleep(backoff)
+            attempt += 1
+
+
+def _check(data, schema):
+    """
+    `data` as it is, once it matches `schema`. Only validated: callers get the
+    JSON the model wrote, not a model_dump with defaults and None fields added
+    and unknown keys dropped.
+    """
+    if schema is not None:
+        try:
+            schema.model_validate(data)
+        except ValidationError as e:
+            raise SchemaValidationError(f"Response does not match {schema.__name__}: {e}") from e
+    return data
+
+
+def _validate(text: str, schema):
+    """Decode `text` and check it against `schema`."""
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise SchemaValidationError(f"Response does not match {getattr(schema, '__name__', 'JSON')}: {e}") from e
+    return _check(data, schema)
+
+
+def _parse_json(response, schema):
+    if not response.text:
+        raise SchemaValidationError("Empty response from Gemini")
+    return _validate(response.text, schema)
+
+
+def _conversation(contents, partial: str, instruction: str) -> list:
+    """The original request, the model's partial answer and a follow-up instruction as chat turns."""
+    parts = [{"text": c} if isinstance(c, str) else c for c in (contents if isinstance(contents, list) else [contents])]
+    return [
+        {"role": "user", "parts": parts},
+        {"role": "model", "parts": [{"text": partial}]},
+        {"role": "user", "parts": [{"text": instruction}]},
+    ]
+
+
+def _element_model(annotation):
+    """The pydantic model a field holds, looking through List[...] and Optional[...]."""
+    while get_origin(annotation) in (list, List, Union):
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        if not args:
+            return None
+        annotation = args[0]
+    return annotation if isinstance(annotation, type) and issubclass(annotation, BaseModel) else None
+
+
+def _failing_parts(schema, errors: List[dict]) -> Optional[Dict[Tuple, type]]:
+    """
+    {path: model} for the innermost nested objects holding the validation
+    errors, or None if an error sits on the top-level object itself.
+    """
+    parts: Dict[Tuple, type] = {}
+    for error in errors:
+        model, annotation, path, found = schema, None, (), None
+        for key in error["loc"]:
+            if isinstance(key, int):
+                # An item of the list field just walked into
+                path += (key,)
+                model = _element_model(annotation)
+                if model is not None:
+                    found = (path, model)
+                continue
+            field = model.model_fields.get(key) if model is not None else None
+            if field is None:
+                break
+            path += (key,)
+            annotation = field.annotation
+            model = None if get_origin(annotation) in (list, List) else _element_model(annotation)
+            if model is not None:
+                found = (path, model)
+        if found is None:
+            return None
+        parts[found[0]] = found[1]
+    return parts
+
+
+def _at(data, path: Tuple):
+    for key in path[:-1]:
+        data = data[key]
+    return data
+
+
+def _patch(client, task: str, schema, data, model: str, config: dict, kwargs: dict):
+    """Ask for corrected versions of just the nested objects that failed validation."""
+    try:
+        schema.model_validate(data)
+        return data
+    except ValidationError as e:
+        errors = e.errors()
+    parts = _failing_parts(schema, errors)
+    if not parts or len(parts) > MAX_PATCHES:
+        return None
+    for path, part_model in parts.items():
+        try:
+            parent = _at(data, path)
+            fragment = parent[path[-1]]
+        except (KeyError, IndexError, TypeError):
+            return None
+        messages = "\n".join(f"- {'.'.join(map(str, err['loc'][len(path):])) or '(object)'}: {err['msg']}"
+                             for err in errors if tuple(err["loc"][:len(path)]) == path)
+        prompt = PATCH_PROMPT.format(location=".".join(map(str, path)), errors=messages,
+                                     fragment=json.dumps(fragment, ensure_ascii=False))
+        contents = kwargs.get("contents")
+        contents = [*(contents if isinstance(contents, list) else [contents]), prompt]
+        response = generate_content(client, task, model=model, contents=contents,
+                                    config={**config, "response_schema": part_model},
+                                    **{k: v for k, v in kwargs.items() if k != "contents"})
+        parent[path[-1]] = _validate(response.text or "", part_model)
+    return _check(data, schema)
+
+
+def _recover(client, task: str, schema, response, model: str, config: dict, kwargs: dict):
+    """
+    Recover an invalid structured response without regenerating it: repair
+    the JSON locally, ask the model to continue a truncated one, then ask
+    for corrected versions of only the parts that fail validation. Returns
+    the validated data, or None if it can't be recovered this way.
+    """
+    text = response.text or ""
+    if "{" not in text and "[" not in text:
+        return None
+    try:
+        repaired, truncated = repair(text)
+        method = "local"
+        continuations = 0
+        while truncated and continuations < MAX_CONTINUATIONS:
+            follow_up = generate_content(
+                client, task, model=model,
+                contents=_conversation(kwargs.get("contents"), text, CONTINUE_PROMPT),
+                config={**{k: v for k, v in config.items() if k != "response_schema"},
+                        "response_mime_type": "text/plain"},
+                **{k: v for k, v in kwargs.items() if k != "contents"},
+            )
+            text += clean_continuation(follow_up.text or "")
+            repaired, truncated = repair(text)
+            method = "continued"
+            continuations += 1
+        if truncated:
+            return None
+        try:
+            data = _validate(repaired, schema)
+        except SchemaValidationError:
+            if schema is None:
+                return None
+            data = _patch(client, task, schema, json.loads(repaired), model, config, kwargs)
+            if data is None:
+                return None
+            method = "patched"
+    except Exception as e:
+        # Including a failed follow-up call: the caller falls back to regenerating
+        logger.info(f"Could not recover {task} output from {model}: {e}")
+        return None
+    logger.info(f"Recovered invalid {task} output from {model} ({method})")
+    metrics.LLM_REPAIRS.inc(task, method)
+    return data
+
+
+def _generate_validated(client, task: str, schema, model: str, config: dict, kwargs: dict):
+    response = generate_content(client, task, model=model, config=config, **kwargs)
+    try:
+        return _parse_json(response, schema)
+    except SchemaValidationError:
+        recovered = _recover(client, task, schema, response, model, config, kwargs)
+        if recovered is None:
+            raise
+        return recovered
+
+
+def generate_json(client, task: str, schema=None, **kwargs):
+    """
+    Generate a JSON response for `task` constrained to the pydantic `schema`
+    and return it validated. Output that fails validation is recovered where
+    possible (see _recover); otherwise it is regenerated once on the task's
+    escalation model before SchemaValidationError is raised.
+    """
+    config = {**(kwargs.pop("config", None) or {}), "response_mime_type": "application/json"}
+    if schema is not None:
+        config["response_schema"] = schema
+    model = kwargs.pop("model", None) or route(task)["model"]
+    try:
+        return _generate_validated(client, task, schema, model, config, kwargs)
+    except SchemaValidationError as e:
+        escalate = route(task).get("escalate")
+        if not escalate or escalate == model:
+            raise
+        logger.warning(f"{task} output from {model} failed validation, escalating to {escalate}: {e}")
+        metrics.LLM_ESCALATIONS.inc(task, model, escalate)
+        return _generate_validated(client, task, schema, escalate, config, kwargs)
@@ -1,30 +1,76 @@
 import os
-import uuid
-from datetime import datetime
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 import uvicorn
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
-from google import genai
 from dotenv import load_dotenv
 from course_generator import CourseGenerator
 from assessment_generator import AssessmentGenerator
 from quiz_helper import QuizHelper
-from database import supabase
-from storage import storage_save, storage_load, ensure_bucket
-from fastapi.responses import JSONResponse
-import jwt
+from tutor_sessions import sessions as tutor_sessions
+from database import supabase, close_async_supabase
+from data_access import (
+    gather, optional, skip, load_json, load_compressed, latest_attempt_number, recent_attempts,
+    bank_questions, seen_question_ids, subtopic_mastery, latest_attempt_numbers,
+)
+from storage import storage_save, storage_load, ensure_bucket, discard_compressed
+from compression import CompressionMiddleware, accepts_gzip, precompressed_response
+from attempt_encoding import (
+    save_quiz_snapshot, load_quiz_snapshot, ensure_quiz_version,
+    encode_attempt, rehydrate_attempt,
+)
+import progressive_topics
+import retake_quizzes
+import question_bank
+import learner_model
+import cohort_analytics
+import batch_grading
+from course_index import course_index
+from course_cache import topic_index, unit_numbers, save_course_plan
+from progress_buffer import progress_buffer, is_enrolled, mark_enrolled
+from topic_bitmap import mask_for, topics_from_bitstring
+from uploads import (
+    check_upload_size, is_text_upload, read_text_upload, upload_to_gemini, delete_from_gemini,
+    max_request_bytes,
+)
+from pagination import DEFAULT_PAGE_SIZE, select_columns, page_size, split_page, keyset_filter
+from fastapi.responses import JSONResponse, PlainTextResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+import metrics
+from llm import generate_content, get_client
+from startup import readiness, start_checks
+from auth import get_auth_id, get_grader_id, optional_auth_id, check_auth_id
+from rate_limit import rate_limit_key, request_cost, RATE_LIMIT_BUDGET, RATE_LIMIT_STORAGE
+from log_config import setup_logging
 
 load_dotenv()
-
-app = FastAPI()
-
-# Rate Limiting
-limiter = Limiter(key_func=get_remote_address)
+setup_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Network checks and SDK warm-up run in the background; /ready reports them
+    tasks = start_checks({
+        "storage_bucket": ensure_bucket,
+        "gemini_client": get_client,
+    })
+    yield
+    for task in tasks:
+        task.cancel()
+    # Make sure buffered progress updates reach the database before exit
+    await progress_buffer.stop()
+    await close_async_supabase()
+
+app = FastAPI(lifespan=lifespan)
+
+# Rate Limiting: per user (or address), with a cost-weighted budget shared across routes and workers
+limiter = Limiter(key_func=rate_limit_key, storage_uri=RATE_LIMIT_STORAGE)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -39,12 +85,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-try:
-    genai_client = genai.Client()
-except Exception as e:
-    print(f"Error configuring Gemini client: {e}")
-    # Continue execution, but warn
-    print("Please ensure your GEMINI_API_KEY is set in your .env file or environment variables.")
+# Gzip large JSON responses; precompressed ones are passed through as they are
+app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse multipart bodies over the upload cap before they are parsed and spooled."""
+    limit = max_request_bytes()
+    content_length = request.headers.get("content-length", "")
+    if (limit and content_length.isdigit() and int(content_length) > limit
+            and request.headers.get("content-type", "").startswith("multipart/form-data")):
+        return JSONResponse(status_code=413, content={"detail": "Upload too large"})
+    return await call_next(request)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-route latency histogram plus Supabase/storage call accounting."""
+    calls = metrics.start_request()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        route_path = route.path if route else "unmatched"
+        metrics.REQUEST_LATENCY.observe(elapsed, request.method, route_path, str(status))
+        if status < 500:
+            response.headers["Server-Timing"] = metrics.server_timing(calls, elapsed)
+        if calls:
+            logger.debug("%s %s %s %.1fms %s", request.method, route_path, status, elapsed * 1000,
+                         {dep: {"calls": int(c), "ms": round(t * 1000, 1)} for dep, (c, t) in calls.items()})
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+if not os.getenv("GEMINI_API_KEY"):
+    logger.warning("Please ensure your GEMINI_API_KEY is set in your .env file or environment variables.")
 
 # Initialize generators
 course_generator = CourseGenerator()
@@ -53,30 +134,22 @@ quiz_helper = QuizHelper()
 
 @app.get("/")
 @limiter.limit("120/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
 def root(request: Request):
     return {"message": "works"}
 
-# Ensure Supabase Storage bucket exists at startup
-ensure_bucket()
+@app.get("/ready")
+def ready():
+    """Readiness probe: 503 until the startup checks (storage bucket, Gemini client) pass."""
+    report = readiness.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
 
 def save_course_plan_locally(course_plan: dict, topic: str) -> str:
     """
     Save a course plan to Supabase Storage.
     Returns the course ID (filename without extension).
     """
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_id = str(uuid.uuid4())[:8]
-    safe_topic = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in topic)[:50]
-    course_id = f"{timestamp}_{safe_topic}_{unique_id}"
-
-    data_to_save = {
-        "course_id": course_id,
-        "saved_at": datetime.now().isoformat(),
-        "course_plan": course_plan
-    }
-
-    storage_save(f"{course_id}.json", data_to_save)
-    return course_id
+    return save_course_plan(course_plan, topic)
 
 # Define Pydantic models
 class PromptRequest(BaseModel):
@@ -91,22 +164,20 @@ class CourseGenerationRequest(BaseModel):
 
 @app.post("/generate")
 @limiter.limit("30/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
 async def generate_text(request: Request, prompt_request: PromptRequest):
     """
     An API endpoint to send a prompt to the Gemini model and receive a response.
     """
     try:
-        model_name = "gemini-2.0-flash-exp"
-        response = genai_client.models.generate_content(
-            model=model_name,
-            contents=[prompt_request.prompt],
-        )
+        response = generate_content(get_client(), "freeform", contents=[prompt_request.prompt])
         return {"response": response.text}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate_course")
 @limiter.limit("30/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
 async def generate_course_endpoint(
     request: Request,
     topic: str = Form(...),
@@ -114,51 +185,98 @@ async def generate_course_endpoint(
     age_group: str = Form(...),
     additional_notes: str = Form(""),
     materials_text: str = Form(""),
-    file: UploadFile = File(None)
+    file: UploadFile = File(None),
+    check_similar: bool = Form(False)
 ):
     """
     Endpoint to generate a structured course plan, supporting optional file upload.
+
+    With check_similar, existing courses on the same topic, skill level and age
+    group are returned as {"similarCourses": [...]} instead of generating; send
+    the request again without it to generate anyway.
     """
+    uploaded = None
     try:
-        file_data = None
-        mime_type = None
-        if file:
-            file_data = await file.read()
-            mime_type = file.content_type
-
-        result = course_generator.generate_course(
-            topic=topic,
-            skill_level=skill_level,
-            age_group=age_group,
-            additional_notes=additional_notes,
-            materials_text=materials_text,
-            file_data=file_data,
-            mime_type=mime_type
-        )
+        if check_similar:
+            similar = course_index.similar(topic, skill_level, age_group)
+            if similar:
+                return {"similarCourses": similar}
+
+        with metrics.PeakRssSampler("/generate_course") as rss:
+            if file:
+                check_upload_size(file)
+                if is_text_upload(file):
+                    # Plain text is cheaper to inline than to upload and reference
+                    extracted = await read_text_upload(file)
+                    materials_text = f"{materials_text}\n\n{extracted}" if materials_text else extracted
+                else:
+                    # Blocking upload and processing poll; keep them off the event loop
+                    uploaded = await asyncio.to_thread(upload_to_gemini, course_generator.client, file)
+
+            result = await asyncio.to_thread(
+                course_generator.generate_course,
+                topic=topic,
+                skill_level=skill_level,
+                age_group=age_group,
+                additional_notes=additional_notes,
+                materials_text=materials_text,
+                file_uri=uploaded.uri if uploaded else None,
+                mime_type=uploaded.mime_type if uploaded else None
+            )
+        logger.info(f"generate_course peak RSS growth: {rss.growth / 1e6:.1f} MB")
 
         # Save the course plan locally for future use
         course_id = save_course_plan_locally(result, topic)
-        print(f"Course plan saved with ID: {course_id}")
+        logger.info(f"Course plan saved with ID: {course_id}")
 
         # Return course data with ID
         return {"course_id": course_id, **result}
+    except HTTPException:
+        raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in generate_course")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if uploaded:
+            await asyncio.to_thread(delete_from_gemini, course_generator.client, uploaded)
+
+@app.get("/courses/search")
+@limiter.limit("60/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def search_courses(request: Request, q: str, skill_level: Optional[str] = None,
+                         age_group: Optional[str] = None, limit: int = 10):
+    """Existing courses ranked by how well their title, units and subtopics match `q`."""
+    return {"results": course_index.search(q, skill_level, age_group, max(1, limit))}
 
 @app.get("/course/{course_id}")
 @limiter.limit("120/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
 async def get_course(request: Request, course_id: str):
     """
     Fetch a saved course plan by its ID.
     """
+    if accepts_gzip(request.headers):
+        compressed = await load_compressed(f"{course_id}.json")
+        if compressed is not None:
+            return precompressed_response(compressed)
+
     data = storage_load(f"{course_id}.json")
     if not data:
         raise HTTPException(status_code=404, detail="Course not found")
 
     return {"course_id": course_id, **data["course_plan"]}
 
+def save_topic(filename: str, lesson: dict) -> None:
+    """
+    Save topic content. A complete lesson's response is precompressed; a
+    partial one (a restarted lesson) drops any gzipped body left by an
+    earlier complete version, which the routes would otherwise serve first.
+    """
+    complete = lesson.get("status") != "partial"
+    if not complete:
+        discard_compressed(filename)
+    storage_save(filename, lesson, precompress=complete)
+
 class TopicRequest(BaseModel):
     courseId: str
     unitNumber: int
@@ -166,22 +284,34 @@ class TopicRequest(BaseModel):
 
 @app.post("/generate_topic")
 @limiter.limit("30/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
 async def generate_topic(request: Request, topic_request: TopicRequest):
     """
     Generates content for a specific topic within a course.
+
+    In progressive mode the first response is a partial lesson (status "partial");
+    poll GET /topic_status until status is "complete".
     """
     try:
-        # Load course plan
-        course_data = storage_load(f"{topic_request.courseId}.json")
+        # A complete lesson has its response body stored gzipped; serve it as is,
+        # without reading the JSON at all
+        topic_filename = f"{topic_request.courseId}_topic_{topic_request.unitNumber}_{topic_request.subtopicIndex}.json"
+        if accepts_gzip(request.headers):
+            compressed = await load_compressed(topic_filename)
+            if compressed is not None:
+                return precompressed_response(compressed)
+
+        # Otherwise load the course plan and any existing topic content together
+        course_data, cached = await gather(
+            load_json(f"{topic_request.courseId}.json"),
+            load_json(topic_filename),
+        )
         if not course_data:
             raise HTTPException(status_code=404, detail="Course not found")
 
         course_plan = course_data["course_plan"]
 
-        # Check if topic content already exists
-        topic_filename = f"{topic_request.courseId}_topic_{topic_request.unitNumber}_{topic_request.subtopicIndex}.json"
-        cached = storage_load(topic_filename)
-        if cached:
+        if cached and not progressive_topics.needs_restart(topic_filename, cached):
             return cached
 
         # Find the specific unit and subtopic
@@ -195,32 +325,65 @@ async def generate_topic(request: Request, topic_request: TopicRequest):
         if topic_request.subtopicIndex < 0 or topic_request.subtopicIndex >= len(subtopics):
             raise HTTPException(status_code=404, detail="Subtopic not found")
 
-        subtopic_title = subtopics[topic_request.subtopicIndex]
-
-        # Generate content
-        content = course_generator.generate_topic_content(
-            course_title=course_plan.get("courseTitle"),
-            unit_title=unit.get("title"),
-            subtopic=subtopic_title,
-            skill_level=course_plan.get("metadata", {}).get("skillLevel", "Intermediate"),
-            age_group=course_plan.get("metadata", {}).get("ageGroup", "Adult"),
-            additional_context=course_plan.get("description", "")
-        )
-
-        if "error" in content:
-            raise HTTPException(status_code=500, detail=content["error"])
-
-        # Save to storage
-        storage_save(topic_filename, content)
+        context = {
+            "course_title": course_plan.get("courseTitle"),
+            "unit_title": unit.get("title"),
+            "subtopic": subtopics[topic_request.subtopicIndex],
+            "skill_level": course_plan.get("metadata", {}).get("skillLevel", "Intermediate"),
+            "age_group": course_plan.get("metadata", {}).get("ageGroup", "Adult"),
+            "additional_context": course_plan.get("description", ""),
+        }
 
-        return content
+        if cached:
+            # A partial lesson whose background job failed or was lost with its worker
+            return progressive_topics.resume(course_generator, save_topic, topic_filename, cached, context)
+
+        if not progressive_topics.PROGRESSIVE_TOPICS:
+            content = course_generator.generate_topic_content(**context)
+            if "error" in content:
+                raise HTTPException(status_code=500, detail=content["error"])
+            save_topic(topic_filename, content)
+            return content
+
+        # Serve the opening section now; the remaining sections and the quiz follow in the background
+        opening = course_generator.generate_topic_opening(**context)
+        if "error" in opening:
+            raise HTTPException(status_code=500, detail=opening["error"])
+
+        lesson = progressive_topics.partial_lesson(opening)
+        save_topic(topic_filename, lesson)
+        progressive_topics.launch(course_generator, save_topic, topic_filename, lesson, context)
+        return lesson
 
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Error in generate_topic: {e}")
+        logger.error(f"Error in generate_topic: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/topic_status/{course_id}/{unit_number}/{subtopic_index}")
+@limiter.limit("600/minute")
+async def get_topic_status(request: Request, course_id: str, unit_number: int, subtopic_index: int):
+    """
+    The stored lesson, for clients polling a partial one until it is complete.
+
+    Only reads storage, so it isn't charged against the LLM budget. 404 until
+    POST /generate_topic has started the lesson. A partial lesson whose
+    background job has stopped comes back with "stalled": true; POST
+    /generate_topic again to restart it.
+    """
+    topic_filename = f"{course_id}_topic_{unit_number}_{subtopic_index}.json"
+    if accepts_gzip(request.headers):
+        compressed = await load_compressed(topic_filename)
+        if compressed is not None:
+            return precompressed_response(compressed)
+    lesson = await load_json(topic_filename)
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Topic not generated yet")
+    if progressive_topics.needs_restart(topic_filename, lesson):
+        return {**lesson, "stalled": True}
+    return lesson
+
 
 ################################
 # ASSESSMENT-RELATED FUNCTIONS #
@@ -261,6 +424,7 @@ class Assessment(BaseModel):
 
 @app.post("/generate_assessment")
 @limiter.limit("30/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
 def generate_assessment(request: Request, selectedOptions: SelectedOptions):
     try:
         # Generate the full assessment dict
@@ -280,6 +444,7 @@ def generate_assessment(request: Request, selectedOptions: SelectedOptions):
 
 @app.post("/evaluate_assessment")
 @limiter.limit("30/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
 def evaluate_assessment(request: Request, quiz_attempt: QuizAttempt):
     correct = sum(1 for r in quiz_attempt.results if r.isCorrect)
     total = len(quiz_attempt.results)
@@ -319,17 +484,8 @@ class Preferences(BaseModel):
     traits: str
     style: str
 
-def get_auth_id(request: Request):
-    token = request.cookies.get("access_token")
-    if not token:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    payload = jwt.decode(token, os.environ["SUPABASE_SECRET_KEY"], algorithms=["HS256"], audience="authenticated")
-    return payload["sub"]
-
 @app.post("update_user_preferences")
-def update_user_prefs(request: Request, prefs: Preferences):
-    token = request.cookies.get("access_token")
-    print(token)
+def update_user_prefs(request: Request, prefs: Preferences, auth_id: str = Depends(get_auth_id)):
     return {'success': 200}
 
 @app.get("/get_user_info")
@@ -344,73 +500,89 @@ class ModuleQuizRequest(BaseModel):
 
 @app.post("/generate_module_quiz")
 @limiter.limit("30/minute")
-async def generate_module_quiz(request: Request, quiz_request: ModuleQuizRequest):
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def generate_module_quiz(request: Request, quiz_request: ModuleQuizRequest,
+                               auth_id: Optional[str] = Depends(optional_auth_id)):
     """Generate or retrieve a cached module-level quiz. Supports adaptive retakes."""
+    quiz_request.auth_id = check_auth_id(quiz_request.auth_id, auth_id)
     try:
-        course_data = storage_load(f"{quiz_request.courseId}.json")
+        quiz_filename = f"{quiz_request.courseId}_module_quiz_{quiz_request.unitNumber}.json"
+        personal_retake = quiz_request.retake and quiz_request.auth_id
+        retake_filename = retake_quizzes.retake_filename(
+            quiz_request.courseId, quiz_request.unitNumber, quiz_request.auth_id
+        ) if personal_retake else None
+        # The course plan, the cached quiz (first attempt), and for a retake the learner's latest attempt,
+        # mastery estimates, any prefetched retake, the unit's question bank and their seen-set, in one round trip
+        course_data, cached, attempts, mastery, prefetched, bank, seen = await gather(
+            load_json(f"{quiz_request.courseId}.json"),
+            skip() if quiz_request.retake else load_json(quiz_filename),
+            optional(recent_attempts(quiz_request.auth_id, quiz_request.courseId, quiz_request.unitNumber, limit=1),
+                     what="fetch latest attempt")
+            if personal_retake else skip(),
+            optional(subtopic_mastery(quiz_request.auth_id, quiz_request.courseId), default={},
+                     what="load mastery")
+            if personal_retake else skip(),
+            load_json(retake_filename) if personal_retake else skip(),
+            optional(bank_questions(quiz_request.courseId, quiz_request.unitNumber), default=[],
+                     what="load question bank")
+            if personal_retake else skip(),
+            optional(seen_question_ids(quiz_request.auth_id, quiz_request.courseId, quiz_request.unitNumber),
+                     default=set(), what="load seen questions")
+            if personal_retake else skip(),
+        )
         if not course_data:
             raise HTTPException(status_code=404, detail="Course not found")
 
         course_plan = course_data["course_plan"]
 
-        quiz_filename = f"{quiz_request.courseId}_module_quiz_{quiz_request.unitNumber}.json"
+        if cached:
+            return cached
 
-        # If not a retake, check cache
-        if not quiz_request.retake:
-            cached = storage_load(quiz_filename)
-            if cached:
-                return cached
+        if personal_retake:
+            retake = retake_quizzes.ready(prefetched, attempts)
+            if retake is None:
+                # Generation for this learner's failed attempt may already be under way; wait for it
+                retake = retake_quizzes.ready(await retake_quizzes.wait(retake_filename), attempts)
+            if retake is not None:
+                return retake
 
         # Find the unit
         unit = next((u for u in course_plan.get("units", []) if u.get("unitNumber") == quiz_request.unitNumber), None)
         if not unit:
             raise HTTPException(status_code=404, detail=f"Unit {quiz_request.unitNumber} not found")
 
-        # For retakes, gather weakness data from past attempts
-        previous_weakness_data = None
-        if quiz_request.retake and quiz_request.auth_id:
-            try:
-                attempts = supabase.table("quiz_attempts").select("weak_subtopics,percentage").eq(
-                    "auth_id", quiz_request.auth_id
-                ).eq("course_id", quiz_request.courseId).eq(
-                    "unit_number", quiz_request.unitNumber
-                ).order("attempt_number", desc=True).limit(3).execute()
-
-                if attempts.data:
-                    # Aggregate weak subtopics with frequency
-                    subtopic_counts = {}
-                    for attempt in attempts.data:
-                        for st in attempt.get("weak_subtopics", []):
-                            subtopic_counts[st] = subtopic_counts.get(st, 0) + 1
-                    if subtopic_counts:
-                        previous_weakness_data = {
-                            "weak_subtopics": subtopic_counts,
-                            "last_score": attempts.data[0].get("percentage", 0)
-                        }
-            except Exception as e:
-                print(f"Warning: Failed to fetch weakness data: {e}")
-
-        result = course_generator.generate_module_quiz(
-            course_title=course_plan.get("courseTitle"),
-            unit_title=unit.get("title"),
-            unit_description=unit.get("description", ""),
-            subtopics=unit.get("subtopics", []),
-            skill_level=course_plan.get("metadata", {}).get("skillLevel", "Intermediate"),
-            age_group=course_plan.get("metadata", {}).get("ageGroup", "Adult"),
-            previous_weakness_data=previous_weakness_data
-        )
+        context = retake_quizzes.module_quiz_context(course_plan, unit)
+        if personal_retake:
+            # Assembled from banked questions the learner hasn't seen, weighted toward weak subtopics
+            latest = attempts[0] if attempts else {}
+            weakness = learner_model.weakness(mastery, context["subtopics"], latest.get("percentage", 0),
+                                              missed=latest.get("weak_subtopics") or [])
+            result = question_bank.build_retake(
+                course_generator, quiz_request.courseId, quiz_request.unitNumber, context, weakness, bank, seen
+            )
+        else:
+            result = course_generator.generate_module_quiz(**context)
+            if "error" not in result:
+                question_bank.deposit(quiz_request.courseId, quiz_request.unitNumber, result)
 
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
 
-        storage_save(quiz_filename, result)
+        # Keep an immutable copy so attempts can reference this exact version
+        result["quizVersion"] = save_quiz_snapshot(quiz_request.courseId, quiz_request.unitNumber, result)
+        if personal_retake:
+            latest = attempts[0].get("attempt_number") if attempts else None
+            storage_save(retake_filename, {"basedOnAttempt": latest, "quiz": result})
+        elif not quiz_request.retake:
+            # Only the unit's first quiz is shared; a retake is graded by its quizVersion
+            storage_save(quiz_filename, result)
 
         return result
 
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Error in generate_module_quiz: {e}")
+        logger.error(f"Error in generate_module_quiz: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 class EvaluateQuizRequest(BaseModel):
@@ -419,20 +591,42 @@ class EvaluateQuizRequest(BaseModel):
     mcqAnswers: List[int]
     frqAnswers: List[str]
     auth_id: Optional[str] = None
+    # The quizVersion /generate_module_quiz served; retakes are graded against it
+    quizVersion: Optional[str] = Field(None, pattern=r"^[0-9a-f]{16}$")
 
 @app.post("/evaluate_module_quiz")
 @limiter.limit("30/minute")
-async def evaluate_module_quiz(request: Request, eval_request: EvaluateQuizRequest):
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def evaluate_module_quiz(request: Request, eval_request: EvaluateQuizRequest,
+                               auth_id: Optional[str] = Depends(optional_auth_id)):
     """Evaluate a student's module quiz answers. MCQ scored locally, FRQ scored by Gemini."""
+    eval_request.auth_id = check_auth_id(eval_request.auth_id, auth_id)
     try:
-        # Load the quiz
+        # Load the quiz, the course plan (for metadata), the user's last attempt number and mastery together.
+        # The quiz is the version the client was served, or else the unit's shared quiz; for a client
+        # that doesn't send quizVersion, the learner's pending retake stands in for the shared quiz.
         quiz_filename = f"{eval_request.courseId}_module_quiz_{eval_request.unitNumber}.json"
-        quiz_data = storage_load(quiz_filename)
+        pending_retake = eval_request.auth_id and not eval_request.quizVersion
+        quiz_data, course_data, last_attempt, mastery, retake = await gather(
+            asyncio.to_thread(load_quiz_snapshot, eval_request.courseId, eval_request.unitNumber,
+                              eval_request.quizVersion)
+            if eval_request.quizVersion else load_json(quiz_filename),
+            load_json(f"{eval_request.courseId}.json"),
+            optional(latest_attempt_number(eval_request.auth_id, eval_request.courseId, eval_request.unitNumber),
+                     what="fetch latest attempt number")
+            if eval_request.auth_id else skip(),
+            optional(subtopic_mastery(eval_request.auth_id, eval_request.courseId), what="load mastery")
+            if eval_request.auth_id else skip(),
+            load_json(retake_quizzes.retake_filename(eval_request.courseId, eval_request.unitNumber,
+                                                     eval_request.auth_id))
+            if pending_retake else skip(),
+        )
+        if pending_retake and last_attempt:
+            quiz_data = retake_quizzes.ready(retake, [{"attempt_number": last_attempt}]) or quiz_data
         if not quiz_data:
             raise HTTPException(status_code=404, detail="Quiz not found. Generate it first.")
+        quiz_version = ensure_quiz_version(eval_request.courseId, eval_request.unitNumber, quiz_data)
 
-        # Load course plan for metadata
-        course_data = storage_load(f"{eval_request.courseId}.json")
         if not course_data:
             raise HTTPException(status_code=404, detail="Course not found")
         course_plan = course_data["course_plan"]
@@ -464,7 +658,6 @@ async def evaluate_module_quiz(request: Request, eval_request: EvaluateQuizReque
             skill_level=course_plan.get("metadata", {}).get("skillLevel", "Intermediate"),
             age_group=course_plan.get("metadata", {}).get("ageGroup", "Adult")
         )
-        print(f"FRQ Evaluation Result: {eval_result}")
 
         if "error" in eval_result:
             raise HTTPException(status_code=500, detail=eval_result["error"])
@@ -490,20 +683,11 @@ async def evaluate_module_quiz(request: Request, eval_request: EvaluateQuizReque
         # Deduplicate
         weak_subtopics = list(dict.fromkeys(weak_subtopics))
 
-        # Store results in Supabase if auth_id is provided
-        attempt_number = 1
-        if eval_request.auth_id:
+        # Store results in Supabase if auth_id is provided (and the attempt number could be read)
+        attempt_number = (last_attempt or 0) + 1
+        attempt_stored = False
+        if eval_request.auth_id and last_attempt is not None:
             try:
-                # Get latest attempt number
-                existing = supabase.table("quiz_attempts").select("attempt_number").eq(
-                    "auth_id", eval_request.auth_id
-                ).eq("course_id", eval_request.courseId).eq(
-                    "unit_number", eval_request.unitNumber
-                ).order("attempt_number", desc=True).limit(1).execute()
-
-                if existing.data:
-                    attempt_number = existing.data[0]["attempt_number"] + 1
-
                 frq_evaluations = eval_result.get("frqEvaluations", [])
 
                 supabase.table("quiz_attempts").insert({
@@ -519,16 +703,33 @@ async def evaluate_module_quiz(request: Request, eval_request: EvaluateQuizReque
                     "total_possible": total_possible,
                     "percentage": percentage,
                     "passed": passed,
-                    "mcq_results": mcq_results,
-                    "frq_evaluations": frq_evaluations,
+                    **encode_attempt(quiz_version, mcq_results, frq_evaluations),
                     "weak_subtopics": weak_subtopics,
                     "overall_feedback": eval_result.get("overallFeedback", "")
                 }).execute()
-                print(f"Quiz attempt #{attempt_number} stored for user {eval_request.auth_id}")
+                attempt_stored = True
+                logger.info(f"Quiz attempt #{attempt_number} stored for user {eval_request.auth_id}")
             except Exception as store_err:
-                print(f"Warning: Failed to store quiz attempt: {store_err}")
+                logger.warning(f"Failed to store quiz attempt: {store_err}")
                 # Non-blocking: still return results
 
+        if attempt_stored:
+            question_bank.mark_seen(eval_request.auth_id, eval_request.courseId, eval_request.unitNumber, quiz_data)
+            # Fold this attempt into the stored mastery estimates, and into the copy read above
+            obs = learner_model.observations(mcq_results, frq_questions, eval_result.get("frqEvaluations", []))
+            learner_model.record(eval_request.auth_id, eval_request.courseId, obs)
+            if mastery is not None:
+                mastery = {**mastery, **learner_model.apply(mastery, obs)}
+
+        # A failed attempt is almost always followed by a retake; start building it now
+        unit = next((u for u in course_plan.get("units", []) if u.get("unitNumber") == eval_request.unitNumber), None)
+        if not passed and attempt_stored and unit and retake_quizzes.SPECULATIVE_RETAKES:
+            retake_quizzes.schedule(
+                course_generator, storage_save, eval_request.courseId, eval_request.unitNumber,
+                eval_request.auth_id, retake_quizzes.module_quiz_context(course_plan, unit), attempt_number,
+                learner_model.weakness(mastery or {}, unit.get("subtopics", []), percentage, missed=weak_subtopics),
+            )
+
         return {
             "mcqResults": mcq_results,
             "mcqScore": mcq_score,
@@ -543,6 +744,7 @@ async def evaluate_module_quiz(request: Request, eval_request: EvaluateQuizReque
             "percentage": percentage,
             "passed": passed,
             "attemptNumber": attempt_number,
+            "quizVersion": quiz_version,
             "weakSubtopics": weak_subtopics,
             "overallFeedback": eval_result.get("overallFeedback", "")
         }
@@ -550,32 +752,214 @@ async def evaluate_module_quiz(request: Request, eval_request: EvaluateQuizReque
     except HTTPException as he:
         raise he
     except Exception as e:
-        print(f"Error in evaluate_module_quiz: {e}")
+        logger.error(f"Error in evaluate_module_quiz: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class AnswerSheet(BaseModel):
+    auth_id: str
+    mcqAnswers: List[int]
+    frqAnswers: List[str]
+
+class BatchEvaluateRequest(BaseModel):
+    courseId: str
+    unitNumber: int
+    sheets: List[AnswerSheet]
+
+@app.post("/evaluate_module_quiz/batch")
+@limiter.limit("10/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def evaluate_module_quiz_batch(request: Request, batch_request: BatchEvaluateRequest,
+                                     grader_id: str = Depends(get_grader_id)):
+    """Grade a class's module quiz answer sheets together and store every learner's attempt.
+
+    MCQs are scored as one matrix comparison, FRQ answers are graded per question in
+    batches (batch_grading.py) and all attempts are written with one insert.
+    `stored` is true when every attempt was saved; each result says whether its own was.
+    """
+    sheets = batch_request.sheets
+    auth_ids = [sheet.auth_id for sheet in sheets]
+    if not sheets or len(sheets) > batch_grading.MAX_SHEETS:
+        raise HTTPException(status_code=400, detail=f"Submit between 1 and {batch_grading.MAX_SHEETS} sheets")
+    if len(set(auth_ids)) != len(auth_ids):
+        raise HTTPException(status_code=400, detail="Only one answer sheet per learner")
+    course_id, unit_number = batch_request.courseId, batch_request.unitNumber
+    try:
+        quiz_data, course_data, last_attempts = await gather(
+            load_json(f"{course_id}_module_quiz_{unit_number}.json"),
+            load_json(f"{course_id}.json"),
+            optional(latest_attempt_numbers(auth_ids, course_id, unit_number), what="fetch latest attempt numbers"),
+        )
+        if not quiz_data:
+            raise HTTPException(status_code=404, detail="Quiz not found. Generate it first.")
+        quiz_version = ensure_quiz_version(course_id, unit_number, quiz_data)
+
+        if not course_data:
+            raise HTTPException(status_code=404, detail="Course not found")
+        metadata = course_data["course_plan"].get("metadata", {})
+        try:
+            # Indices go into an int64 matrix; anything but a real option is a client error
+            batch_grading.check_mcq_answers(quiz_data.get("multipleChoice", []),
+                                            [sheet.mcqAnswers for sheet in sheets])
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # FRQ batches wait on the LLM; keep the event loop free meanwhile
+        try:
+            results = await asyncio.to_thread(
+                batch_grading.grade, course_generator, quiz_data,
+                [sheet.mcqAnswers for sheet in sheets], [sheet.frqAnswers for sheet in sheets],
+                metadata.get("skillLevel", "Intermediate"), metadata.get("ageGroup", "Adult"),
+            )
+        except batch_grading.GradingError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        for auth_id, result in zip(auth_ids, results):
+            result["auth_id"] = auth_id
+            result["attemptNumber"] = (last_attempts or {}).get(auth_id, 0) + 1
+
+        # One insert for the whole class (skipped if the attempt numbers couldn't be read)
+        stored_ids = set()
+        if last_attempts is not None:
+            rows = [{
+                "auth_id": result["auth_id"],
+                "course_id": course_id,
+                "unit_number": unit_number,
+                "attempt_number": result["attemptNumber"],
+                "mcq_score": result["mcqScore"],
+                "mcq_total": result["mcqTotal"],
+                "frq_score": result["frqScore"],
+                "frq_total": result["frqTotal"],
+                "total_score": result["totalScore"],
+                "total_possible": result["totalPossible"],
+                "percentage": result["percentage"],
+                "passed": result["passed"],
+                **encode_attempt(quiz_version, result["mcqResults"], result["frqEvaluations"]),
+                "weak_subtopics": result["weakSubtopics"],
+                "overall_feedback": "",
+            } for result in results]
+            try:
+                supabase.table("quiz_attempts").insert(rows).execute()
+                stored_ids = set(auth_ids)
+            except Exception as store_err:
+                # One conflicting row (e.g. a concurrent submission took its attempt
+                # number) fails the whole insert; store the rest one by one
+                logger.warning(f"Batch insert of quiz attempts failed, storing one at a time: {store_err}")
+                for row in rows:
+                    try:
+                        supabase.table("quiz_attempts").insert(row).execute()
+                        stored_ids.add(row["auth_id"])
+                    except Exception as row_err:
+                        logger.warning(f"Failed to store quiz attempt for user {row['auth_id']}: {row_err}")
+            logger.info(f"{len(stored_ids)} of {len(results)} quiz attempts stored for {course_id} "
+                        f"unit {unit_number} by {grader_id}")
+        for result in results:
+            result["stored"] = result["auth_id"] in stored_ids
+        stored = len(stored_ids) == len(results)
+
+        if stored_ids:
+            stored_results = [result for result in results if result["stored"]]
+            question_bank.mark_seen_many([result["auth_id"] for result in stored_results],
+                                         course_id, unit_number, quiz_data)
+            frq_questions = quiz_data.get("freeResponse", [])
+            learner_model.record_many(course_id, {
+                result["auth_id"]: learner_model.observations(result["mcqResults"], frq_questions,
+                                                              result["frqEvaluations"])
+                for result in stored_results
+            })
+
+        return {"quizVersion": quiz_version, "stored": stored, "results": results}
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error in evaluate_module_quiz_batch: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 ################################
 # QUIZ ATTEMPTS & STATUS      #
 ################################
 
+ATTEMPT_LIST_FIELDS = (
+    "attempt_number", "percentage", "passed", "mcq_score", "mcq_total", "frq_score", "frq_total",
+    "total_score", "total_possible", "weak_subtopics", "overall_feedback", "quiz_version", "created_at",
+)
+
 @app.get("/quiz_attempts/{course_id}/{unit_number}")
 @limiter.limit("120/minute")
-async def get_quiz_attempts(request: Request, course_id: str, unit_number: int, auth_id: str):
-    """Return all quiz attempts for a user/course/unit."""
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def get_quiz_attempts(request: Request, course_id: str, unit_number: int, auth_id: str,
+                            after: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE,
+                            fields: Optional[str] = None, user_id: str = Depends(get_auth_id)):
+    """Return a page of quiz attempts for a user/course/unit, oldest first.
+
+    Pass the returned `next_cursor` as `after` to fetch the next page.
+    """
+    check_auth_id(auth_id, user_id)
+    columns = select_columns(fields, ATTEMPT_LIST_FIELDS, ATTEMPT_LIST_FIELDS, "attempt_number")
+    limit = page_size(limit)
+    try:
+        query = supabase.table("quiz_attempts").select(columns).eq("auth_id", auth_id).eq(
+            "course_id", course_id
+        ).eq("unit_number", unit_number)
+        if after is not None:
+            query = query.gt("attempt_number", after)
+        result = query.order("attempt_number", desc=False).limit(limit + 1).execute()
+        page = split_page(result.data, limit, "attempt_number")
+        return {"attempts": page["rows"], "next_cursor": page["next_cursor"]}
+    except Exception as e:
+        logger.error(f"Error fetching quiz attempts: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/quiz_attempts/{course_id}/{unit_number}/{attempt_number}")
+@limiter.limit("120/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def get_quiz_attempt_detail(request: Request, course_id: str, unit_number: int,
+                                  attempt_number: int, auth_id: str, user_id: str = Depends(get_auth_id)):
+    """Return one attempt with per-question results rehydrated from its quiz version."""
+    check_auth_id(auth_id, user_id)
     try:
-        result = supabase.table("quiz_attempts").select(
-            "attempt_number,percentage,passed,mcq_score,mcq_total,frq_score,frq_total,total_score,total_possible,weak_subtopics,overall_feedback,created_at"
-        ).eq("auth_id", auth_id).eq("course_id", course_id).eq(
-            "unit_number", unit_number
-        ).order("attempt_number", desc=False).execute()
-        return {"attempts": result.data}
+        result = supabase.table("quiz_attempts").select("*").eq("auth_id", auth_id).eq(
+            "course_id", course_id
+        ).eq("unit_number", unit_number).eq("attempt_number", attempt_number).limit(1).execute()
     except Exception as e:
-        print(f"Error fetching quiz attempts: {e}")
+        logger.error(f"Error fetching quiz attempt: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    if not result.data:
+        raise HTTPException(status_code=404, detail="Attempt not found")
+    row = result.data[0]
+
+    quiz = None
+    if row.get("quiz_version"):
+        quiz = load_quiz_snapshot(course_id, unit_number, row["quiz_version"])
+        if quiz is None:
+            raise HTTPException(status_code=404, detail="Quiz version not found")
+    details = rehydrate_attempt(row, quiz)
+
+    return {
+        **details,
+        "attemptNumber": row["attempt_number"],
+        "quizVersion": row.get("quiz_version"),
+        "mcqScore": row["mcq_score"],
+        "mcqTotal": row["mcq_total"],
+        "frqScore": row["frq_score"],
+        "frqTotal": row["frq_total"],
+        "totalScore": row["total_score"],
+        "totalPossible": row["total_possible"],
+        "percentage": row["percentage"],
+        "passed": row["passed"],
+        "weakSubtopics": row.get("weak_subtopics", []),
+        "overallFeedback": row.get("overall_feedback", ""),
+        "createdAt": row.get("created_at")
+    }
+
 @app.get("/module_quiz_status/{course_id}")
 @limiter.limit("120/minute")
-async def get_module_quiz_status(request: Request, course_id: str, auth_id: str):
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def get_module_quiz_status(request: Request, course_id: str, auth_id: str,
+                                 user_id: str = Depends(get_auth_id)):
     """Return per-unit quiz pass/fail status for a course."""
+    check_auth_id(auth_id, user_id)
     try:
         result = supabase.table("quiz_attempts").select(
             "unit_number,attempt_number,percentage,passed"
@@ -600,7 +984,45 @@ async def get_module_quiz_status(request: Request, course_id: str, auth_id: str)
 
         return {"units": list(units_status.values())}
     except Exception as e:
-        print(f"Error fetching quiz status: {e}")
+        logger.error(f"Error fetching quiz status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/mastery/{course_id}")
+@limiter.limit("120/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def get_subtopic_mastery(request: Request, course_id: str, auth_id: str,
+                               user_id: str = Depends(get_auth_id)):
+    """Return the user's estimated mastery of each subtopic they've been quizzed on, and the weakest ones."""
+    check_auth_id(auth_id, user_id)
+    try:
+        mastery = await subtopic_mastery(auth_id, course_id)
+    except Exception as e:
+        logger.error(f"Error fetching mastery: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "subtopics": [
+            {"subtopic": subtopic, "mastery": round(row["mastery"], 3), "observations": row["observations"]}
+            for subtopic, row in mastery.items()
+        ],
+        "recommended": learner_model.recommendations(mastery),
+    }
+
+@app.get("/cohort_analytics/{course_id}")
+@limiter.limit("30/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def get_cohort_analytics(request: Request, course_id: str, user_id: str = Depends(get_grader_id)):
+    """Class-wide quiz statistics for a course: score distributions, subtopic miss rates, item analysis.
+
+    Exposes question text and every learner's results, so only graders (GRADER_IDS) may read it;
+    courses have no recorded owner to check against. Attempts submitted since the last call are
+    folded into the cached statistics first.
+    """
+    try:
+        # Folding a large backlog of attempts is CPU and I/O heavy; keep it off the event loop
+        return await asyncio.to_thread(cohort_analytics.cohort_report, course_id)
+    except Exception as e:
+        logger.error(f"Error computing cohort analytics: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 ################################
@@ -617,21 +1039,27 @@ class UpdateProgressRequest(BaseModel):
     completed_topics: List[str]
     last_visited: Optional[str] = None
 
+class TopicProgressRequest(BaseModel):
+    auth_id: str
+    course_id: str
+    topic_id: str  # "unitNumber-subtopicIndex"
+    completed: bool = True
+    last_visited: Optional[str] = None
+
 @app.post("/enroll")
 @limiter.limit("120/minute")
-async def enroll_in_course(request: Request, enroll_request: EnrollRequest):
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def enroll_in_course(request: Request, enroll_request: EnrollRequest, user_id: str = Depends(get_auth_id)):
     """Enroll a user in a course. Reads course JSON to denormalize metadata."""
-    print(f"[enroll] auth_id={enroll_request.auth_id}, course_id={enroll_request.course_id}")
+    check_auth_id(enroll_request.auth_id, user_id)
+    logger.info(f"[enroll] auth_id={enroll_request.auth_id}, course_id={enroll_request.course_id}")
 
     course_data = storage_load(f"{enroll_request.course_id}.json")
     if not course_data:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    print(f"[enroll] course_data top-level keys: {list(course_data.keys())}")
     plan = course_data.get("course_plan", {})
     metadata = plan.get("metadata", {})
-    print(f"[enroll] plan keys: {list(plan.keys())}")
-    print(f"[enroll] metadata: {metadata}")
 
     row = {
         "auth_id": enroll_request.auth_id,
@@ -642,85 +1070,125 @@ async def enroll_in_course(request: Request, enroll_request: EnrollRequest):
         "age_group": metadata.get("ageGroup", ""),
         "estimated_duration": metadata.get("estimatedTotalDuration", ""),
     }
-    print(f"[enroll] inserting row: {row}")
+    logger.debug(f"[enroll] inserting row: {row}")
 
     try:
         result = supabase.table("user_courses").insert(row).execute()
-        print(f"[enroll] insert success: {result.data}")
+        logger.debug(f"[enroll] insert success: {result.data}")
+        mark_enrolled(enroll_request.auth_id, enroll_request.course_id)
         return {"message": "Enrolled successfully", "data": result.data}
     except Exception as e:
         error_msg = str(e)
-        print(f"[enroll] insert error: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.info(f"[enroll] insert error: {error_msg}")
         if "duplicate" in error_msg.lower() or "unique" in error_msg.lower() or "23505" in error_msg:
             # Already enrolled - return existing record
             existing = supabase.table("user_courses").select("*").eq(
                 "auth_id", enroll_request.auth_id
             ).eq("course_id", enroll_request.course_id).execute()
+            mark_enrolled(enroll_request.auth_id, enroll_request.course_id)
             return {"message": "Already enrolled", "data": existing.data}
         raise HTTPException(status_code=500, detail=error_msg)
 
+USER_COURSE_FIELDS = (
+    "id", "auth_id", "course_id", "course_title", "course_description", "skill_level", "age_group",
+    "estimated_duration", "completed_topics", "completed_bitmap", "last_visited", "is_completed",
+    "enrolled_at",
+)
+# enrolled_at isn't unique; id breaks ties so rows sharing a timestamp aren't skipped
+USER_COURSE_CURSOR = ("enrolled_at", "id")
+
 @app.get("/user/{auth_id}/courses")
 @limiter.limit("120/minute")
-async def get_user_courses(request: Request, auth_id: str):
-    """Return all enrolled courses for a user."""
-    result = supabase.table("user_courses").select("*").eq(
-        "auth_id", auth_id
-    ).order("enrolled_at", desc=True).execute()
-    return {"courses": result.data}
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def get_user_courses(request: Request, auth_id: str, before: Optional[str] = None,
+                           limit: int = DEFAULT_PAGE_SIZE, fields: Optional[str] = None,
+                           user_id: str = Depends(get_auth_id)):
+    """Return a page of enrolled courses for a user, most recent first.
+
+    Pass the returned `next_cursor` as `before` to fetch the next page.
+    """
+    check_auth_id(auth_id, user_id)
+    columns = select_columns(fields, USER_COURSE_FIELDS, ("*",), USER_COURSE_CURSOR)
+    if "completed_topics" in columns.split(","):
+        # Needed to decode completed_topics from the bitmap
+        columns += ",course_id,completed_bitmap"
+    limit = page_size(limit)
+    query = supabase.table("user_courses").select(columns).eq("auth_id", auth_id)
+    if before is not None:
+        query = query.or_(keyset_filter(before, USER_COURSE_CURSOR))
+    result = query.order("enrolled_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+    page = split_page(result.data, limit, USER_COURSE_CURSOR)
+    for row in page["rows"]:
+        # The bitmap is authoritative; completed_topics may predate the last buffered write
+        if row.get("completed_bitmap") is not None and "completed_topics" in row:
+            ids, _ = topic_index(row["course_id"])
+            row["completed_topics"] = topics_from_bitstring(row["completed_bitmap"], ids)
+    return {"courses": page["rows"], "next_cursor": page["next_cursor"]}
+
+def _queue_progress(auth_id: str, course_id: str, set_mask: int, clear_mask: int,
+                    last_visited: Optional[str]) -> dict:
+    """Buffer a completed-topic delta; is_completed is recomputed when it is applied."""
+    ids, _ = topic_index(course_id)
+    update_data = {
+        "set_mask": set_mask,
+        "clear_mask": clear_mask,
+        "width": len(ids),
+        "unit_numbers": unit_numbers(course_id),
+        "topic_ids": ids,
+    }
+    if last_visited is not None:
+        update_data["last_visited"] = last_visited
+    return progress_buffer.put(auth_id, course_id, update_data)
 
 @app.post("/update_progress")
 @limiter.limit("120/minute")
-async def update_progress(request: Request, progress_request: UpdateProgressRequest):
-    """Update progress for a user's enrolled course."""
-    # Verify enrollment exists
-    existing = supabase.table("user_courses").select("id").eq(
-        "auth_id", progress_request.auth_id
-    ).eq("course_id", progress_request.course_id).execute()
-
-    if not existing.data:
-        raise HTTPException(status_code=404, detail="Not enrolled in this course")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def update_progress(request: Request, progress_request: UpdateProgressRequest,
+                          user_id: str = Depends(get_auth_id)):
+    """Replace the full completed-topic set for a user's enrolled course.
 
-    # Compute is_completed by comparing to total topics AND quiz passes
-    is_completed = False
-    course_data = storage_load(f"{progress_request.course_id}.json")
-    if course_data:
-        plan = course_data.get("course_plan", {})
-        units = plan.get("units", [])
-        total_topics = sum(len(u.get("subtopics", [])) for u in units)
-        all_topics_done = total_topics > 0 and len(progress_request.completed_topics) >= total_topics
-
-        # Check if all units have a passing quiz attempt (>=80%)
-        all_quizzes_passed = False
-        if all_topics_done:
-            try:
-                quiz_results = supabase.table("quiz_attempts").select(
-                    "unit_number,passed"
-                ).eq("auth_id", progress_request.auth_id).eq(
-                    "course_id", progress_request.course_id
-                ).eq("passed", True).execute()
-
-                passed_units = set(r["unit_number"] for r in quiz_results.data)
-                all_unit_numbers = set(u.get("unitNumber") for u in units)
-                all_quizzes_passed = all_unit_numbers.issubset(passed_units)
-            except Exception as e:
-                print(f"Warning: Failed to check quiz passes: {e}")
+    Prefer /update_progress/topic, which sends one topic per call.
+    """
+    check_auth_id(progress_request.auth_id, user_id)
+    if not is_enrolled(progress_request.auth_id, progress_request.course_id):
+        raise HTTPException(status_code=404, detail="Not enrolled in this course")
 
-        is_completed = all_topics_done and all_quizzes_passed
+    ids, positions = topic_index(progress_request.course_id)
+    # Duplicate and unknown topic ids can't inflate completion
+    completed = mask_for(progress_request.completed_topics, positions)
+    all_topics = (1 << len(ids)) - 1
+    _queue_progress(progress_request.auth_id, progress_request.course_id,
+                    completed, all_topics & ~completed, progress_request.last_visited)
+
+    return {"message": "Progress updated", "data": [{
+        "auth_id": progress_request.auth_id,
+        "course_id": progress_request.course_id,
+        "completed_topics": [t for i, t in enumerate(ids) if completed >> i & 1],
+        "last_visited": progress_request.last_visited,
+    }]}
+
+@app.post("/update_progress/topic")
+@limiter.limit("120/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
+async def update_topic_progress(request: Request, topic_request: TopicProgressRequest, user_id: str = Depends(get_auth_id)):
+    """Mark a single topic complete or incomplete."""
+    check_auth_id(topic_request.auth_id, user_id)
+    if not is_enrolled(topic_request.auth_id, topic_request.course_id):
+        raise HTTPException(status_code=404, detail="Not enrolled in this course")
 
-    update_data = {
-        "completed_topics": progress_request.completed_topics,
-        "is_completed": is_completed,
-    }
-    if progress_request.last_visited is not None:
-        update_data["last_visited"] = progress_request.last_visited
+    _, positions = topic_index(topic_request.course_id)
+    position = positions.get(topic_request.topic_id)
+    if position is None:
+        raise HTTPException(status_code=400, detail=f"Unknown topic {topic_request.topic_id}")
 
-    result = supabase.table("user_courses").update(update_data).eq(
-        "auth_id", progress_request.auth_id
-    ).eq("course_id", progress_request.course_id).execute()
+    bit = 1 << position
+    if topic_request.completed:
+        _queue_progress(topic_request.auth_id, topic_request.course_id, bit, 0, topic_request.last_visited)
+    else:
+        _queue_progress(topic_request.auth_id, topic_request.course_id, 0, bit, topic_request.last_visited)
 
-    return {"message": "Progress updated", "data": result.data}
+    return {"message": "Progress updated", "topic_id": topic_request.topic_id,
+            "completed": topic_request.completed}
 
 
 ################################
@@ -731,27 +1199,33 @@ class ConversationMessage(BaseModel):
     role: str  # "user" or "model"
     text: str
 
+SESSION_EXPIRED = "session_expired"
+
 class QuizHelpTextRequest(BaseModel):
     courseId: str
     unitNumber: int
     questionIndex: int
     questionType: str  # "mcq" or "frq"
-    conversationHistory: List[ConversationMessage]
     studentMessage: str
+    # Server-side tutor session; when omitted, a new one is seeded from conversationHistory
+    sessionId: Optional[str] = None
+    conversationHistory: List[ConversationMessage] = []
 
 @app.post("/quiz_help/text")
 @limiter.limit("30/minute")
+@limiter.shared_limit(RATE_LIMIT_BUDGET, scope="budget", cost=request_cost)
 async def quiz_help_text(request: Request, help_request: QuizHelpTextRequest):
     """Socratic tutor text help for a quiz question."""
     try:
-        # Load quiz data
+        # Load the quiz and the course metadata (skill level / age group) together
         quiz_filename = f"{help_request.courseId}_module_quiz_{help_request.unitNumber}.json"
-        quiz_data = storage_load(quiz_filename)
+        quiz_data, course_data = await gather(
+            load_json(quiz_filename),
+            load_json(f"{help_request.courseId}.json"),
+        )
         if not quiz_data:
             raise HTTPException(status_code=404, detail="Quiz not found")
 
-        # Load course metadata for skill level / age group
-        course_data = storage_load(f"{help_request.courseId}.json")
         if not course_data:
             raise HTTPException(status_code=404, detail="Course not found")
         course_plan = course_data["course_plan"]
@@ -769,26 +1243,34 @@ async def quiz_help_text(request: Request, help_request: QuizHelpTextRequest):
 
         question = questions[help_request.questionIndex]
 
-        # Build conversation history as list of dicts
-        history = [{"role": msg.role, "text": msg.text} for msg in help_request.conversationHistory]
+        session_key = (help_request.courseId, help_request.unitNumber,
+                       help_request.questionIndex, help_request.questionType)
+        if help_request.sessionId:
+            session = tutor_sessions.get(help_request.sessionId, *session_key)
+            if session is None:
+                # Expired, evicted or held by another worker: the client resends its history.
+                # 410 keeps this apart from the 404s for a missing quiz or question,
+                # which re-seeding can't fix.
+                raise HTTPException(status_code=410, detail=SESSION_EXPIRED)
+        else:
+            history = [{"role": msg.role, "text": msg.text} for msg in help_request.conversationHistory]
+            session = tutor_sessions.create(*session_key, history=history)
 
-        response_text = quiz_helper.text_help(
+        response_text = quiz_helper.session_help(
+            session=session,
             question=question,
             question_type=help_request.questionType,
-            conversation_history=history,
             student_message=help_request.studentMessage,
             skill_level=skill_level,
             age_group=age_group
         )
 
-        return {"response": response_text}
+        return {"response": response_text, "sessionId": session.id}
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in quiz_help_text: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in quiz_help_text")
         raise HTTPException(status_code=500, detail=str(e))
 
 
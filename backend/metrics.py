@@ -0,0 +1,316 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Tuple, Optional, Sequence, List
+
+# --- Metric primitives (Prometheus text exposition format) ---
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MEMORY_BUCKETS = tuple(mb * 1024 * 1024 for mb in (1, 4, 16, 32, 64, 128, 256, 512, 1024))
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def total(self) -> float:
+        """Sum across all label combinations."""
+        with self._lock:
+            return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                label_values, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, *label_values: str) -> int:
+        entry = self._values.get(label_values)
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), t[0]) for k, (c, t) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Application metrics ---
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status"),
+)
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "Gemini generate_content latency",
+    ("task", "model", "outcome"), buckets=LLM_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Gemini tokens by direction (input, output, thinking)",
+    ("task", "model", "direction"),
+)
+LLM_COST = Counter(
+    "llm_cost_usd_total", "Estimated Gemini spend from token counts and LLM_PRICES",
+    ("task", "model"),
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total", "Gemini calls retried after a failure",
+    ("task", "model"),
+)
+LLM_HEDGES = Counter(
+    "llm_hedged_requests_total", "Duplicate Gemini requests sent after the p95 latency",
+    ("task", "model"),
+)
+LLM_ESCALATIONS = Counter(
+    "llm_escalations_total", "Responses regenerated on a stronger model after failing validation",
+    ("task", "from_model", "to_model"),
+)
+LLM_REPAIRS = Counter(
+    "llm_repaired_responses_total",
+    "Invalid structured responses recovered without regenerating (local repair, continuation, patch)",
+    ("task", "method"),
+)
+PROMPT_TRIMMED_TOKENS = Counter(
+    "prompt_trimmed_tokens_total", "Estimated input tokens cut from prompts to fit their budget",
+    ("task", "field"),
+)
+DEPENDENCY_LATENCY = Histogram(
+    "dependency_call_duration_seconds", "Supabase and storage HTTP call latency",
+    ("dependency", "operation"),
+)
+REQUEST_PEAK_RSS = Histogram(
+    "http_request_peak_rss_growth_bytes", "Peak process RSS above its level at request start",
+    ("route",), buckets=MEMORY_BUCKETS,
+)
+
+# USD per 1M tokens (input, output). List prices at time of writing; override
+# with LLM_PRICES='{"model": [input, output], ...}'.
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-3-flash-preview": (0.50, 3.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-exp": (0.10, 0.40),
+}
+MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()})
+
+
+def observe_llm_call(task: str, model: str, seconds: float, usage=None, outcome: str = "ok") -> None:
+    """Record one generate_content call. `usage` is the response's usage_metadata."""
+    LLM_LATENCY.observe(seconds, task, model, outcome)
+    if usage is None:
+        return
+    input_tokens = getattr(usage, "prompt_token_count", None) or 0
+    output_tokens = getattr(usage, "candidates_token_count", None) or 0
+    thinking_tokens = getattr(usage, "thoughts_token_count", None) or 0
+    LLM_TOKENS.inc(task, model, "input", amount=input_tokens)
+    LLM_TOKENS.inc(task, model, "output", amount=output_tokens)
+    if thinking_tokens:
+        LLM_TOKENS.inc(task, model, "thinking", amount=thinking_tokens)
+    price = MODEL_PRICES.get(model)
+    if price:
+        # Thinking tokens are billed as output
+        cost = (input_tokens * price[0] + (output_tokens + thinking_tokens) * price[1]) / 1_000_000
+        LLM_COST.inc(task, model, amount=cost)
+
+
+# --- Per-request dependency accounting ---
+
+# dependency -> [call count, total seconds] for the request being handled
+_request_calls: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_calls", default=None)
+
+
+def start_request() -> Dict[str, List[float]]:
+    calls: Dict[str, List[float]] = {}
+    _request_calls.set(calls)
+    return calls
+
+
+def observe_dependency_call(dependency: str, operation: str, seconds: float) -> None:
+    DEPENDENCY_LATENCY.observe(seconds, dependency, operation)
+    calls = _request_calls.get()
+    if calls is not None:
+        entry = calls.setdefault(dependency, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def server_timing(calls: Dict[str, List[float]], total_seconds: float) -> str:
+    """Server-Timing header value summarising dependency time for a request."""
+    parts = [f"{dep};dur={seconds * 1000:.1f};desc=\"{int(count)} calls\""
+             for dep, (count, seconds) in calls.items()]
+    parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# --- Memory ---
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or None where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class PeakRssSampler:
+    """
+    Samples process RSS on a background thread while the block runs and
+    records how far it rose above the starting level. RSS is process-wide,
+    so concurrent requests inflate each other's numbers; it is meant to catch
+    handlers that buffer whole payloads, not for exact accounting.
+    """
+
+    def __init__(self, route: str, interval: float = 0.02):
+        self.route = route
+        self.interval = interval
+        self.baseline = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def growth(self) -> int:
+        if self.baseline is None or self.peak is None:
+            return 0
+        return max(0, self.peak - self.baseline)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            current = rss_bytes()
+            if current is not None:
+                self.peak = max(self.peak, current)
+
+    def __enter__(self):
+        self.baseline = self.peak = rss_bytes()
+        if self.baseline is not None:
+            self._thread = threading.Thread(target=self._sample, daemon=True, name="rss-sampler")
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            current = rss_bytes()
+            if current is not None:
+                self.peak = max(self.peak, current)
+            REQUEST_PEAK_RSS.observe(self.growth, self.route)
+        return False
+
+
+# --- httpx hooks for the Supabase client ---
+
+def _dependency_for(path: str) -> Tuple[str, str]:
+    # /rest/v1/<table>, /rest/v1/rpc/<fn>, /storage/v1/object/<bucket>/<file>
+    segments = [s for s in path.split("/") if s]
+    if len(segments) >= 3 and segments[0] == "rest":
+        return "supabase", "/".join(segments[2:4]) if segments[2] == "rpc" else segments[2]
+    if segments and segments[0] == "storage":
+        return "storage", segments[2] if len(segments) > 2 else "storage"
+    return segments[0] if segments else "http", ""
+
+
+def httpx_request_hook(request) -> None:
+    request.extensions["claritas_start"] = time.perf_counter()
+
+
+def httpx_response_hook(response) -> None:
+    start = response.request.extensions.get("claritas_start")
+    if start is None:
+        return
+    dependency, operation = _dependency_for(response.request.url.path)
+    observe_dependency_call(dependency, f"{response.request.method} {operation}".strip(),
+                            time.perf_counter() - start)
+
+
+async def async_httpx_request_hook(request) -> None:
+    httpx_request_hook(request)
+
+
+async def async_httpx_response_hook(response) -> None:
+    httpx_response_hook(response)
@@ -0,0 +1,98 @@
+from typing import Optional, Sequence, List, Dict, Any, Union
+from fastapi import HTTPException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+CursorField = Union[str, Sequence[str]]
+
+
+def _cursor_fields(cursor_field: CursorField) -> List[str]:
+    return [cursor_field] if isinstance(cursor_field, str) else list(cursor_field)
+
+
+def select_columns(fields: Optional[str], allowed: Sequence[str],
+                   default: Sequence[str], cursor_field: CursorField) -> str:
+    """
+    Turn a `fields=a,b,c` query parameter into a PostgREST select list.
+
+    Unknown fields are rejected. The cursor columns are always selected so the
+    next page can be requested.
+    """
+    if not fields:
+        columns = list(default)
+    else:
+        columns = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [c for c in columns if c not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "*" not in columns:
+        columns += [f for f in _cursor_fields(cursor_field) if f not in columns]
+    return ",".join(dict.fromkeys(columns))
+
+
+def page_size(limit: int) -> int:
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int, cursor_field: CursorField) -> Dict[str, Any]:
+    """
+    Rows are fetched with limit + 1 so we know whether another page exists
+    without a separate count query.
+
+    With several cursor fields (a sort column that isn't unique plus a
+    tie-breaker) the cursor is their values joined with commas, with any
+    comma or backslash inside a value escaped by a backslash.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        if isinstance(cursor_field, str):
+            next_cursor = rows[-1][cursor_field]
+        else:
+            next_cursor = ",".join(str(rows[-1][f]).replace("\\", "\\\\").replace(",", "\\,")
+                                   for f in cursor_field)
+    return {"rows": rows, "next_cursor": next_cursor}
+
+
+def _cursor_values(cursor: str) -> List[str]:
+    """The values of a composite cursor from `split_page`, unescaped."""
+    values, current, escaped = [], [], False
+    for ch in cursor:
+        if escaped:
+            current.append(ch)
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == ",":
+            values.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    return values + ["".join(current)]
+
+
+def keyset_filter(cursor: str, cursor_fields: Sequence[str], op: str = "lt") -> str:
+    """
+    PostgREST `or` filter for the rows after a composite cursor from `split_page`:
+    a.lt.X,and(a.eq.X,b.lt.Y) for cursor fields (a, b) sorted descending.
+
+    A cursor with fewer values than fields (from before the tie-breaker was
+    added) filters on the leading fields only.
+    """
+    values = _cursor_values(cursor)
+    if len(values) > len(cursor_fields) or not all(values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Timestamps contain PostgREST's reserved . and : characters; inside the
+    # double quotes, \ and " must be escaped so a value can't end the quoting
+    quoted = ['"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values]
+    terms = []
+    for i, value in enumerate(quoted):
+        conditions = [f"{f}.eq.{v}" for f, v in zip(cursor_fields, quoted[:i])]
+        conditions.append(f"{cursor_fields[i]}.{op}.{value}")
+        terms.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+    return ",".join(terms)
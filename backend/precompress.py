@@ -0,0 +1,23 @@
+"""
+Gzipped JSON response bodies, built once when an object is saved.
+
+storage.save_compressed stores these next to the JSON they encode, and the
+routes serve them as they are (compression.precompressed_response). Kept
+free of web-framework imports: storage.py and bulk_generate.py run outside
+the app.
+"""
+import gzip
+import json
+
+# Precompressed objects are compressed once and served many times
+PRECOMPRESS_LEVEL = 9
+
+
+def json_body(data) -> bytes:
+    """`data` encoded exactly as a route returning it would send it."""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def gzip_json(data, level: int = PRECOMPRESS_LEVEL) -> bytes:
+    # mtime=0 keeps the bytes identical for identical content
+    return gzip.compress(json_body(data), compresslevel=level, mtime=0)
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from database import supabase
+from topic_bitmap import merge_masks, to_bitstring
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "2.0"))
+MAX_PENDING = int(os.getenv("PROGRESS_MAX_PENDING", "500"))
+
+Key = Tuple[str, str]
+
+
+def _apply_progress_deltas(rows: List[dict]) -> None:
+    # apply_progress_deltas (sql/progress_bitmap.sql) ORs/clears the masks into
+    # the stored bitmap and recomputes is_completed in the same statement, so
+    # deltas from different workers never overwrite each other. topic_ids lets
+    # it seed unmigrated rows from completed_topics and keep that list in step.
+    deltas = [{
+        "auth_id": row["auth_id"],
+        "course_id": row["course_id"],
+        "width": row["width"],
+        "set_mask": to_bitstring(row["set_mask"], row["width"]),
+        "clear_mask": to_bitstring(row["clear_mask"], row["width"]),
+        "last_visited": row.get("last_visited"),
+        "unit_numbers": row["unit_numbers"],
+        "topic_ids": row["topic_ids"],
+    } for row in rows]
+    supabase.rpc("apply_progress_deltas", {"deltas": deltas}).execute()
+
+
+class ProgressBuffer:
+    """
+    Write-behind buffer for progress updates.
+
+    Updates are (set_mask, clear_mask) deltas over the completed-topic bitmap.
+    They are coalesced per (auth_id, course_id) and flushed as one batched
+    call every `flush_interval` seconds, when `max_pending` keys are waiting,
+    or on shutdown.
+    """
+
+    def __init__(self, write_rows: Callable[[List[dict]], None] = _apply_progress_deltas,
+                 flush_interval: float = FLUSH_INTERVAL, max_pending: int = MAX_PENDING):
+        self._write_rows = write_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Key, dict] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def put(self, auth_id: str, course_id: str, update: dict) -> dict:
+        """Queue an update and return the row as it will be written."""
+        key = (auth_id, course_id)
+        previous = self._pending.get(key)
+        row = {**(previous or {}), **update, "auth_id": auth_id, "course_id": course_id}
+        if previous:
+            row["set_mask"], row["clear_mask"] = merge_masks(
+                (previous["set_mask"], previous["clear_mask"]),
+                (update["set_mask"], update["clear_mask"]),
+            )
+        self._pending[key] = row
+        self._ensure_running()
+        if len(self._pending) >= self.max_pending:
+            asyncio.get_running_loop().create_task(self.flush())
+        return row
+
+    def pending(self, auth_id: str, course_id: str) -> Optional[dict]:
+        return self._pending.get((auth_id, course_id))
+
+    async def flush(self) -> int:
+        """Write all pending rows. Failed rows are requeued ahead of any newer deltas."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self._write_rows, list(batch.values()))
+            except Exception as e:
+                logger.warning(f"Failed to flush progress updates: {e}")
+                for key, row in batch.items():
+                    newer = self._pending.get(key)
+                    self._pending[key] = row
+                    if newer:
+                        self.put(key[0], key[1], {k: v for k, v in newer.items()
+                                                  if k not in ("auth_id", "course_id")})
+                return 0
+            return len(batch)
+
+    def _ensure_running(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._closed or (self._task and not self._task.done() and self._task.get_loop() is loop):
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is still pending."""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# --- Caches used to avoid per-click queries ---
+
+_enrolled: Set[Key] = set()
+
+
+def is_enrolled(auth_id: str, course_id: str) -> bool:
+    """Check enrollment, remembering positive answers."""
+    key = (auth_id, course_id)
+    if key in _enrolled:
+        return True
+    existing = supabase.table("user_courses").select("id").eq(
+        "auth_id", auth_id
+    ).eq("course_id", course_id).limit(1).execute()
+    if existing.data:
+        _enrolled.add(key)
+        return True
+    return False
+
+
+def mark_enrolled(auth_id: str, course_id: str) -> None:
+    _enrolled.add((auth_id, course_id))
+
+
+progress_buffer = ProgressBuffer()
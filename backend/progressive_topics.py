@@ -0,0 +1,113 @@
+"""
+Progressive lesson delivery.
+
+A full TopicContent (every section plus the quiz) is one long structured call
+and nothing is readable until it finishes. In progressive mode /generate_topic
+first asks for the lesson outline and its opening section, stores and returns
+that as a partial lesson, and writes the remaining sections and the topic quiz
+in the background. Stored lessons carry a `status`: "partial" until the
+background job saves the finished lesson, then "complete". Clients poll
+GET /topic_status, which only reads storage, until the lesson is complete.
+
+Jobs run in this process. If one fails, or dies with its worker, the lesson
+is reported as stalled once `retryAfter` has passed and the next POST
+/generate_topic for it starts the job again.
+"""
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+PROGRESSIVE_TOPICS = os.getenv("PROGRESSIVE_TOPICS", "1") == "1"
+# A partial lesson with no job making progress on it is restarted after this long
+STALE_AFTER = float(os.getenv("PROGRESSIVE_TOPIC_STALE_AFTER", "180"))
+# Wait before retrying a job that failed
+RETRY_DELAY = 15.0
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("PROGRESSIVE_TOPIC_WORKERS", "8")),
+                               thread_name_prefix="topic-remainder")
+_running: Dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def partial_lesson(opening: dict) -> dict:
+    """The lesson as first served: the opening section, headings of the rest, no quiz yet."""
+    now = time.time()
+    return {
+        "title": opening["title"],
+        "sections": [opening["firstSection"]],
+        "quiz": [],
+        "pendingSections": list(opening.get("outline", []))[1:],
+        "status": "partial",
+        "retryAfter": now + STALE_AFTER,
+    }
+
+
+def complete_lesson(partial: dict, remainder: dict) -> dict:
+    first = dict(partial["sections"][0])
+    first["videos"] = remainder.get("firstSectionVideos", [])
+    return {
+        "title": partial["title"],
+        "sections": [first] + remainder.get("sections", []),
+        "quiz": remainder.get("quiz", []),
+        "searchAttribution": remainder.get("searchAttribution", ""),
+        "status": "complete",
+    }
+
+
+def running(key: str) -> bool:
+    with _lock:
+        return key in _running
+
+
+def needs_restart(key: str, lesson: dict) -> bool:
+    """A partial lesson that no job in this process is finishing and whose retry time has passed."""
+    return (lesson.get("status") == "partial" and not running(key)
+            and time.time() >= lesson.get("retryAfter", 0))
+
+
+def start(key: str, job: Callable[[], None]) -> bool:
+    """Run `job` in the background unless one is already running for `key`."""
+    with _lock:
+        if key in _running:
+            return False
+        future = _executor.submit(job)
+        _running[key] = future
+
+    def done(_):
+        with _lock:
+            _running.pop(key, None)
+    future.add_done_callback(done)
+    return True
+
+
+def launch(generator, save: Callable[[str, dict], None], key: str, lesson: dict, context: dict) -> bool:
+    """Finish `lesson` in the background; False if a job for it is already running here."""
+    return start(key, lambda: finish_lesson(generator, save, key, lesson, context))
+
+
+def resume(generator, save: Callable[[str, dict], None], key: str, lesson: dict, context: dict) -> dict:
+    """Restart an abandoned partial lesson, pushing its retry time out so other workers leave it alone."""
+    lesson = {**lesson, "retryAfter": time.time() + STALE_AFTER}
+    save(key, lesson)
+    launch(generator, save, key, lesson, context)
+    return lesson
+
+
+def finish_lesson(generator, save: Callable[[str, dict], None], key: str, lesson: dict, context: dict) -> None:
+    """Background job: write the rest of `lesson` and save it under `key`."""
+    remainder = generator.generate_topic_remainder(
+        title=lesson["title"],
+        outline=[lesson["sections"][0].get("heading", "")] + lesson.get("pendingSections", []),
+        first_section=lesson["sections"][0],
+        **context,
+    )
+    if "error" in remainder:
+        logger.error(f"Failed to finish lesson {key}: {remainder['error']}")
+        save(key, {**lesson, "retryAfter": time.time() + RETRY_DELAY})
+        return
+    save(key, complete_lesson(lesson, remainder))
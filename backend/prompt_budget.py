@@ -0,0 +1,143 @@
+"""
+Token budgets for user-supplied prompt inputs.
+
+Materials, notes and student answers are the only unbounded parts of our
+prompts. Each task gets a per-field token budget; inputs over it are cut down
+before the prompt is formatted. Long materials keep the chunks most relevant
+to the course topic (extractive selection), everything else is truncated at a
+paragraph or sentence boundary.
+
+Budgets can be overridden with PROMPT_BUDGETS='{"task": {"field": tokens}}'.
+"""
+import os
+import re
+import json
+import math
+import logging
+from collections import Counter
+from typing import Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PROMPT_BUDGETS: Dict[str, Dict[str, int]] = {
+    "course_plan": {"materials_text": 24000, "additional_notes": 1000},
+    "topic_content": {"additional_context": 1500},
+    "module_quiz": {"unit_description": 1000},
+    "quiz_evaluation": {"student_answer": 800, "sample_answer": 600},
+}
+for _task, _fields in json.loads(os.getenv("PROMPT_BUDGETS", "{}")).items():
+    PROMPT_BUDGETS.setdefault(_task, {}).update({k: int(v) for k, v in _fields.items()})
+
+# Size of the pieces long materials are split into for extractive selection
+CHUNK_TOKENS = 400
+GAP_MARKER = "\n[...]\n"
+TRUNCATION_MARKER = " [...]"
+
+_WORD = re.compile(r"[a-z0-9]{3,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token); no API round trip."""
+    return len(text) // 4 + 1
+
+
+def budget_for(task: str, field: str) -> Optional[int]:
+    return PROMPT_BUDGETS.get(task, {}).get(field)
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cut `text` to about `max_tokens`, preferring a paragraph or sentence boundary."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    for boundary in ("\n\n", "\n", ". "):
+        position = cut.rfind(boundary)
+        if position > max_chars // 2:
+            return cut[:position + len(boundary)].rstrip() + TRUNCATION_MARKER
+    return cut.rstrip() + TRUNCATION_MARKER
+
+
+def split_chunks(text: str, chunk_tokens: int = CHUNK_TOKENS) -> List[str]:
+    """Group paragraphs into chunks of roughly `chunk_tokens`; oversized paragraphs are split."""
+    max_chars = chunk_tokens * 4
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        pieces = [paragraph[i:i + max_chars] for i in range(0, len(paragraph), max_chars)]
+        for piece in pieces:
+            if size + len(piece) > max_chars and current:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def select_chunks(text: str, max_tokens: int, query: str) -> str:
+    """
+    Keep the chunks of `text` that best match `query` (TF-IDF overlap) within
+    `max_tokens`, in their original order. The first chunk is always kept,
+    since it usually carries the title, overview or table of contents.
+    """
+    chunks = split_chunks(text)
+    if not chunks:
+        return ""
+    chunk_words = [Counter(_WORD.findall(chunk.lower())) for chunk in chunks]
+    document_frequency = Counter(word for words in chunk_words for word in words)
+    query_words = set(_WORD.findall(query.lower()))
+
+    def score(index: int) -> float:
+        words = chunk_words[index]
+        length = sum(words.values()) or 1
+        return sum(
+            words[w] / length * math.log(1 + len(chunks) / document_frequency[w])
+            for w in query_words if w in words
+        )
+
+    selected = {0}
+    used = estimate_tokens(chunks[0])
+    for index in sorted(range(1, len(chunks)), key=score, reverse=True):
+        cost = estimate_tokens(chunks[index]) + 2
+        if used + cost <= max_tokens:
+            selected.add(index)
+            used += cost
+
+    parts = []
+    previous = -1
+    for index in sorted(selected):
+        if parts and index != previous + 1:
+            parts.append(GAP_MARKER)
+        elif parts:
+            parts.append("\n\n")
+        parts.append(chunks[index])
+        previous = index
+    if previous != len(chunks) - 1:
+        parts.append(GAP_MARKER)
+    return truncate("".join(parts), max_tokens)
+
+
+def fit(text: str, task: str, field: str, query: Optional[str] = None) -> str:
+    """
+    Return `text` cut to the task's budget for `field`. With a `query`, long
+    inputs are reduced by extractive selection rather than plain truncation.
+    """
+    if not text:
+        return text or ""
+    max_tokens = budget_for(task, field)
+    tokens = estimate_tokens(text)
+    if max_tokens is None or tokens <= max_tokens:
+        return text
+    fitted = select_chunks(text, max_tokens, query) if query else truncate(text, max_tokens)
+    trimmed = tokens - estimate_tokens(fitted)
+    metrics.PROMPT_TRIMMED_TOKENS.inc(task, field, amount=trimmed)
+    logger.info(f"{task}.{field}: trimmed ~{trimmed} of {tokens} tokens to fit a {max_tokens} token budget")
+    return fitted
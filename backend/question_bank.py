@@ -0,0 +1,200 @@
+"""
+Subtopic-indexed question bank for module-quiz retakes.
+
+Every generated module-quiz question is stored in `question_bank`, keyed by
+course, unit and a content hash, and indexed by the subtopic it assesses
+(`relatedSubtopic`). Once a learner submits a quiz its questions go into their
+seen-set (`question_bank_seen`).
+
+A retake is assembled locally: each unit subtopic gets a share of the
+questions weighted toward the learner's least-mastered subtopics, drawn at
+random from questions they haven't seen. The LLM is only asked for more questions when a
+subtopic's unseen pool can't fill its share, and then only for those
+subtopics; the new questions are banked for the next learner.
+
+Schema: sql/question_bank.sql.
+"""
+import json
+import random
+import hashlib
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from database import supabase
+
+logger = logging.getLogger(__name__)
+
+# (questions per retake, fewest acceptable) by kind
+COUNTS = {"mcq": (10, 8), "frq": (2, 2)}
+QUIZ_KEYS = {"mcq": "multipleChoice", "frq": "freeResponse"}
+# Extra weight a weak subtopic gets, scaled by how far it is from mastered (learner_model)
+WEAK_WEIGHT = 4.0
+
+
+def question_id(kind: str, question: dict) -> str:
+    """Content hash identifying a question within its unit."""
+    payload = {"kind": kind, "question": question.get("question", ""), "options": question.get("options", [])}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def bank_rows(course_id: str, unit_number: int, quiz: dict) -> List[dict]:
+    """`question_bank` rows for every question in a module quiz."""
+    return [
+        {
+            "course_id": course_id,
+            "unit_number": unit_number,
+            "id": question_id(kind, q),
+            "subtopic": q.get("relatedSubtopic") or "",
+            "kind": kind,
+            "question": q,
+        }
+        for kind, key in QUIZ_KEYS.items()
+        for q in quiz.get(key, [])
+    ]
+
+
+def deposit(course_id: str, unit_number: int, quiz: dict) -> None:
+    """Add a generated quiz's questions to the bank; questions already there are left alone."""
+    rows = bank_rows(course_id, unit_number, quiz)
+    if not rows:
+        return
+    try:
+        supabase.table("question_bank").upsert(
+            rows, on_conflict="course_id,unit_number,id", ignore_duplicates=True
+        ).execute()
+    except Exception as e:
+        logger.warning(f"Failed to bank questions for {course_id} unit {unit_number}: {e}")
+
+
+def mark_seen(auth_id: str, course_id: str, unit_number: int, quiz: dict) -> None:
+    """Record that the learner has been graded on every question in `quiz`."""
+    mark_seen_many([auth_id], course_id, unit_number, quiz)
+
+
+def mark_seen_many(auth_ids: List[str], course_id: str, unit_number: int, quiz: dict) -> None:
+    """mark_seen for a whole class graded on the same quiz, in one request."""
+    ids = [row["id"] for row in bank_rows(course_id, unit_number, quiz)]
+    rows = [
+        {"auth_id": auth_id, "course_id": course_id, "unit_number": unit_number, "question_id": question}
+        for auth_id in auth_ids
+        for question in ids
+    ]
+    if not rows:
+        return
+    try:
+        supabase.table("question_bank_seen").upsert(
+            rows, on_conflict="auth_id,course_id,unit_number,question_id", ignore_duplicates=True
+        ).execute()
+    except Exception as e:
+        logger.warning(f"Failed to record seen questions for {', '.join(auth_ids)}: {e}")
+
+
+def load_bank(course_id: str, unit_number: int) -> List[dict]:
+    """Synchronous counterpart of data_access.bank_questions, for background jobs."""
+    try:
+        return supabase.table("question_bank").select("id,subtopic,kind,question").eq(
+            "course_id", course_id
+        ).eq("unit_number", unit_number).execute().data
+    except Exception as e:
+        logger.warning(f"Failed to load question bank for {course_id} unit {unit_number}: {e}")
+        return []
+
+
+def load_seen(auth_id: str, course_id: str, unit_number: int) -> Set[str]:
+    """Synchronous counterpart of data_access.seen_question_ids, for background jobs."""
+    try:
+        result = supabase.table("question_bank_seen").select("question_id").eq("auth_id", auth_id).eq(
+            "course_id", course_id
+        ).eq("unit_number", unit_number).execute()
+        return {row["question_id"] for row in result.data}
+    except Exception as e:
+        logger.warning(f"Failed to load seen questions for {auth_id}: {e}")
+        return set()
+
+
+def allocate(subtopics: List[str], weakness: Optional[dict], total: int) -> Dict[str, int]:
+    """Split `total` questions across subtopics in proportion to 1 + WEAK_WEIGHT * (1 - mastery) for weak ones."""
+    weak = (weakness or {}).get("weak_subtopics", {})
+    weights = {s: 1.0 + WEAK_WEIGHT * (1 - weak[s]) if s in weak else 1.0 for s in subtopics}
+    if not weights:
+        return {}
+    scale = total / sum(weights.values())
+    shares = {s: w * scale for s, w in weights.items()}
+    counts = {s: int(share) for s, share in shares.items()}
+    # Largest remainder: the rounded-down slots go to the biggest fractional shares
+    leftover = total - sum(counts.values())
+    for s in sorted(shares, key=lambda s: counts[s] - shares[s])[:leftover]:
+        counts[s] += 1
+    return counts
+
+
+def _pick(rows: List[dict], seen: Set[str], kind: str, subtopics: List[str], weakness: Optional[dict],
+          rng: random.Random, fill: bool) -> Tuple[List[dict], List[str]]:
+    total = COUNTS[kind][0]
+    unseen = [r for r in rows if r["kind"] == kind and r["id"] not in seen]
+    pools: Dict[str, List[dict]] = {s: [] for s in subtopics}
+    for row in unseen:
+        if row["subtopic"] in pools:
+            pools[row["subtopic"]].append(row)
+
+    picked, exhausted = [], []
+    for subtopic, share in allocate(subtopics, weakness, total).items():
+        picked += rng.sample(pools[subtopic], min(share, len(pools[subtopic])))
+        if len(pools[subtopic]) < share:
+            exhausted.append(subtopic)
+
+    if fill and len(picked) < total:
+        chosen = {r["id"] for r in picked}
+        rest = [r for r in unseen if r["id"] not in chosen]
+        picked += rng.sample(rest, min(total - len(picked), len(rest)))
+    return picked, exhausted
+
+
+def assemble(rows: List[dict], seen: Set[str], subtopics: List[str], weakness: Optional[dict], title: str,
+             rng: random.Random = random, fill: bool = False) -> Tuple[Optional[dict], List[str]]:
+    """
+    Build a retake from unseen bank rows. Returns (quiz, exhausted subtopics).
+
+    Without `fill` the quiz is None whenever a subtopic can't cover its share;
+    with it, the shortfall is made up from any other unseen questions and the
+    quiz is None only if it would fall below the minimum size.
+    """
+    mcq, short_mcq = _pick(rows, seen, "mcq", subtopics, weakness, rng, fill)
+    frq, short_frq = _pick(rows, seen, "frq", subtopics, weakness, rng, fill)
+    exhausted = list(dict.fromkeys(short_mcq + short_frq))
+    if (exhausted and not fill) or len(mcq) < COUNTS["mcq"][1] or len(frq) < COUNTS["frq"][1]:
+        return None, exhausted
+    rng.shuffle(mcq)
+    rng.shuffle(frq)
+    return {
+        "title": title,
+        "multipleChoice": [r["question"] for r in mcq],
+        "freeResponse": [r["question"] for r in frq],
+    }, exhausted
+
+
+def build_retake(generator, course_id: str, unit_number: int, context: dict, weakness: Optional[dict],
+                 rows: List[dict], seen: Set[str], rng: random.Random = random) -> dict:
+    """
+    A retake quiz for one learner from the bank, topping it up through
+    `generator` for exhausted subtopics. `context` holds the
+    generate_module_quiz arguments (retake_quizzes.module_quiz_context).
+    Returns the quiz, or {"error": ...} if a needed top-up failed.
+    """
+    subtopics = context.get("subtopics", [])
+    title = f"{context.get('unit_title')} Retake Quiz"
+    quiz, exhausted = assemble(rows, seen, subtopics, weakness, title, rng)
+    if quiz is not None:
+        return quiz
+
+    top_up = generator.generate_module_quiz(
+        **{**context, "subtopics": exhausted or subtopics}, previous_weakness_data=weakness
+    )
+    if "error" in top_up:
+        return top_up
+    deposit(course_id, unit_number, top_up)
+
+    quiz, _ = assemble(rows + bank_rows(course_id, unit_number, top_up), seen, subtopics, weakness, title,
+                       rng, fill=True)
+    return quiz if quiz is not None else top_up
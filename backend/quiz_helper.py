@@ -1,18 +1,35 @@
 import os
-import json
-from google import genai
-from google.genai import types
-from typing import Dict, Any, List, Optional
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+from llm import generate_content, route, LazyClient
+from prompt_budget import estimate_tokens
+from tutor_sessions import TutorSession
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+# Explicit context caches must hold at least this many tokens (Gemini Flash minimum)
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("TUTOR_CACHE_MIN_TOKENS", "1024"))
+CONTEXT_CACHE_TTL = int(os.getenv("TUTOR_CACHE_TTL", "3600"))
+
+HELP_ERROR_MESSAGE = "Sorry, I'm having trouble right now. Try rephrasing your question!"
+
+# Summaries run off the request path so a turn never waits on one
+_summary_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tutor-summary")
 
 
 class QuizHelper:
+    client = LazyClient()
+
     def __init__(self):
-        try:
-            self.client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
-            self.model_name = "gemini-3-flash-preview"
-        except Exception as e:
-            print(f"Error initializing Gemini client for QuizHelper: {e}")
-            raise e
+        self._context_caches: Dict[str, Tuple[Optional[str], float]] = {}
+        self._cache_lock = threading.Lock()
 
     def _load_help_prompt(self) -> str:
         prompt_path = os.path.join(os.path.dirname(__file__), 'prompts', 'quiz_help.txt')
@@ -36,21 +53,59 @@ class QuizHelper:
             )
         return f"Question: {question.get('question', '')}"
 
-    def text_help(self, question: dict, question_type: str,
-                  conversation_history: List[dict], student_message: str,
-                  skill_level: str, age_group: str) -> str:
-        """Generate a Socratic help response for a quiz question."""
-        prompt_template = self._load_help_prompt()
-        question_context = self._build_question_context(question, question_type)
-
-        system_prompt = prompt_template.format(
+    def _system_prompt(self, question: dict, question_type: str, skill_level: str, age_group: str) -> str:
+        return self._load_help_prompt().format(
             skill_level=skill_level,
             age_group=age_group,
-            question_context=question_context
+            question_context=self._build_question_context(question, question_type)
         )
 
-        # Build contents with conversation history
+    def _cached_context(self, system_prompt: str) -> Optional[Tuple[str, str]]:
+        """
+        (model, cache name) of an upstream context cache holding `system_prompt`,
+        created on first use and shared by every session on the same question.
+        Prompts below the API's minimum cacheable size return None and rely on
+        Gemini's implicit prefix caching instead.
+        """
+        if estimate_tokens(system_prompt) < CONTEXT_CACHE_MIN_TOKENS:
+            return None
+        model = route("tutor")["model"]
+        key = hashlib.sha256(f"{model}\n{system_prompt}".encode()).hexdigest()
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._context_caches.get(key)
+        if entry and entry[1] > now:
+            return (model, entry[0]) if entry[0] else None
+
+        from google.genai import types
+
+        try:
+            cache = self.client.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_prompt,
+                    ttl=f"{CONTEXT_CACHE_TTL}s",
+                )
+            )
+            # Refresh a minute early so a request never references an expiring cache
+            entry = (cache.name, now + CONTEXT_CACHE_TTL - 60)
+        except Exception as e:
+            logger.warning(f"Context cache creation failed, sending the system prompt inline: {e}")
+            entry = (None, now + 300)
+        with self._cache_lock:
+            self._context_caches[key] = entry
+        return (model, entry[0]) if entry[0] else None
+
+    def _build_contents(self, summary: str, conversation_history: List[dict],
+                        student_message: str) -> List["types.Content"]:
+        from google.genai import types
+
         contents = []
+        if summary:
+            contents.append(types.Content(
+                role="user",
+                parts=[types.Part.from_text(text=f"Summary of our conversation so far:\n{summary}")]
+            ))
         for msg in conversation_history:
             role = msg.get("role", "user")
             text = msg.get("text", "")
@@ -64,18 +119,83 @@ class QuizHelper:
             role="user",
             parts=[types.Part.from_text(text=student_message)]
         ))
+        return contents
 
-        try:
-            response = self.client.models.generate_content(
-                model=self.model_name,
+    def _reply(self, system_prompt: str, contents: List["types.Content"]) -> str:
+        from google.genai import types
+
+        cached = self._cached_context(system_prompt)
+        if cached:
+            # Caches are bound to the model they were created for, so pin it
+            model, cache_name = cached
+            response = generate_content(
+                self.client, "tutor",
+                model=model,
+                pinned=True,
+                contents=contents,
+                config=types.GenerateContentConfig(cached_content=cache_name)
+            )
+        else:
+            response = generate_content(
+                self.client, "tutor",
                 contents=contents,
                 config=types.GenerateContentConfig(
                     system_instruction=system_prompt
                 )
             )
-            return response.text if response.text else "I'm here to help! Can you tell me what part of this question is confusing you?"
+        return response.text if response.text else "I'm here to help! Can you tell me what part of this question is confusing you?"
+
+    def text_help(self, question: dict, question_type: str,
+                  conversation_history: List[dict], student_message: str,
+                  skill_level: str, age_group: str) -> str:
+        """Generate a Socratic help response for a quiz question."""
+        system_prompt = self._system_prompt(question, question_type, skill_level, age_group)
+        contents = self._build_contents("", conversation_history, student_message)
+        try:
+            return self._reply(system_prompt, contents)
+        except Exception as e:
+            logger.error(f"Error in text_help: {e}")
+            return HELP_ERROR_MESSAGE
+
+    def session_help(self, session: TutorSession, question: dict, question_type: str,
+                     student_message: str, skill_level: str, age_group: str) -> str:
+        """Like text_help, but the history and running summary come from `session`."""
+        system_prompt = self._system_prompt(question, question_type, skill_level, age_group)
+        summary, turns = session.snapshot()
+        contents = self._build_contents(summary, turns, student_message)
+        try:
+            reply = self._reply(system_prompt, contents)
         except Exception as e:
-            print(f"Error in text_help: {e}")
-            return "Sorry, I'm having trouble right now. Try rephrasing your question!"
+            logger.error(f"Error in session_help: {e}")
+            return HELP_ERROR_MESSAGE
 
+        session.append(student_message, reply)
+        folded = session.start_compaction()
+        if folded:
+            question_context = self._build_question_context(question, question_type)
+            _summary_executor.submit(self._compact, session, folded, question_context)
+        return reply
 
+    def _compact(self, session: TutorSession, folded: List[dict], question_context: str) -> None:
+        summary = None
+        try:
+            summary = self.summarize(session.summary, folded, question_context)
+        except Exception as e:
+            logger.warning(f"Tutor session summary failed, keeping full history: {e}")
+        session.finish_compaction(len(folded), summary)
+
+    def summarize(self, summary: str, turns: List[dict], question_context: str) -> str:
+        """Fold `turns` into the running `summary` of a tutor conversation."""
+        transcript = "\n".join(
+            f"{'Student' if t.get('role') == 'user' else 'Tutor'}: {t.get('text', '')}" for t in turns
+        )
+        with open(os.path.join(os.path.dirname(__file__), 'prompts', 'tutor_summary.txt'), 'r') as f:
+            prompt = f.read().format(
+                question_context=question_context,
+                summary=summary or "(none yet)",
+                transcript=transcript
+            )
+        response = generate_content(self.client, "tutor_summary", contents=[prompt])
+        if not response.text:
+            raise ValueError("Empty summary from Gemini")
+        return response.text.strip()
@@ -0,0 +1,159 @@
+"""
+Per-user, cost-weighted rate limiting.
+
+Requests are keyed on the authenticated user (the Supabase JWT `sub`) and fall
+back to the client address. Only the calls proxied through the Next.js API
+routes carry a token (the access token is an HttpOnly cookie the browser can't
+read), so those are limited per user. The browser's direct calls to
+/generate_course, /generate_topic, /topic_status and /quiz_help/text are
+anonymous and still share one limit per address, e.g. a school behind one NAT.
+
+On top of each route's own limit, every request is charged against a shared
+per-key budget by its expected LLM cost: a course generation uses up far more
+of it than a course read. As with any fixed window, a
+rejected request is still charged, so hammering a limit doesn't get through.
+
+Counters live in a SQLite file (WAL mode) registered as a `limits` storage, so
+every uvicorn worker on the host sees the same counts. Point
+RATE_LIMIT_STORAGE at redis:// or memcached:// when running on several hosts.
+"""
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+
+import jwt
+from fastapi import Request
+from limits.storage import Storage
+from slowapi.util import get_remote_address
+
+from auth import request_token, verify_token
+
+RATE_LIMIT_STORAGE = os.getenv(
+    "RATE_LIMIT_STORAGE",
+    f"sqlite:///{os.path.join(tempfile.gettempdir(), 'claritas-rate-limits.db')}"
+)
+# Budget units per user, shared by every route; see COSTS
+RATE_LIMIT_BUDGET = os.getenv("RATE_LIMIT_BUDGET", "240/minute")
+
+# Budget units charged per request, roughly in proportion to the LLM tokens a route spends
+COSTS = {
+    "/generate_course": 60,
+    "/generate_topic": 8,
+    "/generate_module_quiz": 8,
+    "/evaluate_module_quiz": 6,
+    "/evaluate_module_quiz/batch": 60,
+    "/generate_assessment": 6,
+    "/generate": 5,
+    "/evaluate_assessment": 4,
+    "/cohort_analytics/{course_id}": 4,
+    "/quiz_help/text": 2,
+}
+COSTS.update({path: int(cost) for path, cost in json.loads(os.getenv("RATE_LIMIT_COSTS", "{}")).items()})
+DEFAULT_COST = 1
+
+
+def rate_limit_key(request: Request) -> str:
+    token = request_token(request)
+    if token:
+        try:
+            return f"user:{verify_token(token)['sub']}"
+        except (jwt.PyJWTError, KeyError):
+            pass
+    return f"ip:{get_remote_address(request)}"
+
+
+def request_cost(request: Request) -> int:
+    route = request.scope.get("route")
+    path = getattr(route, "path", request.url.path)
+    return COSTS.get(path, DEFAULT_COST)
+
+
+class SQLiteStorage(Storage):
+    """
+    Fixed-window counters in a SQLite file shared by all processes on the host.
+
+    Each thread keeps its own connection; increments run in an IMMEDIATE
+    transaction so concurrent workers serialise on the write lock instead of
+    losing updates.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+    # Expired rows are swept at most this often
+    CLEANUP_INTERVAL = 60.0
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        self.path = uri[len("sqlite:///"):] or ":memory:"
+        self.timeout = float(options.get("timeout", 5.0))
+        self._local = threading.local()
+        self._last_cleanup = 0.0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters "
+                "(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A counter whose window has passed starts over
+            row = conn.execute(
+                "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, "
+                "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END "
+                "RETURNING value",
+                (key, amount, now + expiry, now, now),
+            ).fetchone()
+            if now - self._last_cleanup > self.CLEANUP_INTERVAL:
+                self._last_cleanup = now
+                conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return row[0]
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(
+            "SELECT value FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        row = self._connection().execute(
+            "SELECT expires_at FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        cursor = self._connection().execute("DELETE FROM counters")
+        return cursor.rowcount
+
+    def clear(self, key: str) -> None:
+        self._connection().execute("DELETE FROM counters WHERE key = ?", (key,))
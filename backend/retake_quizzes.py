@@ -0,0 +1,154 @@
+"""
+Speculative retake quizzes.
+
+A learner who fails a module quiz almost always asks for the adaptive retake
+next. When /evaluate_module_quiz records a failed attempt it builds that
+retake here, in the background, from the mastery estimates it just updated
+(see question_bank.build_retake); the result is stored per learner as
+
+    {course_id}_retake_{unit_number}_{auth_id}.json  ->  {"basedOnAttempt": n, "quiz": {...}}
+
+and /generate_module_quiz serves it when `basedOnAttempt` is still the
+learner's latest attempt. A retake built on request is stored the same way;
+retakes never replace the unit's shared quiz, and attempts on them are graded
+against their own version. A retake requested while the job is still running
+here waits for it (up to WAIT_TIMEOUT) rather than starting a second
+generation; a job still queued is cancelled and the retake built inline.
+
+Prefetching is speculative work, so it runs on a small pool of its own and is
+dropped, not queued, when that pool is backed up.
+"""
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+
+import question_bank
+from attempt_encoding import save_quiz_snapshot
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_RETAKES = os.getenv("SPECULATIVE_RETAKES", "1") == "1"
+# Jobs allowed to wait for a worker; beyond this new prefetches are skipped
+MAX_QUEUED = int(os.getenv("RETAKE_PREFETCH_MAX_QUEUED", "32"))
+# How long a retake request waits for a prefetch already under way before building its own
+WAIT_TIMEOUT = float(os.getenv("RETAKE_PREFETCH_WAIT_TIMEOUT", "20"))
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("RETAKE_PREFETCH_WORKERS", "2")),
+                               thread_name_prefix="retake-prefetch")
+_running: Dict[str, Future] = {}
+# Prefetches whose request stopped waiting for them; their result is not saved
+_abandoned: Set[str] = set()
+# Submitted jobs that haven't started on a worker yet
+_queued = 0
+_lock = threading.Lock()
+
+
+def retake_filename(course_id: str, unit_number: int, auth_id: str) -> str:
+    return f"{course_id}_retake_{unit_number}_{auth_id}.json"
+
+
+def module_quiz_context(course_plan: dict, unit: dict) -> dict:
+    """Keyword arguments for CourseGenerator.generate_module_quiz, minus the weakness data."""
+    return {
+        "course_title": course_plan.get("courseTitle"),
+        "unit_title": unit.get("title"),
+        "unit_description": unit.get("description", ""),
+        "subtopics": unit.get("subtopics", []),
+        "skill_level": course_plan.get("metadata", {}).get("skillLevel", "Intermediate"),
+        "age_group": course_plan.get("metadata", {}).get("ageGroup", "Adult"),
+    }
+
+
+def ready(stored: Optional[dict], attempts: Optional[List[dict]]) -> Optional[dict]:
+    """The prefetched quiz if it was built from the learner's latest attempt."""
+    if not stored or not attempts:
+        return None
+    if stored.get("basedOnAttempt") != attempts[0].get("attempt_number"):
+        return None
+    return stored.get("quiz")
+
+
+def pending(key: str) -> Optional[Future]:
+    """The prefetch still running in this process for `key`, if any."""
+    with _lock:
+        return _running.get(key)
+
+
+async def wait(key: str, timeout: float = WAIT_TIMEOUT) -> Optional[dict]:
+    """
+    The stored result of the prefetch for `key` running in this process, if it
+    finishes within `timeout`. None when there is no such job, when it was still
+    queued (it is cancelled) or when it takes too long (its result is dropped),
+    so the caller builds the retake itself.
+    """
+    future = pending(key)
+    if future is None or future.cancel():
+        return None
+    try:
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+    except asyncio.TimeoutError:
+        with _lock:
+            if key in _running:
+                _abandoned.add(key)
+        logger.info(f"Stopped waiting for retake prefetch {key}")
+        return None
+
+
+def prefetch(generator, save: Callable[[str, dict], None], course_id: str, unit_number: int,
+             auth_id: str, context: dict, attempt_number: int, weakness: Optional[dict]) -> Optional[dict]:
+    """Background job: build the retake following failed attempt `attempt_number` and store it for the learner."""
+    try:
+        quiz = question_bank.build_retake(
+            generator, course_id, unit_number, context, weakness,
+            question_bank.load_bank(course_id, unit_number),
+            question_bank.load_seen(auth_id, course_id, unit_number),
+        )
+        if "error" in quiz:
+            logger.warning(f"Retake prefetch failed for {auth_id} unit {unit_number}: {quiz['error']}")
+            return None
+        quiz["quizVersion"] = save_quiz_snapshot(course_id, unit_number, quiz)
+        stored = {"basedOnAttempt": attempt_number, "quiz": quiz}
+        key = retake_filename(course_id, unit_number, auth_id)
+        with _lock:
+            if key in _abandoned:
+                # The learner was given a retake built inline; don't replace it
+                return None
+        save(key, stored)
+        return stored
+    except Exception as e:
+        logger.warning(f"Retake prefetch failed for {auth_id} unit {unit_number}: {e}")
+        return None
+
+
+def schedule(generator, save: Callable[[str, dict], None], course_id: str, unit_number: int,
+             auth_id: str, context: dict, attempt_number: int, weakness: Optional[dict]) -> bool:
+    """Start a prefetch unless one is already running for this learner and unit or the pool is backed up."""
+    global _queued
+    key = retake_filename(course_id, unit_number, auth_id)
+    with _lock:
+        if key in _running or _queued >= MAX_QUEUED:
+            return False
+        _queued += 1
+        future = _executor.submit(_started, prefetch, generator, save, course_id, unit_number, auth_id,
+                                  context, attempt_number, weakness)
+        _running[key] = future
+
+    def done(finished: Future):
+        global _queued
+        with _lock:
+            _running.pop(key, None)
+            _abandoned.discard(key)
+            if finished.cancelled():
+                _queued -= 1
+    future.add_done_callback(done)
+    return True
+
+
+def _started(job: Callable, *args):
+    global _queued
+    with _lock:
+        _queued -= 1
+    return job(*args)
@@ -0,0 +1,5 @@
+-- Insertion order for quiz_attempts, so cohort analytics can fold in new
+-- attempts incrementally (WHERE course_id = ? AND seq > cursor ORDER BY seq).
+-- Existing rows are numbered when the column is added.
+ALTER TABLE quiz_attempts ADD COLUMN seq BIGINT GENERATED ALWAYS AS IDENTITY;
+CREATE INDEX IF NOT EXISTS idx_quiz_attempts_course_seq ON quiz_attempts(course_id, seq);
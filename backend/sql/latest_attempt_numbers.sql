@@ -0,0 +1,18 @@
+-- Highest attempt number per learner on one unit quiz, for batch grading.
+--
+-- Returns one row per learner with attempts, so the result stays small
+-- however many attempts there are (selecting every attempt row would be cut
+-- off at PostgREST's max-rows limit). Served by the
+-- UNIQUE(auth_id, course_id, unit_number, attempt_number) index.
+CREATE OR REPLACE FUNCTION latest_attempt_numbers(learner_ids UUID[], quiz_course_id TEXT, quiz_unit_number INTEGER)
+RETURNS TABLE (auth_id UUID, attempt_number INTEGER)
+LANGUAGE SQL
+STABLE
+AS $$
+    SELECT qa.auth_id, MAX(qa.attempt_number)
+    FROM quiz_attempts qa
+    WHERE qa.auth_id = ANY(learner_ids)
+      AND qa.course_id = quiz_course_id
+      AND qa.unit_number = quiz_unit_number
+    GROUP BY qa.auth_id;
+$$;
@@ -0,0 +1,13 @@
+-- Indexes matching the sort order of the paginated listing endpoints.
+
+-- GET /user/{auth_id}/courses: WHERE auth_id = ?
+-- [AND (enrolled_at, id) < cursor] ORDER BY enrolled_at DESC, id DESC LIMIT n
+DROP INDEX IF EXISTS idx_user_courses_auth_enrolled;
+CREATE INDEX IF NOT EXISTS idx_user_courses_auth_enrolled_id
+    ON user_courses(auth_id, enrolled_at DESC, id DESC);
+
+-- GET /quiz_attempts/{course_id}/{unit_number}: WHERE auth_id, course_id,
+-- unit_number = ? [AND attempt_number > cursor] ORDER BY attempt_number LIMIT n
+-- is served by the UNIQUE(auth_id, course_id, unit_number, attempt_number)
+-- index, which also makes the narrower lookup index redundant.
+DROP INDEX IF EXISTS idx_quiz_attempts_lookup;
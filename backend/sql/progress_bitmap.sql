@@ -0,0 +1,67 @@
+-- Completed topics as a bit string: one bit per subtopic in course plan order
+-- (bit 0 = first subtopic of the first unit). completed_topics (TEXT[]) is
+-- kept in step with it for readers that still use the list; rows the backfill
+-- (`python topic_bitmap.py`) hasn't reached are seeded from it on first write.
+ALTER TABLE user_courses ADD COLUMN completed_bitmap VARBIT;
+
+-- Applies a batch of buffered progress deltas in one statement.
+--
+-- Each delta is {auth_id, course_id, width, set_mask, clear_mask,
+-- last_visited, unit_numbers, topic_ids}; masks are bit strings of length
+-- `width` and topic_ids names the topic at each bit position.
+-- Bits are ORed in / cleared against the stored bitmap, so concurrent deltas
+-- from different workers compose instead of overwriting each other. A row
+-- without a bitmap starts from its legacy completed_topics, not from zero.
+-- is_completed is true once every topic is done and every unit has a
+-- passing quiz attempt.
+CREATE OR REPLACE FUNCTION apply_progress_deltas(deltas JSONB)
+RETURNS VOID
+LANGUAGE SQL
+AS $$
+    WITH d AS (
+        SELECT * FROM jsonb_to_recordset(deltas) AS x(
+            auth_id UUID,
+            course_id TEXT,
+            width INTEGER,
+            set_mask TEXT,
+            clear_mask TEXT,
+            last_visited TEXT,
+            unit_numbers INTEGER[],
+            topic_ids TEXT[]
+        )
+    ), merged AS (
+        SELECT uc.id, d.width, d.last_visited, d.unit_numbers, d.topic_ids, uc.auth_id, uc.course_id,
+               (COALESCE(
+                    uc.completed_bitmap,
+                    (SELECT string_agg(CASE WHEN t.topic_id = ANY(COALESCE(uc.completed_topics, '{}'))
+                                            THEN '1' ELSE '0' END, '' ORDER BY t.position)
+                     FROM unnest(d.topic_ids) WITH ORDINALITY AS t(topic_id, position))::VARBIT,
+                    repeat('0', d.width)::VARBIT
+                ) | d.set_mask::VARBIT) & ~d.clear_mask::VARBIT AS bitmap
+        FROM user_courses uc
+        JOIN d ON uc.auth_id = d.auth_id AND uc.course_id = d.course_id
+    )
+    UPDATE user_courses AS uc
+    SET completed_bitmap = m.bitmap,
+        completed_topics = ARRAY(
+            SELECT t.topic_id
+            FROM unnest(m.topic_ids) WITH ORDINALITY AS t(topic_id, position)
+            WHERE substring(m.bitmap::TEXT FROM t.position::INTEGER FOR 1) = '1'
+            ORDER BY t.position
+        ),
+        last_visited = COALESCE(m.last_visited, uc.last_visited),
+        is_completed = m.width > 0
+            AND bit_count(m.bitmap) = m.width
+            AND NOT EXISTS (
+                SELECT 1 FROM unnest(m.unit_numbers) AS u(unit_number)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM quiz_attempts qa
+                    WHERE qa.auth_id = m.auth_id
+                      AND qa.course_id = m.course_id
+                      AND qa.unit_number = u.unit_number
+                      AND qa.passed
+                )
+            )
+    FROM merged m
+    WHERE uc.id = m.id;
+$$;
@@ -0,0 +1,23 @@
+-- Every generated module-quiz question, indexed by course, unit and the
+-- subtopic it assesses (relatedSubtopic). Retake quizzes are assembled from
+-- the questions a learner has not seen yet; see question_bank.py.
+CREATE TABLE question_bank (
+    course_id TEXT NOT NULL,
+    unit_number INTEGER NOT NULL,
+    id TEXT NOT NULL,  -- content hash of the question (question_bank.question_id)
+    subtopic TEXT NOT NULL DEFAULT '',
+    kind TEXT NOT NULL CHECK (kind IN ('mcq', 'frq')),
+    question JSONB NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (course_id, unit_number, id)
+);
+
+-- Questions a learner has already been graded on
+CREATE TABLE question_bank_seen (
+    auth_id UUID NOT NULL,
+    course_id TEXT NOT NULL,
+    unit_number INTEGER NOT NULL,
+    question_id TEXT NOT NULL,
+    seen_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (auth_id, course_id, unit_number, question_id)
+);
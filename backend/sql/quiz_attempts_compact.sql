@@ -0,0 +1,15 @@
+-- Compact attempt encoding: rows reference an immutable quiz snapshot
+-- ({course_id}_module_quiz_{unit}_v{quiz_version}.json in storage) instead of
+-- copying question text, options and explanations into every attempt.
+ALTER TABLE quiz_attempts
+    ADD COLUMN quiz_version TEXT,
+    ADD COLUMN mcq_selected SMALLINT[],
+    ADD COLUMN mcq_correct BOOLEAN[],
+    ADD COLUMN frq_scores SMALLINT[],
+    ADD COLUMN frq_feedback TEXT[],
+    ALTER COLUMN mcq_results DROP NOT NULL,
+    ALTER COLUMN frq_evaluations DROP NOT NULL;
+
+-- Existing rows keep working as-is (they are returned from mcq_results).
+-- To convert them, run `python attempt_encoding.py` from backend/, which
+-- snapshots each legacy quiz, fills the compact columns and clears the JSONB.
@@ -0,0 +1,60 @@
+-- Per-learner mastery estimates, one row per (learner, course, subtopic).
+-- Updated by knowledge tracing each time a module quiz is scored; see
+-- learner_model.py.
+CREATE TABLE subtopic_mastery (
+    auth_id UUID NOT NULL,
+    course_id TEXT NOT NULL,
+    subtopic TEXT NOT NULL,
+    mastery REAL NOT NULL,
+    observations INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (auth_id, course_id, subtopic)
+);
+
+-- Applies a scored attempt's question outcomes to the stored estimates in one
+-- call, so two submissions for the same learner and subtopic compose instead
+-- of the later one overwriting the earlier one's update.
+--
+-- Each observation is {auth_id, course_id, subtopic, correct, guess}. Rows
+-- are locked in (auth_id, course_id, subtopic) order and each subtopic's
+-- observations are applied in the order given, with the same BKT step as
+-- learner_model.update (p_init, slip and learn come from learner_model.py).
+CREATE OR REPLACE FUNCTION apply_mastery_observations(observations JSONB, p_init REAL, slip REAL, learn REAL)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    o RECORD;
+    p DOUBLE PRECISION;
+    posterior DOUBLE PRECISION;
+BEGIN
+    FOR o IN
+        SELECT x.auth_id, x.course_id, x.subtopic, x.correct, x.guess
+        FROM jsonb_array_elements(observations) WITH ORDINALITY AS e(value, position),
+             jsonb_to_record(e.value) AS x(auth_id UUID, course_id TEXT, subtopic TEXT,
+                                           correct BOOLEAN, guess DOUBLE PRECISION)
+        ORDER BY x.auth_id, x.course_id, x.subtopic, e.position
+    LOOP
+        INSERT INTO subtopic_mastery AS sm (auth_id, course_id, subtopic, mastery, observations)
+        VALUES (o.auth_id, o.course_id, o.subtopic, p_init, 0)
+        ON CONFLICT (auth_id, course_id, subtopic) DO NOTHING;
+
+        SELECT sm.mastery INTO p
+        FROM subtopic_mastery sm
+        WHERE sm.auth_id = o.auth_id AND sm.course_id = o.course_id AND sm.subtopic = o.subtopic
+        FOR UPDATE;
+
+        IF o.correct THEN
+            posterior := p * (1 - slip) / (p * (1 - slip) + (1 - p) * o.guess);
+        ELSE
+            posterior := p * slip / (p * slip + (1 - p) * (1 - o.guess));
+        END IF;
+
+        UPDATE subtopic_mastery sm
+        SET mastery = posterior + (1 - posterior) * learn,
+            observations = sm.observations + 1,
+            updated_at = NOW()
+        WHERE sm.auth_id = o.auth_id AND sm.course_id = o.course_id AND sm.subtopic = o.subtopic;
+    END LOOP;
+END;
+$$;
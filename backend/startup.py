@@ -0,0 +1,57 @@
+"""
+Startup work that must not block import or the first request: network checks
+and warming heavy clients run as background tasks, and /ready reports their
+progress so a load balancer only routes traffic once they've succeeded.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    def __init__(self):
+        self.checks: Dict[str, dict] = {}
+
+    def register(self, name: str) -> None:
+        self.checks[name] = {"status": "pending"}
+
+    def set(self, name: str, status: str, **details) -> None:
+        self.checks[name] = {"status": status, **details}
+
+    @property
+    def ready(self) -> bool:
+        return all(check["status"] == "ok" for check in self.checks.values())
+
+    def report(self) -> dict:
+        return {"ready": self.ready, "checks": self.checks}
+
+
+readiness = Readiness()
+
+
+async def run_check(name: str, check: Callable[[], object], attempts: int = 5,
+                    base_delay: float = 1.0) -> None:
+    """Run the blocking `check` in a thread, retrying with backoff, and record the outcome."""
+    readiness.register(name)
+    for attempt in range(attempts):
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(check)
+            readiness.set(name, "ok", seconds=round(time.perf_counter() - start, 3))
+            return
+        except Exception as e:
+            logger.warning(f"Startup check {name} failed (attempt {attempt + 1}/{attempts}): {e}")
+            readiness.set(name, "error", error=str(e), attempts=attempt + 1)
+            if attempt + 1 < attempts:
+                await asyncio.sleep(base_delay * 2 ** attempt)
+    logger.error(f"Startup check {name} gave up after {attempts} attempts")
+
+
+def start_checks(checks: Dict[str, Callable[[], object]]) -> list:
+    """Schedule every check on the running loop; returns the tasks so shutdown can cancel them."""
+    for name in checks:
+        readiness.register(name)
+    return [asyncio.create_task(run_check(name, check)) for name, check in checks.items()]
@@ -1,4 +1,5 @@
 import json
+from precompress import gzip_json
 from database import supabase
 
 BUCKET_NAME = "course-data"
@@ -12,14 +13,38 @@ def ensure_bucket():
         supabase.storage.create_bucket(BUCKET_NAME, options={"public": False})
 
 
-def storage_save(filename: str, data: dict) -> None:
-    """Upload a JSON dict to Supabase Storage, overwriting if exists."""
+def storage_save(filename: str, data: dict, precompress: bool = False) -> None:
+    """
+    Upload a JSON dict to Supabase Storage, overwriting if exists. With
+    `precompress` (for objects read far more often than written), the gzipped
+    response body is stored alongside it.
+    """
     content = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
     supabase.storage.from_(BUCKET_NAME).upload(
         filename,
         content,
         file_options={"content-type": "application/json", "upsert": "true"},
     )
+    if precompress:
+        save_compressed(filename, data)
+
+
+def compressed_filename(filename: str) -> str:
+    return f"{filename}.gz"
+
+
+def save_compressed(filename: str, body: dict) -> None:
+    """Store the gzipped JSON response body served for `filename` (compression.py)."""
+    supabase.storage.from_(BUCKET_NAME).upload(
+        compressed_filename(filename),
+        gzip_json(body),
+        file_options={"content-type": "application/gzip", "upsert": "true"},
+    )
+
+
+def discard_compressed(filename: str) -> None:
+    """Remove the gzipped body stored for `filename`, so an outdated one is never served."""
+    supabase.storage.from_(BUCKET_NAME).remove([compressed_filename(filename)])
 
 
 def storage_load(filename: str) -> dict | None:
@@ -29,3 +54,15 @@ def storage_load(filename: str) -> dict | None:
         return json.loads(response)
     except Exception:
         return None
+
+
+def storage_list(page_size: int = 1000) -> list:
+    """Names of every file in the bucket."""
+    bucket = supabase.storage.from_(BUCKET_NAME)
+    names, offset = [], 0
+    while True:
+        page = bucket.list("", {"limit": page_size, "offset": offset, "sortBy": {"column": "name", "order": "asc"}})
+        names += [entry["name"] for entry in page]
+        if len(page) < page_size:
+            return names
+        offset += page_size
@@ -9,6 +9,10 @@ from unittest.mock import MagicMock, patch
 os.environ.setdefault("GEMINI_API_KEY", "test-key")
 os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
 os.environ.setdefault("SUPABASE_SECRET_KEY", "test-secret-key")
+# Keep rate-limit counters per test run instead of in the shared SQLite file
+os.environ.setdefault("RATE_LIMIT_STORAGE", "memory://")
+# Likewise keep the course search index out of the shared file
+os.environ.setdefault("COURSE_INDEX_PATH", os.path.join(tempfile.mkdtemp(), "course-index.db"))
 
 
 @pytest.fixture
@@ -0,0 +1,119 @@
+import os
+import sys
+import pytest
+from unittest.mock import patch
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import attempt_encoding
+from attempt_encoding import (
+    quiz_version_id, encode_attempt, rehydrate_attempt,
+    snapshot_from_legacy_row, save_quiz_snapshot, load_quiz_snapshot, row_size_bytes,
+)
+
+
+@pytest.fixture
+def quiz():
+    return {
+        "title": "Unit 1 Quiz",
+        "multipleChoice": [
+            {"question": "Q1", "options": ["a", "b", "c", "d"], "correctAnswerIndex": 1,
+             "explanation": "Because b.", "relatedSubtopic": "Topic A"},
+            {"question": "Q2", "options": ["a", "b", "c", "d"], "correctAnswerIndex": 3,
+             "explanation": "Because d.", "relatedSubtopic": "Topic B"},
+        ],
+        "freeResponse": [
+            {"question": "Explain A.", "sampleAnswer": "A is...", "keyPoints": ["x"],
+             "maxPoints": 3, "relatedSubtopic": "Topic A"},
+        ],
+    }
+
+
+@pytest.fixture
+def results(quiz):
+    mcq_results = []
+    for q, selected in zip(quiz["multipleChoice"], [1, 0]):
+        mcq_results.append({
+            "question": q["question"],
+            "options": q["options"],
+            "selectedIndex": selected,
+            "correctAnswerIndex": q["correctAnswerIndex"],
+            "explanation": q["explanation"],
+            "correct": selected == q["correctAnswerIndex"],
+            "relatedSubtopic": q["relatedSubtopic"],
+        })
+    frq_evaluations = [{"questionIndex": 0, "score": 2, "maxPoints": 3, "feedback": "Close."}]
+    return mcq_results, frq_evaluations
+
+
+@pytest.fixture(autouse=True)
+def clear_snapshot_cache():
+    attempt_encoding._SNAPSHOT_CACHE.clear()
+    yield
+    attempt_encoding._SNAPSHOT_CACHE.clear()
+
+
+def test_version_ignores_version_field(quiz):
+    version = quiz_version_id(quiz)
+    assert quiz_version_id({**quiz, "quizVersion": version}) == version
+
+
+def test_version_changes_with_content(quiz):
+    changed = {**quiz, "title": "Retake"}
+    assert quiz_version_id(changed) != quiz_version_id(quiz)
+
+
+def test_roundtrip(quiz, results):
+    mcq_results, frq_evaluations = results
+    row = encode_attempt(quiz_version_id(quiz), mcq_results, frq_evaluations)
+    assert row["mcq_selected"] == [1, 0]
+    assert row["mcq_correct"] == [True, False]
+    assert row["frq_scores"] == [2]
+
+    details = rehydrate_attempt(row, quiz)
+    assert details["mcqResults"] == mcq_results
+    assert details["frqEvaluations"] == frq_evaluations
+    assert details["frqQuestions"] == quiz["freeResponse"]
+
+
+def test_compact_row_is_smaller(quiz, results):
+    mcq_results, frq_evaluations = results
+    legacy = row_size_bytes({"mcq_results": mcq_results, "frq_evaluations": frq_evaluations})
+    compact = row_size_bytes(encode_attempt(quiz_version_id(quiz), mcq_results, frq_evaluations))
+    assert compact < legacy
+
+
+def test_legacy_row_returned_as_stored(results):
+    mcq_results, frq_evaluations = results
+    row = {"mcq_results": mcq_results, "frq_evaluations": frq_evaluations}
+    details = rehydrate_attempt(row, None)
+    assert details["mcqResults"] == mcq_results
+    assert details["frqEvaluations"] == frq_evaluations
+
+
+def test_legacy_snapshot_rehydrates_mcq(quiz, results):
+    mcq_results, frq_evaluations = results
+    snapshot = snapshot_from_legacy_row({"mcq_results": mcq_results, "frq_evaluations": frq_evaluations})
+    row = encode_attempt(quiz_version_id(snapshot), mcq_results, frq_evaluations)
+    details = rehydrate_attempt(row, snapshot)
+    assert details["mcqResults"] == mcq_results
+    assert details["frqEvaluations"] == frq_evaluations
+
+
+def test_missing_quiz_version_raises():
+    with pytest.raises(ValueError):
+        rehydrate_attempt({"quiz_version": "abc", "mcq_selected": []}, None)
+
+
+def test_snapshot_loaded_once(quiz):
+    with patch.object(attempt_encoding, "storage_save") as save, \
+         patch.object(attempt_encoding, "storage_load", return_value=quiz) as load:
+        version = save_quiz_snapshot("course", 1, quiz)
+        save_quiz_snapshot("course", 1, quiz)
+        assert save.call_count == 1
+
+        attempt_encoding._SNAPSHOT_CACHE.clear()
+        assert load_quiz_snapshot("course", 1, version) == quiz
+        assert load_quiz_snapshot("course", 1, version) == quiz
+        assert load.call_count == 1
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import pytest
+import jwt
+from fastapi import HTTPException
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import auth
+from auth import ClaimsCache, verify_token, check_auth_id
+
+SECRET = "test-secret-key-for-auth-tests-0000"
+
+
+def make_token(sub="user-1", exp_in=3600, secret=SECRET):
+    payload = {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + exp_in}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setenv("SUPABASE_SECRET_KEY", SECRET)
+    monkeypatch.setattr(auth, "claims_cache", ClaimsCache(max_size=3))
+
+
+def test_token_is_verified_once(monkeypatch):
+    calls = []
+    decode = jwt.decode
+    monkeypatch.setattr(auth.jwt, "decode", lambda *a, **kw: calls.append(1) or decode(*a, **kw))
+    token = make_token("alice")
+    assert verify_token(token)["sub"] == "alice"
+    assert verify_token(token)["sub"] == "alice"
+    assert len(calls) == 1
+
+
+def test_invalid_tokens_are_rejected_and_not_cached():
+    with pytest.raises(jwt.PyJWTError):
+        verify_token(make_token(secret="some-other-secret-key-for-auth-tests"))
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verify_token(make_token(exp_in=-10))
+    assert len(auth.claims_cache) == 0
+
+
+def test_cached_claims_expire_with_token():
+    cache = auth.claims_cache
+    cache.put(b"k", {"sub": "alice", "exp": time.time() - 1})
+    assert cache.get(b"k") is None
+    assert len(cache) == 0
+
+
+def test_cache_is_bounded():
+    tokens = [make_token(f"user-{i}") for i in range(5)]
+    for token in tokens:
+        verify_token(token)
+    assert len(auth.claims_cache) == 3
+
+
+def test_check_auth_id():
+    assert check_auth_id("alice", "alice") == "alice"
+    assert check_auth_id(None, "alice") == "alice"
+    assert check_auth_id(None, None) is None
+    with pytest.raises(HTTPException) as forbidden:
+        check_auth_id("bob", "alice")
+    assert forbidden.value.status_code == 403
+    with pytest.raises(HTTPException) as anonymous:
+        check_auth_id("bob", None)
+    assert anonymous.value.status_code == 401
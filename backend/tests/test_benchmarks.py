@@ -0,0 +1,38 @@
+import os
+import sys
+import pytest
+from contextlib import ExitStack
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+from benchmarks.harness import load_app, Recorder, percentile
+from benchmarks.scenarios import SCENARIOS
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", list(SCENARIOS))
+async def test_scenarios_run_against_fakes(name):
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        recorder = Recorder()
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://bench") as client:
+            await SCENARIOS[name](client, main, recorder, students=3, turns=2)
+        recorder.stop()
+        await main.progress_buffer.stop()
+
+    rows = recorder.summary()
+    assert rows
+    assert all(r["errors"] == 0 for r in rows), rows
+    assert genai.calls
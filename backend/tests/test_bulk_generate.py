@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import pytest
+from unittest.mock import patch
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import bulk_generate
+from bulk_generate import Checkpoint, read_jobs, run, format_summary
+
+PLAN = {
+    "courseTitle": "Fractions",
+    "description": "Parts of a whole",
+    "metadata": {"skillLevel": "Beginner", "ageGroup": "Child"},
+    "units": [
+        {"unitNumber": 1, "title": "Halves", "subtopics": ["What is a half", "Halving shapes"]},
+        {"unitNumber": 2, "title": "Quarters", "subtopics": ["What is a quarter"]},
+    ],
+}
+
+
+class FakeGenerator:
+    def __init__(self, fail_items=()):
+        self.fail_items = set(fail_items)
+        self.calls = []
+
+    def generate_course(self, topic, skill_level, age_group, additional_notes=""):
+        self.calls.append(("plan", topic))
+        return {**PLAN, "courseTitle": topic}
+
+    def generate_topic_content(self, course_title, unit_title, subtopic, **kwargs):
+        self.calls.append(("lesson", subtopic))
+        if subtopic in self.fail_items:
+            return {"error": "503 UNAVAILABLE"}
+        return {"title": subtopic}
+
+    def generate_module_quiz(self, course_title, unit_title, **kwargs):
+        self.calls.append(("quiz", unit_title))
+        return {"multipleChoice": [], "freeResponse": []}
+
+
+@pytest.fixture
+def fake_storage():
+    saved = {}
+    plans = []
+    banked = saved["banked"] = []
+
+    def save_plan(plan, topic):
+        if topic == "Broken storage":
+            raise OSError("storage unavailable")
+        course_id = f"course_{len(plans)}"
+        plans.append(course_id)
+        saved[f"{course_id}.json"] = {"course_id": course_id, "course_plan": plan}
+        return course_id
+
+    with patch.object(bulk_generate, "save_course_plan", side_effect=save_plan), \
+         patch.object(bulk_generate, "storage_save", side_effect=lambda name, data, **kwargs: saved.__setitem__(name, data)), \
+         patch.object(bulk_generate, "get_course_data", side_effect=lambda cid: saved.get(f"{cid}.json")), \
+         patch.object(bulk_generate, "save_quiz_snapshot", return_value="v1"), \
+         patch.object(bulk_generate.question_bank, "deposit",
+                      side_effect=lambda cid, unit, quiz: banked.append((cid, unit))):
+        yield saved
+
+
+def test_read_jobs_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "courses.csv"
+    csv_path.write_text("topic,skill_level,age_group,notes\nFractions,Beginner,Child,Use pizza\n")
+    jsonl_path = tmp_path / "courses.jsonl"
+    jsonl_path.write_text(json.dumps({"topic": "Fractions", "skill_level": "Beginner",
+                                      "age_group": "Child", "additional_notes": "Use pizza"}) + "\n")
+
+    from_csv, from_jsonl = read_jobs(str(csv_path)), read_jobs(str(jsonl_path))
+    assert from_csv[0]["notes"] == "Use pizza"
+    assert from_csv[0]["key"] == from_jsonl[0]["key"]
+
+
+def test_read_jobs_rejects_missing_fields(tmp_path):
+    path = tmp_path / "courses.csv"
+    path.write_text("topic,skill_level,age_group\nFractions,,Child\n")
+    with pytest.raises(ValueError, match="skill_level"):
+        read_jobs(str(path))
+
+
+def test_generates_plans_lessons_and_quizzes(tmp_path, fake_storage):
+    jobs = [{"topic": t, "skill_level": "Beginner", "age_group": "Child", "notes": "", "key": t}
+            for t in ("Fractions", "Decimals")]
+    stats = run(jobs, Checkpoint(str(tmp_path / "cp.json")), FakeGenerator(),
+                workers=3, lessons=True, quizzes=True)
+
+    assert (stats["courses"], stats["lessons"], stats["quizzes"]) == (2, 6, 4)
+    assert not stats["failures"]
+    assert "course_0_topic_1_1.json" in fake_storage
+    assert fake_storage["course_1_module_quiz_2.json"]["quizVersion"] == "v1"
+    assert sorted(fake_storage["banked"]) == [("course_0", 1), ("course_0", 2), ("course_1", 1), ("course_1", 2)]
+    assert "items/min" in format_summary(stats)
+
+
+def test_rerun_resumes_from_checkpoint(tmp_path, fake_storage):
+    jobs = [{"topic": "Fractions", "skill_level": "Beginner", "age_group": "Child", "notes": "", "key": "k"}]
+    checkpoint_path = str(tmp_path / "cp.json")
+
+    first = run(jobs, Checkpoint(checkpoint_path), FakeGenerator(fail_items={"Halving shapes"}),
+                lessons=True)
+    assert first["lessons"] == 2
+    assert first["failures"][0]["item"] == "lesson:1:1"
+
+    generator = FakeGenerator()
+    second = run(jobs, Checkpoint(checkpoint_path), generator, lessons=True)
+    assert generator.calls == [("lesson", "Halving shapes")]
+    assert (second["courses_resumed"], second["lessons"], second["skipped"]) == (1, 1, 2)
+
+
+def test_save_failures_and_duplicate_rows(tmp_path, fake_storage):
+    jobs = [{"topic": t, "skill_level": "Beginner", "age_group": "Child", "notes": "", "key": t}
+            for t in ("Broken storage", "Fractions", "Fractions")]
+    checkpoint_path = str(tmp_path / "cp.json")
+    generator = FakeGenerator()
+    stats = run(jobs, Checkpoint(checkpoint_path), generator, workers=2, lessons=True)
+
+    assert generator.calls.count(("plan", "Fractions")) == 1
+    assert (stats["courses"], stats["lessons"], stats["duplicates"]) == (1, 3, 1)
+    assert stats["failures"] == [{"topic": "Broken storage", "item": "plan", "error": "storage unavailable"}]
+    saved = Checkpoint(checkpoint_path)
+    assert saved.jobs["Broken storage"]["failed"] == {"plan": "storage unavailable"}
+    assert saved.course_id("Broken storage") is None
@@ -0,0 +1,144 @@
+import os
+import sys
+import copy
+import pytest
+from contextlib import ExitStack
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+from httpx import ASGITransport, AsyncClient
+
+import auth
+from cohort_analytics import empty_stats, fold, report, settled
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+from benchmarks.harness import load_app
+from benchmarks.scenarios import seed_course, auth_headers
+
+QUIZ = {
+    "multipleChoice": [
+        {"question": "Easy?", "options": ["a", "b"], "relatedSubtopic": "Atoms"},
+        {"question": "Hard?", "options": ["a", "b"], "relatedSubtopic": "Moles"},
+        {"question": "Telling?", "options": ["a", "b"], "relatedSubtopic": "Moles"},
+    ],
+    "freeResponse": [{"question": "Explain.", "maxPoints": 3, "relatedSubtopic": "Atoms"}],
+}
+
+# (mcq_correct, frq score, percentage): strong students get "Telling?" right, weak ones don't
+ATTEMPTS = [
+    ([True, True, True], 3, 100.0),
+    ([True, False, True], 3, 85.0),
+    ([True, False, True], 2, 70.0),
+    ([True, False, False], 1, 40.0),
+    ([False, False, False], 0, 10.0),
+]
+
+
+def make_rows(start=1):
+    return [{"seq": start + i, "unit_number": 1, "quiz_version": "v1", "percentage": pct, "passed": pct >= 80,
+             "mcq_correct": mcq, "frq_scores": [frq]}
+            for i, (mcq, frq, pct) in enumerate(ATTEMPTS)]
+
+
+def load_quiz(course_id, unit_number, version):
+    return QUIZ if version == "v1" else None
+
+
+def by_question(result):
+    return {q["question"]: q for q in result["questions"]}
+
+
+def test_item_statistics():
+    result = report(fold(empty_stats(), "c", make_rows(), load_quiz))
+    questions = by_question(result)
+
+    assert questions["Easy?"]["difficulty"] == pytest.approx(0.8)
+    assert questions["Hard?"]["difficulty"] == pytest.approx(0.2)
+    assert questions["Explain."]["difficulty"] == pytest.approx(9 / 15)
+    # Hardest first
+    assert result["questions"][0]["question"] == "Hard?"
+
+    x = np.array([1, 1, 1, 0, 0], dtype=float)
+    y = np.array([a[2] for a in ATTEMPTS])
+    assert questions["Telling?"]["discrimination"] == pytest.approx(np.corrcoef(x, y)[0, 1])
+    assert questions["Telling?"]["discrimination"] > 0.8
+
+
+def test_subtopic_miss_rates_and_scores():
+    result = report(fold(empty_stats(), "c", make_rows(), load_quiz))
+    subtopics = {s["subtopic"]: s for s in result["subtopics"]}
+    # Moles: Hard? missed 4/5, Telling? missed 2/5
+    assert subtopics["Moles"]["missRate"] == pytest.approx(6 / 10)
+    # Atoms: Easy? missed 1/5; Explain. below 80% in 3/5
+    assert subtopics["Atoms"]["missRate"] == pytest.approx(4 / 10)
+    assert result["subtopics"][0]["subtopic"] == "Moles"
+
+    unit = result["units"][0]
+    assert unit["attempts"] == 5
+    assert unit["passRate"] == pytest.approx(0.4)
+    assert unit["meanScore"] == pytest.approx(61.0)
+    assert sum(b["count"] for b in unit["histogram"]) == 5
+    assert unit["histogram"][8] == {"from": 80, "to": 90, "count": 1}
+    assert unit["histogram"][9] == {"from": 90, "to": 100, "count": 1}
+
+
+def test_incremental_fold_matches_full_recompute():
+    rows = make_rows()
+    full = fold(empty_stats(), "c", copy.deepcopy(rows), load_quiz)
+    stats = fold(empty_stats(), "c", rows[:2], load_quiz)
+    stats = fold(stats, "c", rows[2:], load_quiz)
+
+    assert stats["cursor"] == full["cursor"] == 5
+    incremental, recomputed = by_question(report(stats)), by_question(report(full))
+    for text, q in recomputed.items():
+        assert incremental[text]["difficulty"] == pytest.approx(q["difficulty"])
+        assert incremental[text]["discrimination"] == pytest.approx(q["discrimination"])
+
+
+def test_unknown_versions_count_toward_scores_only():
+    rows = [{**row, "quiz_version": None} for row in make_rows()]
+    result = report(fold(empty_stats(), "c", rows, load_quiz))
+    assert result["units"][0]["attempts"] == 5
+    assert result["questions"] == [] and result["subtopics"] == []
+
+
+def test_recent_attempts_wait_for_next_refresh():
+    now = datetime.now(timezone.utc)
+    rows = [{"seq": 1, "created_at": (now - timedelta(minutes=5)).isoformat()},
+            {"seq": 2, "created_at": now.isoformat()},
+            {"seq": 3, "created_at": (now - timedelta(minutes=5)).isoformat()}]
+    assert [r["seq"] for r in settled(rows, now)] == [1]
+
+
+@pytest.mark.asyncio
+async def test_cohort_endpoint_folds_new_attempts(monkeypatch):
+    grader = "00000000-0000-0000-0046-000000000099"
+    monkeypatch.setattr(auth, "GRADER_IDS", frozenset({grader}))
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        # Fold attempts in as soon as they are stored
+        monkeypatch.setattr(main.cohort_analytics, "SETTLE_SECONDS", -60)
+        course_id = seed_course(main)
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            quiz = (await client.post("/generate_module_quiz", json={"courseId": course_id, "unitNumber": 1})).json()
+            for i in range(3):
+                auth_id = f"00000000-0000-0000-0046-{i:012d}"
+                await client.post("/evaluate_module_quiz", headers=auth_headers(auth_id), json={
+                    "courseId": course_id, "unitNumber": 1, "auth_id": auth_id,
+                    "mcqAnswers": [q["correctAnswerIndex"] if i else -1 for q in quiz["multipleChoice"]],
+                    "frqAnswers": ["answer"] * len(quiz["freeResponse"]),
+                })
+            learner = await client.get(f"/cohort_analytics/{course_id}", headers=auth_headers(auth_id))
+            headers = auth_headers(grader)
+            first = (await client.get(f"/cohort_analytics/{course_id}", headers=headers)).json()
+            again = (await client.get(f"/cohort_analytics/{course_id}", headers=headers)).json()
+        await main.progress_buffer.stop()
+
+    assert learner.status_code == 403
+
+    assert first["attempts"] == again["attempts"] == 3
+    assert len(first["questions"]) == len(quiz["multipleChoice"]) + len(quiz["freeResponse"])
+    assert first["units"][0]["attempts"] == 3
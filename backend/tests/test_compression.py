@@ -0,0 +1,132 @@
+import os
+import sys
+import gzip
+import pytest
+from contextlib import ExitStack
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from compression import CompressionMiddleware, accepts_gzip, precompressed_response
+from precompress import gzip_json, json_body
+from storage import compressed_filename
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+from benchmarks.harness import load_app
+from benchmarks.scenarios import seed_course
+
+LARGE = {"sections": ["A long section of lesson text. " * 20 for _ in range(5)]}
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/large")
+    async def large():
+        return LARGE
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/binary")
+    async def binary():
+        return PlainTextResponse("x" * 2000, media_type="application/octet-stream")
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"chunk {i} ".encode() * 100
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.get("/precompressed")
+    async def precompressed():
+        return precompressed_response(gzip_json(LARGE))
+
+    return app
+
+
+def test_accept_encoding_parsing():
+    assert accepts_gzip({"accept-encoding": "gzip, deflate, br"})
+    assert accepts_gzip({"accept-encoding": "br;q=1.0, *;q=0.5"})
+    assert not accepts_gzip({"accept-encoding": "gzip;q=0, deflate"})
+    assert not accepts_gzip({})
+
+
+@pytest.mark.asyncio
+async def test_middleware_thresholds():
+    async with AsyncClient(transport=ASGITransport(app=make_app()), base_url="http://test",
+                           headers={"Accept-Encoding": "gzip"}) as client:
+        large = await client.get("/large")
+        small = await client.get("/small")
+        binary = await client.get("/binary")
+        stream = await client.get("/stream")
+        precompressed = await client.get("/precompressed")
+        plain = await client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert int(large.headers["content-length"]) < len(json_body(LARGE)) / 4
+    assert large.json() == LARGE
+    assert "accept-encoding" in large.headers["vary"].lower()
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in binary.headers
+    assert stream.headers["content-encoding"] == "gzip"
+    assert stream.text.startswith("chunk 0 ") and stream.text.endswith("chunk 2 ")
+    # Served as stored, not compressed a second time
+    assert precompressed.json() == LARGE
+    assert "content-encoding" not in plain.headers and plain.json() == LARGE
+
+
+@pytest.mark.asyncio
+async def test_immutable_objects_served_precompressed(monkeypatch):
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        monkeypatch.setattr(main.progressive_topics, "PROGRESSIVE_TOPICS", False)
+        course_id = seed_course(main)
+        objects = supabase.storage.objects
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            course = await client.get(f"/course/{course_id}")
+            topic = {"courseId": course_id, "unitNumber": 1, "subtopicIndex": 0}
+            generated = await client.post("/generate_topic", json=topic)
+            lesson_gz = objects[f"{course_id}_topic_1_0.json.gz"]
+            calls_before = supabase.storage.call_count
+            served = await client.post("/generate_topic", json=topic)
+            # Only the .gz is read: no course plan, lesson JSON or metadata request
+            storage_calls = supabase.storage.call_count - calls_before
+            plain = await client.post("/generate_topic", json=topic, headers={"Accept-Encoding": "identity"})
+        await main.progress_buffer.stop()
+
+    assert course.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(objects[f"{course_id}.json.gz"]) == json_body(course.json())
+    assert gzip.decompress(lesson_gz) == json_body(generated.json())
+    assert served.headers["content-encoding"] == "gzip"
+    assert storage_calls == 1
+    assert served.json() == generated.json() == plain.json()
+    assert "content-encoding" not in plain.headers
+
+
+@pytest.mark.asyncio
+async def test_precompressed_body_follows_rewrites_by_other_workers(monkeypatch):
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        monkeypatch.setattr(main.progressive_topics, "PROGRESSIVE_TOPICS", False)
+        course_id = seed_course(main)
+        topic = {"courseId": course_id, "unitNumber": 1, "subtopicIndex": 0}
+        key = f"{course_id}_topic_1_0.json"
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            await client.post("/generate_topic", json=topic)
+            first = await client.post("/generate_topic", json=topic)
+            # bulk_generate regenerates the lesson from another process
+            supabase.storage.objects[compressed_filename(key)] = gzip_json({**first.json(), "title": "Rewritten"})
+            rewritten = await client.post("/generate_topic", json=topic)
+        await main.progress_buffer.stop()
+
+    assert first.headers["content-encoding"] == "gzip"
+    assert rewritten.json() == {**first.json(), "title": "Rewritten"}
@@ -0,0 +1,102 @@
+import os
+import sys
+import pytest
+from contextlib import ExitStack
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from httpx import ASGITransport, AsyncClient
+
+from course_index import MAX_QUERY_TERMS, CourseIndex, course_terms, tokens
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase, canned_course_plan
+from benchmarks.harness import load_app
+
+
+def plan(title, skill="Beginner", age="Teen", units=(), description=""):
+    return {
+        "courseTitle": title,
+        "description": description,
+        "metadata": {"skillLevel": skill, "ageGroup": age},
+        "units": [{"unitNumber": i + 1, "title": unit, "subtopics": subtopics}
+                  for i, (unit, subtopics) in enumerate(units)],
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = CourseIndex(str(tmp_path / "index.db"))
+    index.add("chem", plan("Intro to Chemistry", units=[("Atoms", ["Protons and neutrons", "Electron shells"]),
+                                                         ("Moles", ["Avogadro's number"])]), "chemistry")
+    index.add("chem-adv", plan("Organic Chemistry", skill="Advanced", age="Adult",
+                               units=[("Carbon bonds", ["Alkanes"])]))
+    index.add("bio", plan("Cell Biology", units=[("Cells", ["Membranes", "Atoms in cells"])]))
+    return index
+
+
+def test_tokens_drop_stopwords_and_plurals():
+    assert tokens("Intro to the Atoms of Chemistry") == ["atom", "chemistry"]
+    assert tokens("Glass") == ["glass"]
+
+
+def test_title_terms_outweigh_subtopics():
+    terms = course_terms(plan("Chemistry", units=[("Atoms", ["Chemistry of atoms"])]))
+    assert terms["chemistry"] == 4.0
+    assert terms["atom"] == 3.0
+
+
+def test_ranked_search_with_filters(index):
+    results = index.search("chemistry atoms")
+    assert [r["courseId"] for r in results][:2] == ["chem", "chem-adv"]
+    assert results[0]["coverage"] == 1.0
+
+    assert [r["courseId"] for r in index.search("chemistry", skill_level="advanced")] == ["chem-adv"]
+    assert [r["courseId"] for r in index.search("atoms", age_group="Teen")] == ["chem", "bio"]
+    assert index.search("the of") == []
+
+
+def test_reindexing_replaces_postings(index):
+    index.add("bio", plan("Marine Biology", units=[("Reefs", ["Coral"])]))
+    assert [r["courseId"] for r in index.search("atoms")] == ["chem"]
+    assert [r["courseId"] for r in index.search("coral")] == ["bio"]
+    assert len(index) == 3
+    index.remove("bio")
+    assert index.search("coral") == [] and len(index) == 2
+
+
+def test_long_queries_use_their_first_distinct_terms(index):
+    filler = " ".join(f"word{i}" for i in range(40000))
+    results = index.search(f"chemistry chemistry atoms {filler}")
+    assert [r["courseId"] for r in results][:2] == ["chem", "chem-adv"]
+    assert results[0]["coverage"] == round(2 / MAX_QUERY_TERMS, 2)
+    assert index.search(f"{filler} chemistry") == []
+
+
+def test_similar_needs_most_topic_terms(index):
+    assert [r["courseId"] for r in index.similar("Intro to Chemistry", "Beginner", "Teen")] == ["chem"]
+    assert index.similar("Chemistry of cooking pasta", "Beginner", "Teen") == []
+    assert index.similar("Intro to Chemistry", "Beginner", "Adult") == []
+
+
+@pytest.mark.asyncio
+async def test_saved_courses_are_searchable_and_offered_before_generating(tmp_path, monkeypatch):
+    monkeypatch.setenv("COURSE_INDEX_PATH", str(tmp_path / "index.db"))
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        course_id = main.save_course_plan_locally(canned_course_plan("Intro to Chemistry"), "Intro to Chemistry")
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            found = (await client.get("/courses/search", params={"q": "chemistry", "age_group": "teen"})).json()
+            form = {"topic": "Chemistry", "skill_level": "Beginner", "age_group": "Teen", "check_similar": "true"}
+            offered = (await client.post("/generate_course", data=form)).json()
+            generated = (await client.post("/generate_course", data={**form, "check_similar": "false"})).json()
+        await main.progress_buffer.stop()
+
+        # A fresh index is filled back from storage
+        main.course_index.remove(course_id)
+        main.course_index.remove(generated["course_id"])
+        assert sys.modules["course_index"].rebuild() == 2
+
+    assert [r["courseId"] for r in found["results"]] == [course_id]
+    assert offered == {"similarCourses": found["results"]}
+    assert generated["course_id"] != course_id
@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import time
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import data_access
+from data_access import gather, optional, skip, load_json, latest_attempt_number, recent_attempts
+from benchmarks.fakes import FakeAsyncSupabase, FakeSupabase, Latency
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeSupabase(db_latency=Latency(0.05, sigma=0.0), storage_latency=Latency(0.05, sigma=0.0))
+    client = FakeAsyncSupabase(db)
+
+    async def get_async_supabase():
+        return client
+
+    monkeypatch.setattr(data_access, "get_async_supabase", get_async_supabase)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_independent_reads_overlap(fake_db):
+    fake_db.storage.objects["c1.json"] = json.dumps({"course_plan": {"courseTitle": "T"}}).encode()
+    fake_db.storage.objects["c1_module_quiz_1.json"] = json.dumps({"multipleChoice": []}).encode()
+    fake_db.tables["quiz_attempts"] = [
+        {"auth_id": "u", "course_id": "c1", "unit_number": 1, "attempt_number": n} for n in (1, 2)
+    ]
+
+    start = time.perf_counter()
+    course, quiz, last = await gather(
+        load_json("c1.json"), load_json("c1_module_quiz_1.json"), latest_attempt_number("u", "c1", 1)
+    )
+    elapsed = time.perf_counter() - start
+
+    assert course["course_plan"]["courseTitle"] == "T"
+    assert quiz == {"multipleChoice": []}
+    assert last == 2
+    # Three 50 ms reads in roughly one round trip
+    assert elapsed < 0.12
+
+
+@pytest.mark.asyncio
+async def test_missing_file_and_skipped_reads(fake_db):
+    missing, skipped, attempts = await gather(load_json("nope.json"), skip(), recent_attempts("u", "c1", 1))
+    assert missing is None
+    assert skipped is None
+    assert attempts == []
+
+
+@pytest.mark.asyncio
+async def test_optional_read_failure_returns_default(fake_db):
+    async def broken():
+        raise ConnectionError("PostgREST unavailable")
+
+    assert await optional(broken(), default=0, what="count attempts") == 0
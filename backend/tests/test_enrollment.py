@@ -1,6 +1,8 @@
 import os
 import sys
 import json
+import time
+import jwt
 import pytest
 from unittest.mock import MagicMock, patch
 
@@ -51,6 +53,12 @@ def course_dir(tmp_path):
     return tmp_path, course_id
 
 
+def auth_headers(sub="user-123"):
+    token = jwt.encode({"sub": sub, "aud": "authenticated", "exp": int(time.time()) + 3600},
+                       os.environ["SUPABASE_SECRET_KEY"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
 def make_execute_result(data=None, error=None):
     result = MagicMock()
     result.data = data if data is not None else []
@@ -66,15 +74,30 @@ def app_client(course_dir):
     course_path, course_id = course_dir
     mock_sb = MagicMock()
 
+    def load_from_dir(filename):
+        path = course_path / filename
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return json.load(f)
+
     with patch('database.create_client', return_value=mock_sb), \
-         patch('main.supabase', mock_sb):
+         patch('main.supabase', mock_sb), \
+         patch('progress_buffer.supabase', mock_sb), \
+         patch('main.storage_load', side_effect=load_from_dir), \
+         patch('course_cache.storage_load', side_effect=load_from_dir):
         # Need to reimport to pick up patches
         import main
+        import course_cache
+        import progress_buffer
+        course_cache._COURSE_CACHE.clear()
+        course_cache._TOPIC_INDEX.clear()
+        progress_buffer._enrolled.clear()
         main.COURSE_PLANS_DIR = str(course_path)
         main.supabase = mock_sb
 
         transport = ASGITransport(app=main.app)
-        client = AsyncClient(transport=transport, base_url="http://test")
+        client = AsyncClient(transport=transport, base_url="http://test", headers=auth_headers())
         yield client, mock_sb, course_id
 
 
@@ -162,6 +185,7 @@ async def test_get_user_courses_empty(app_client):
     chain = MagicMock()
     chain.eq.return_value = chain
     chain.order.return_value = chain
+    chain.limit.return_value = chain
     chain.execute.return_value = make_execute_result(data=[])
     mock_sb.table.return_value.select.return_value = chain
 
@@ -181,6 +205,7 @@ async def test_get_user_courses_with_data(app_client):
     chain = MagicMock()
     chain.eq.return_value = chain
     chain.order.return_value = chain
+    chain.limit.return_value = chain
     chain.execute.return_value = make_execute_result(data=courses)
     mock_sb.table.return_value.select.return_value = chain
 
@@ -197,6 +222,7 @@ async def test_update_progress_success(app_client):
     # Mock: enrollment exists
     chain_select = MagicMock()
     chain_select.eq.return_value = chain_select
+    chain_select.limit.return_value = chain_select
     chain_select.execute.return_value = make_execute_result(data=[{"id": "uuid-1"}])
     mock_sb.table.return_value.select.return_value = chain_select
 
@@ -223,6 +249,7 @@ async def test_update_progress_not_enrolled(app_client):
     # Mock: enrollment does not exist
     chain_select = MagicMock()
     chain_select.eq.return_value = chain_select
+    chain_select.limit.return_value = chain_select
     chain_select.execute.return_value = make_execute_result(data=[])
     mock_sb.table.return_value.select.return_value = chain_select
 
@@ -238,23 +265,15 @@ async def test_update_progress_not_enrolled(app_client):
 @pytest.mark.asyncio
 async def test_update_progress_marks_completed(app_client):
     client, mock_sb, course_id = app_client
+    import main
 
     # Mock: enrollment exists
     chain_select = MagicMock()
     chain_select.eq.return_value = chain_select
+    chain_select.limit.return_value = chain_select
     chain_select.execute.return_value = make_execute_result(data=[{"id": "uuid-1"}])
     mock_sb.table.return_value.select.return_value = chain_select
 
-    # Mock: update succeeds
-    chain_update = MagicMock()
-    chain_update.eq.return_value = chain_update
-    chain_update.execute.return_value = make_execute_result(data=[{
-        "id": "uuid-1",
-        "completed_topics": ["1-0", "1-1", "2-0"],
-        "is_completed": True,
-    }])
-    mock_sb.table.return_value.update.return_value = chain_update
-
     # All 3 topics in the test course (Topic A, Topic B, Topic C)
     resp = await client.post("/update_progress", json={
         "auth_id": "user-123",
@@ -263,9 +282,41 @@ async def test_update_progress_marks_completed(app_client):
         "last_visited": "2-0",
     })
     assert resp.status_code == 200
+    assert resp.json()["data"][0]["completed_topics"] == ["1-0", "1-1", "2-0"]
+
+    # The write is buffered; flushing sends one delta setting every topic, with
+    # the units whose quizzes apply_progress_deltas checks for is_completed
+    mock_sb.table.return_value.update.assert_not_called()
+    assert await main.progress_buffer.flush() == 1
+    name, params = mock_sb.rpc.call_args[0]
+    assert name == "apply_progress_deltas"
+    assert params["deltas"] == [{
+        "auth_id": "user-123",
+        "course_id": course_id,
+        "width": 3,
+        "set_mask": "111",
+        "clear_mask": "000",
+        "last_visited": "2-0",
+        "unit_numbers": [1, 2],
+        "topic_ids": ["1-0", "1-1", "2-0"],
+    }]
+
+
+@pytest.mark.asyncio
+async def test_enroll_requires_token(app_client):
+    client, mock_sb, course_id = app_client
+
+    client.headers.pop("Authorization")
+    resp = await client.post("/enroll", json={"auth_id": "user-123", "course_id": course_id})
+    assert resp.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_auth_id_must_match_token(app_client):
+    client, mock_sb, course_id = app_client
 
-    # Verify the update was called with is_completed=True
-    update_call = mock_sb.table.return_value.update.call_args
-    if update_call:
-        update_data = update_call[0][0]
-        assert update_data["is_completed"] is True
+    resp = await client.post("/enroll", json={"auth_id": "someone-else", "course_id": course_id})
+    assert resp.status_code == 403
+    resp = await client.get("/user/someone-else/courses")
+    assert resp.status_code == 403
+    mock_sb.table.assert_not_called()
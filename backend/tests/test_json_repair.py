@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from json_repair import clean_continuation, repair
+
+
+def test_valid_json_is_unchanged():
+    text = '{"a": [1, 2, {"b": "x, y]"}], "c": "say \\"hi\\""}'
+    assert repair(text) == (text, False)
+
+
+def test_fences_prose_and_trailing_commas_removed():
+    repaired, truncated = repair('Here you go:\n```json\n{"a": [1, 2,], "b": {"c": 1,},}\n```\nDone.')
+    assert not truncated
+    assert json.loads(repaired) == {"a": [1, 2], "b": {"c": 1}}
+
+
+def test_control_characters_in_strings_escaped():
+    repaired, _ = repair('{"text": "line one\nline\ttwo"}')
+    assert json.loads(repaired) == {"text": "line one\nline\ttwo"}
+
+
+def test_truncated_document_cut_to_last_complete_element():
+    cases = {
+        '{"a": 1, "b": [1, 2': {"a": 1, "b": [1]},
+        '{"a": 1, "b": "unfinished str': {"a": 1},
+        '{"a": {"x": 1}, "b': {"a": {"x": 1}},
+        '{"items": [{"n": 1}, {"n": 2}': {"items": [{"n": 1}, {"n": 2}]},
+        '[{"n": 1}, {"n"': [{"n": 1}],
+        '{"a': {},
+    }
+    for text, expected in cases.items():
+        repaired, truncated = repair(text)
+        assert truncated, text
+        assert json.loads(repaired) == expected, text
+
+
+def test_text_without_json_left_alone():
+    assert repair("no json here") == ("no json here", False)
+
+
+def test_continuation_fence_stripped():
+    assert clean_continuation('```json\nints": 2}]}\n```') == 'ints": 2}]}'
+    assert clean_continuation(' 2}]}') == '2}]}'
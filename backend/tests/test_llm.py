@@ -0,0 +1,244 @@
+import os
+import sys
+import time
+import threading
+import pytest
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import llm
+from pydantic import BaseModel
+from llm import (generate_content, generate_json, RetryBudget, LatencyTracker,
+                 LLMDeadlineExceeded, SchemaValidationError)
+
+
+class FlakyClient:
+    """Fake genai client: each call pops a (delay, error) behaviour from a script."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+        self.configs = []
+        self.models_used = []
+        self._lock = threading.Lock()
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model, contents=None, config=None):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            step = self.script.pop(0) if self.script else (0.0, None)
+            self.configs.append(config)
+            self.models_used.append(model)
+        delay, error = step[:2]
+        time.sleep(delay)
+        if error:
+            raise error
+        text = step[2] if len(step) > 2 else f"response {call}"
+        return SimpleNamespace(text=text, usage_metadata=None)
+
+
+class ServerError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} server error")
+        self.code = code
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(llm, "retry_budget", RetryBudget(ratio=0.1, max_tokens=20))
+    monkeypatch.setattr(llm, "latency_tracker", LatencyTracker(min_samples=5))
+    monkeypatch.setattr(llm, "BACKOFF_BASE", 0.01)
+
+
+def test_retries_transient_errors():
+    client = FlakyClient([(0, ServerError(503)), (0, ServerError(500)), (0, None)])
+    response = generate_content(client, "unit", model="m", contents=["hi"])
+    assert response.text == "response 3"
+    assert client.calls == 3
+
+
+def test_does_not_retry_client_errors():
+    client = FlakyClient([(0, ServerError(400)), (0, None)])
+    with pytest.raises(ServerError):
+        generate_content(client, "unit", model="m", contents=["hi"])
+    assert client.calls == 1
+
+
+def test_gives_up_after_max_retries():
+    client = FlakyClient([(0, ServerError(503))] * 5)
+    with pytest.raises(ServerError):
+        generate_content(client, "unit", model="m", contents=["hi"], max_retries=2)
+    assert client.calls == 3
+
+
+def test_deadline_exceeded():
+    client = FlakyClient([(1.0, None)])
+    start = time.monotonic()
+    with pytest.raises(LLMDeadlineExceeded):
+        generate_content(client, "unit", model="m", contents=["hi"], deadline=0.2)
+    assert time.monotonic() - start < 0.6
+
+
+def test_deadline_passed_to_http_timeout():
+    client = FlakyClient([(0, None)])
+    generate_content(client, "unit", model="m", contents=["hi"], deadline=5,
+                     config={"response_mime_type": "application/json"})
+    config = client.configs[0]
+    assert config["response_mime_type"] == "application/json"
+    assert 1000 <= config["http_options"]["timeout"] <= 5000
+
+
+def test_retry_budget_caps_retries():
+    llm.retry_budget = RetryBudget(ratio=0.0, max_tokens=1)
+    client = FlakyClient([(0, ServerError(503))] * 10)
+    with pytest.raises(ServerError):
+        generate_content(client, "unit", model="m", contents=["hi"], max_retries=5)
+    # One retry allowed by the single token, then the budget is empty
+    assert client.calls == 2
+
+
+def test_hedge_returns_faster_response():
+    for _ in range(10):
+        llm.latency_tracker.observe("hedged", 0.05)
+    client = FlakyClient([(1.0, None), (0.0, None)])
+    start = time.monotonic()
+    response = generate_content(client, "hedged", model="m", contents=["hi"], hedge=True)
+    assert response.text == "response 2"
+    assert time.monotonic() - start < 0.5
+    assert client.calls == 2
+
+
+def test_no_hedge_without_latency_history():
+    client = FlakyClient([(0.1, None), (0.0, None)])
+    response = generate_content(client, "cold", model="m", contents=["hi"], hedge=True)
+    assert response.text == "response 1"
+    assert client.calls == 1
+
+
+def test_budget_refills_with_traffic():
+    budget = RetryBudget(ratio=0.5, max_tokens=2)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_call()
+    budget.record_call()
+    assert budget.try_spend()
+
+
+class Grade(BaseModel):
+    score: int
+    feedback: str
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    monkeypatch.setitem(llm.MODEL_ROUTES, "grading",
+                        {"model": "fast", "fallback": "strong", "escalate": "strong"})
+
+
+def test_routes_task_to_configured_model(routes):
+    client = FlakyClient([(0, None)])
+    generate_content(client, "grading", contents=["hi"])
+    assert client.models_used == ["fast"]
+
+
+def test_retries_go_to_fallback_model(routes):
+    client = FlakyClient([(0, ServerError(503)), (0, None)])
+    generate_content(client, "grading", contents=["hi"])
+    assert client.models_used == ["fast", "strong"]
+
+
+def test_strong_model_tasks_retry_on_their_own_model():
+    client = FlakyClient([(0, ServerError(503)), (0, None)])
+    generate_content(client, "course_plan", contents=["hi"])
+    assert client.models_used == [llm.STRONG_MODEL, llm.STRONG_MODEL]
+
+
+def test_explicit_model_is_not_rerouted(routes):
+    client = FlakyClient([(0, ServerError(503)), (0, None)])
+    generate_content(client, "grading", model="pinned", contents=["hi"])
+    assert client.models_used == ["pinned", "pinned"]
+
+
+def test_generate_json_validates_schema(routes):
+    client = FlakyClient([(0, None, '{"score": 3, "feedback": "ok"}')])
+    assert generate_json(client, "grading", Grade, contents=["hi"]) == {"score": 3, "feedback": "ok"}
+    assert client.configs[0]["response_schema"] is Grade
+    assert client.configs[0]["response_mime_type"] == "application/json"
+
+
+class Feedback(BaseModel):
+    score: int
+    hint: str | None = None
+
+
+def test_generate_json_returns_the_json_as_written(routes):
+    text = '{"score": 3, "feedback": "ok", "confidence": 0.9}'
+    assert generate_json(FlakyClient([(0, None, text)]), "grading", Grade, contents=["hi"]) == {
+        "score": 3, "feedback": "ok", "confidence": 0.9}
+    assert generate_json(FlakyClient([(0, None, '{"score": 3}')]), "grading", Feedback,
+                         contents=["hi"]) == {"score": 3}
+
+
+def test_invalid_output_escalates_to_stronger_model(routes):
+    client = FlakyClient([(0, None, '{"score": "high"}'), (0, None, '{"score": 3, "feedback": "ok"}')])
+    assert generate_json(client, "grading", Grade, contents=["hi"])["score"] == 3
+    assert client.models_used == ["fast", "strong"]
+
+
+def test_escalation_failure_raises(routes):
+    client = FlakyClient([(0, None, "not json"), (0, None, "")])
+    with pytest.raises(SchemaValidationError):
+        generate_json(client, "grading", Grade, contents=["hi"])
+    assert client.calls == 2
+
+
+class Item(BaseModel):
+    name: str
+    points: int
+
+
+class Sheet(BaseModel):
+    title: str
+    items: list[Item]
+
+
+def test_malformed_json_repaired_locally(routes):
+    client = FlakyClient([(0, None, '```json\n{"score": 3, "feedback": "line one\nline two",}\n```')])
+    assert generate_json(client, "grading", Grade, contents=["hi"]) == {"score": 3, "feedback": "line one\nline two"}
+    assert client.calls == 1
+
+
+def test_truncated_json_is_continued_not_regenerated(routes):
+    client = FlakyClient([(0, None, '{"title": "Quiz", "items": [{"name": "a", "points": 1}, {"name": "b", "po'),
+                          (0, None, 'ints": 2}]}')])
+    result = generate_json(client, "grading", Sheet, contents=["hi"])
+    assert result == {"title": "Quiz", "items": [{"name": "a", "points": 1}, {"name": "b", "points": 2}]}
+    assert client.models_used == ["fast", "fast"]
+    # The continuation is free text following the partial answer
+    assert "response_schema" not in client.configs[1]
+    assert client.configs[1]["response_mime_type"] == "text/plain"
+
+
+def test_only_the_invalid_part_is_regenerated(routes):
+    client = FlakyClient([(0, None, '{"title": "Quiz", "items": [{"name": "a", "points": 1}, {"name": "b"}]}'),
+                          (0, None, '{"name": "b", "points": 2}')])
+    result = generate_json(client, "grading", Sheet, contents=["hi"])
+    assert result["items"][1] == {"name": "b", "points": 2}
+    assert client.configs[1]["response_schema"] is Item
+    assert client.models_used == ["fast", "fast"]
+
+
+def test_patched_output_keeps_its_shape(routes):
+    client = FlakyClient([(0, None, '{"title": "Quiz", "source": "bank", "items": [{"name": "b"}]}'),
+                          (0, None, '{"name": "b", "points": 2, "tag": "x"}')])
+    assert generate_json(client, "grading", Sheet, contents=["hi"]) == {
+        "title": "Quiz", "source": "bank", "items": [{"name": "b", "points": 2, "tag": "x"}]}
+
+
+def test_unrecoverable_output_still_escalates(routes):
+    client = FlakyClient([(0, None, '{"items": []}'), (0, None, '{"title": "Quiz", "items": []}')])
+    assert generate_json(client, "grading", Sheet, contents=["hi"]) == {"title": "Quiz", "items": []}
+    assert client.models_used == ["fast", "strong"]
@@ -0,0 +1,51 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import metrics
+from metrics import Counter, Histogram, render_prometheus
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("test_latency_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "/a")
+    hist.observe(0.5, "/a")
+    hist.observe(5.0, "/a")
+    text = render_prometheus()
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{route="/a"} 3' in text
+
+
+def test_counter_escapes_labels():
+    counter = Counter("test_events_total", "test", ("name",))
+    counter.inc('say "hi"')
+    assert 'test_events_total{name="say \\"hi\\""} 1.0' in render_prometheus()
+
+
+def test_llm_call_records_tokens_and_cost():
+    usage = SimpleNamespace(prompt_token_count=1_000_000, candidates_token_count=100_000,
+                            thoughts_token_count=None)
+    metrics.observe_llm_call("unit_test", "gemini-2.5-flash", 1.5, usage)
+    assert metrics.LLM_TOKENS.value("unit_test", "gemini-2.5-flash", "input") == 1_000_000
+    assert metrics.LLM_TOKENS.value("unit_test", "gemini-2.5-flash", "output") == 100_000
+    assert metrics.LLM_LATENCY.count("unit_test", "gemini-2.5-flash", "ok") == 1
+    input_price, output_price = metrics.MODEL_PRICES["gemini-2.5-flash"]
+    expected = input_price + output_price / 10
+    assert abs(metrics.LLM_COST.value("unit_test", "gemini-2.5-flash") - expected) < 1e-9
+
+
+def test_dependency_calls_attributed_to_request():
+    calls = metrics.start_request()
+    metrics.observe_dependency_call("supabase", "GET quiz_attempts", 0.02)
+    metrics.observe_dependency_call("supabase", "GET user_courses", 0.03)
+    metrics.observe_dependency_call("storage", "GET object", 0.1)
+    assert calls["supabase"][0] == 2
+    assert abs(calls["supabase"][1] - 0.05) < 1e-9
+    assert calls["storage"][0] == 1
+    assert metrics._dependency_for("/rest/v1/rpc/apply_progress_deltas") == ("supabase", "rpc/apply_progress_deltas")
+    assert metrics._dependency_for("/storage/v1/object/course-data/x.json") == ("storage", "object")
@@ -0,0 +1,107 @@
+import os
+import sys
+import pytest
+from contextlib import ExitStack
+from fastapi import HTTPException
+from httpx import ASGITransport, AsyncClient
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pagination import select_columns, page_size, split_page, keyset_filter, MAX_PAGE_SIZE
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+from benchmarks.harness import load_app
+from benchmarks.scenarios import auth_headers
+
+
+def test_default_columns_include_cursor():
+    assert select_columns(None, ("a", "b", "n"), ("a", "b"), "n") == "a,b,n"
+
+
+def test_star_default_left_alone():
+    assert select_columns(None, ("a", "n"), ("*",), "n") == "*"
+
+
+def test_requested_fields_projected():
+    assert select_columns("b, a", ("a", "b", "n"), ("a",), "n") == "b,a,n"
+
+
+def test_unknown_field_rejected():
+    with pytest.raises(HTTPException) as exc:
+        select_columns("a,secret", ("a", "n"), ("a",), "n")
+    assert exc.value.status_code == 400
+
+
+def test_page_size_clamped():
+    assert page_size(10_000) == MAX_PAGE_SIZE
+    with pytest.raises(HTTPException):
+        page_size(0)
+
+
+def test_split_page_sets_cursor_only_when_more():
+    rows = [{"n": i} for i in range(1, 5)]
+    assert split_page(rows, 3, "n") == {"rows": rows[:3], "next_cursor": 3}
+    assert split_page(rows[:3], 3, "n") == {"rows": rows[:3], "next_cursor": None}
+
+
+def test_composite_cursor_breaks_ties():
+    rows = [{"t": "2024-01-01T00:00:00+00:00", "id": i} for i in (3, 2, 1)]
+    assert split_page(rows, 2, ("t", "id"))["next_cursor"] == "2024-01-01T00:00:00+00:00,2"
+    assert select_columns("a", ("a", "t", "id"), ("a",), ("t", "id")) == "a,t,id"
+
+
+def test_keyset_filter():
+    assert keyset_filter("2024-01-01T00:00:00+00:00,7", ("t", "id")) == \
+        't.lt."2024-01-01T00:00:00+00:00",and(t.eq."2024-01-01T00:00:00+00:00",id.lt."7")'
+    # Cursors issued before the tie-breaker still work
+    assert keyset_filter("2024-01-01", ("t", "id")) == 't.lt."2024-01-01"'
+    with pytest.raises(HTTPException):
+        keyset_filter(",7", ("t", "id"))
+    with pytest.raises(HTTPException):
+        keyset_filter("a,b,c", ("t", "id"))
+
+
+def test_keyset_filter_escapes_quoted_values():
+    # A value can't close its quotes and smuggle in another condition
+    cursor = split_page([{"title": 'x",id.gt."', "id": 'a\\"b'}] * 2, 1, ("title", "id"))["next_cursor"]
+    assert keyset_filter(cursor, ("title", "id")) == \
+        'title.lt."x\\",id.gt.\\"",and(title.eq."x\\",id.gt.\\"",id.lt."a\\\\\\"b")'
+
+    supabase = FakeSupabase()
+    titles = ['Say "hi"', 'Back\\slash', 'x",id.gt."', "Plain", 'Say "hi"']
+    supabase.tables["courses"] = [{"id": str(i), "title": title} for i, title in enumerate(titles)]
+    seen, cursor = [], None
+    while True:
+        query = supabase.table("courses").select("id,title")
+        if cursor:
+            query = query.or_(keyset_filter(cursor, ("title", "id")))
+        rows = query.order("title", desc=True).order("id", desc=True).limit(3).execute().data
+        page = split_page(rows, 2, ("title", "id"))
+        seen += [row["id"] for row in page["rows"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["2", "4", "0", "3", "1"]
+
+
+@pytest.mark.asyncio
+async def test_courses_sharing_enrolled_at_are_not_skipped():
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    supabase.tables["user_courses"] = [
+        {"id": f"id-{i}", "auth_id": "learner", "course_id": f"c{i}", "enrolled_at": "2024-01-01T00:00:00+00:00"}
+        for i in range(5)
+    ]
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        seen, cursor = [], None
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            while True:
+                params = {"limit": 2, "fields": "course_id", **({"before": cursor} if cursor else {})}
+                page = (await client.get("/user/learner/courses", params=params,
+                                         headers=auth_headers("learner"))).json()
+                seen += [row["course_id"] for row in page["courses"]]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+        await main.progress_buffer.stop()
+    assert seen == ["c4", "c3", "c2", "c1", "c0"]
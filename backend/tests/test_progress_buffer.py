@@ -0,0 +1,126 @@
+import asyncio
+import os
+import sys
+import pytest
+from contextlib import ExitStack
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from httpx import ASGITransport, AsyncClient
+
+from progress_buffer import ProgressBuffer
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+from benchmarks.harness import load_app
+from benchmarks.scenarios import seed_course, auth_headers
+
+
+def delta(set_mask=0, clear_mask=0, **extra):
+    return {"set_mask": set_mask, "clear_mask": clear_mask, "width": 4, "unit_numbers": [1, 2], **extra}
+
+
+@pytest.mark.asyncio
+async def test_updates_coalesced_per_course():
+    written = []
+    buffer = ProgressBuffer(write_rows=written.extend, flush_interval=60)
+
+    buffer.put("user-1", "course-a", delta(set_mask=0b0001, last_visited="1-0"))
+    buffer.put("user-1", "course-a", delta(set_mask=0b0010))
+    buffer.put("user-1", "course-a", delta(clear_mask=0b0001))
+    buffer.put("user-2", "course-a", delta(set_mask=0b1000))
+
+    assert await buffer.flush() == 2
+    rows = {(r["auth_id"], r["course_id"]): r for r in written}
+    row = rows[("user-1", "course-a")]
+    assert row["set_mask"] == 0b0010
+    assert row["clear_mask"] == 0b0001
+    assert row["last_visited"] == "1-0"
+    assert buffer.pending("user-1", "course-a") is None
+    await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeued_before_newer_deltas():
+    def failing_write(rows):
+        raise RuntimeError("network down")
+
+    buffer = ProgressBuffer(write_rows=failing_write, flush_interval=60)
+    buffer.put("user-1", "course-a", delta(set_mask=0b0001))
+    assert await buffer.flush() == 0
+    buffer.put("user-1", "course-a", delta(clear_mask=0b0001))
+
+    pending = buffer.pending("user-1", "course-a")
+    assert pending["set_mask"] == 0
+    assert pending["clear_mask"] == 0b0001
+
+    written = []
+    buffer._write_rows = written.extend
+    assert await buffer.flush() == 1
+    await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_pending():
+    written = []
+    buffer = ProgressBuffer(write_rows=written.extend, flush_interval=60)
+    buffer.put("user-1", "course-a", delta(set_mask=0b0001))
+    await buffer.stop()
+    assert len(written) == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_when_full():
+    written = []
+    buffer = ProgressBuffer(write_rows=written.extend, flush_interval=60, max_pending=2)
+    buffer.put("user-1", "course-a", delta(set_mask=0b0001))
+    buffer.put("user-2", "course-a", delta(set_mask=0b0001))
+    await asyncio.sleep(0.1)
+    assert len(written) == 2
+    await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_first_delta_keeps_legacy_completed_topics():
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        course_id = seed_course(main)
+        # Enrolled before the bitmap existed and not yet backfilled
+        supabase.tables["user_courses"] = [{"id": "row-1", "auth_id": "learner", "course_id": course_id,
+                                            "completed_topics": ["1-0", "2-1"], "completed_bitmap": None}]
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            response = await client.post("/update_progress/topic", headers=auth_headers("learner"), json={
+                "auth_id": "learner", "course_id": course_id, "topic_id": "1-1", "completed": True})
+        assert response.status_code == 200
+        await main.progress_buffer.stop()
+
+    ids, _ = main.topic_index(course_id)
+    row = supabase.tables["user_courses"][0]
+    assert main.topics_from_bitstring(row["completed_bitmap"], ids) == ["1-0", "1-1", "2-1"]
+    assert row["completed_topics"] == ["1-0", "1-1", "2-1"]
+
+
+@pytest.mark.asyncio
+async def test_course_completes_with_every_topic_and_passed_quiz():
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        course_id = seed_course(main)
+        ids, _ = main.topic_index(course_id)
+        supabase.tables["user_courses"] = [{"id": "row-1", "auth_id": "learner", "course_id": course_id,
+                                            "completed_topics": [], "completed_bitmap": None}]
+        supabase.tables["quiz_attempts"] = [{"auth_id": "learner", "course_id": course_id,
+                                             "unit_number": n, "attempt_number": 1, "passed": True}
+                                            for n in main.unit_numbers(course_id)]
+        row = supabase.tables["user_courses"][0]
+        completed = []
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            for topic_ids in (ids[:-1], ids, ids[:1]):
+                response = await client.post("/update_progress", headers=auth_headers("learner"), json={
+                    "auth_id": "learner", "course_id": course_id, "completed_topics": topic_ids})
+                assert response.status_code == 200
+                await main.progress_buffer.flush()
+                completed.append(row["is_completed"])
+        await main.progress_buffer.stop()
+
+    assert completed == [False, True, False]
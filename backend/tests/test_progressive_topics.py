@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import threading
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import progressive_topics
+from progressive_topics import partial_lesson, complete_lesson, needs_restart, start, launch, resume
+
+CONTEXT = {
+    "course_title": "Fractions",
+    "unit_title": "Halves",
+    "subtopic": "What is a half",
+    "skill_level": "Beginner",
+    "age_group": "Child",
+    "additional_context": "",
+}
+
+OPENING = {
+    "title": "What is a half",
+    "outline": ["Sharing fairly", "Writing one half", "Halves of shapes"],
+    "firstSection": {"heading": "Sharing fairly", "content": "Split it into two equal parts.", "videos": []},
+}
+
+REMAINDER = {
+    "sections": [
+        {"heading": "Writing one half", "content": "We write 1/2.", "videos": []},
+        {"heading": "Halves of shapes", "content": "Fold along the middle.", "videos": []},
+    ],
+    "quiz": [{"question": "Which is a half?", "options": ["1/2", "1/3"], "correctAnswerIndex": 0,
+              "explanation": "One of two equal parts.", "relatedSubtopic": ""}],
+    "firstSectionVideos": [{"url": "https://youtu.be/x", "title": "Halves"}],
+    "searchAttribution": "",
+}
+
+
+class FakeGenerator:
+    def __init__(self, result=REMAINDER):
+        self.result = result
+        self.calls = []
+
+    def generate_topic_remainder(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.result
+
+
+def _wait_idle(key, timeout=2.0):
+    deadline = time.time() + timeout
+    while progressive_topics.running(key) and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_partial_then_complete_lesson():
+    partial = partial_lesson(OPENING)
+    assert partial["status"] == "partial"
+    assert partial["sections"] == [OPENING["firstSection"]]
+    assert partial["pendingSections"] == ["Writing one half", "Halves of shapes"]
+    assert partial["quiz"] == []
+
+    lesson = complete_lesson(partial, REMAINDER)
+    assert lesson["status"] == "complete"
+    assert [s["heading"] for s in lesson["sections"]] == OPENING["outline"]
+    assert lesson["sections"][0]["videos"] == REMAINDER["firstSectionVideos"]
+    assert len(lesson["quiz"]) == 1
+    assert "pendingSections" not in lesson and "retryAfter" not in lesson
+
+
+def test_background_job_saves_complete_lesson():
+    saved = {}
+    generator = FakeGenerator()
+    assert launch(generator, saved.__setitem__, "c_topic_1_0.json", partial_lesson(OPENING), CONTEXT)
+    _wait_idle("c_topic_1_0.json")
+
+    assert saved["c_topic_1_0.json"]["status"] == "complete"
+    call = generator.calls[0]
+    assert call["outline"] == OPENING["outline"]
+    assert call["first_section"] == OPENING["firstSection"]
+    assert call["subtopic"] == "What is a half"
+
+
+def test_start_runs_one_job_per_lesson():
+    release = threading.Event()
+    runs = []
+
+    def job():
+        runs.append(1)
+        release.wait(2)
+
+    assert start("same.json", job)
+    assert not start("same.json", job)
+    release.set()
+    _wait_idle("same.json")
+    assert runs == [1]
+    assert not progressive_topics.running("same.json")
+
+
+def test_failed_job_keeps_partial_lesson_and_schedules_retry():
+    saved = {}
+    partial = partial_lesson(OPENING)
+    launch(FakeGenerator({"error": "503 UNAVAILABLE"}), saved.__setitem__, "fail.json", partial, CONTEXT)
+    _wait_idle("fail.json")
+
+    stored = saved["fail.json"]
+    assert stored["status"] == "partial"
+    assert stored["retryAfter"] <= time.time() + progressive_topics.RETRY_DELAY
+    assert not needs_restart("fail.json", stored)
+    assert needs_restart("fail.json", {**stored, "retryAfter": time.time() - 1})
+
+
+def test_resume_pushes_retry_time_out():
+    saved = {}
+    stale = {**partial_lesson(OPENING), "retryAfter": time.time() - 1}
+    assert needs_restart("stale.json", stale)
+
+    lesson = resume(FakeGenerator(), saved.__setitem__, "stale.json", stale, CONTEXT)
+    assert lesson["retryAfter"] > time.time()
+    _wait_idle("stale.json")
+    assert saved["stale.json"]["status"] == "complete"
+
+
+def test_complete_lessons_never_restart():
+    assert not needs_restart("done.json", {"title": "x", "sections": [], "quiz": []})
+
+
+@pytest.mark.asyncio
+async def test_polling_status_is_not_charged_as_generation(monkeypatch):
+    from contextlib import ExitStack
+    from httpx import ASGITransport, AsyncClient
+    from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+    from benchmarks.harness import load_app
+    from benchmarks.scenarios import seed_course
+
+    with ExitStack() as stack:
+        main = load_app(FakeGenaiClient(), FakeSupabase(), stack)
+        monkeypatch.setattr(main.progressive_topics, "PROGRESSIVE_TOPICS", True)
+        course_id = seed_course(main)
+        key = f"{course_id}_topic_1_0.json"
+        status_url = f"/topic_status/{course_id}/1/0"
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            before = await client.get(status_url)
+            started = await client.post("/generate_topic",
+                                        json={"courseId": course_id, "unitNumber": 1, "subtopicIndex": 0})
+            _wait_idle(key)
+            # More polls than /generate_topic's own limit or the shared budget would allow
+            polls = [await client.get(status_url, headers={"Accept-Encoding": "identity"}) for _ in range(250)]
+
+            # The lesson restarted, then its job died with another worker; the
+            # complete lesson's gzipped body must not be served in its place
+            main.save_topic(key, {**started.json(), "retryAfter": time.time() - 1})
+            stalled = await client.get(status_url)
+        await main.progress_buffer.stop()
+
+    assert before.status_code == 404
+    assert started.json()["status"] == "partial"
+    assert all(p.status_code == 200 for p in polls)
+    assert polls[-1].json()["status"] == "complete"
+    assert stalled.json()["stalled"] is True
@@ -0,0 +1,77 @@
+import os
+import sys
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import metrics
+import prompt_budget
+from prompt_budget import estimate_tokens, truncate, split_chunks, select_chunks, fit
+
+
+def filler(word: str, paragraphs: int) -> str:
+    return "\n\n".join(f"{word} " * 300 for _ in range(paragraphs))
+
+
+def test_short_input_is_untouched():
+    assert fit("Use pizza examples.", "course_plan", "additional_notes") == "Use pizza examples."
+    assert fit("anything", "unknown_task", "field") == "anything"
+
+
+def test_truncate_prefers_sentence_boundary():
+    text = "First sentence here. " * 100
+    cut = truncate(text, 50)
+    assert cut.endswith(". [...]")
+    assert estimate_tokens(cut) <= 55
+
+
+def test_chunks_respect_size():
+    chunks = split_chunks(filler("photosynthesis", 10), chunk_tokens=400)
+    assert len(chunks) > 1
+    assert all(len(c) <= 400 * 4 + 2 for c in chunks)
+
+
+def test_selection_keeps_relevant_chunks_in_order():
+    text = "\n\n".join([
+        "Course reader: table of contents.",
+        filler("weather", 3),
+        "Fractions describe parts of a whole; a fraction has a numerator and denominator. " * 15,
+        filler("geology", 3),
+        "Equivalent fractions: multiply numerator and denominator by the same number. " * 15,
+    ])
+    selected = select_chunks(text, 900, "fractions numerator denominator")
+
+    assert selected.startswith("Course reader")
+    assert "Fractions describe" in selected and "Equivalent fractions" in selected
+    assert selected.index("Fractions describe") < selected.index("Equivalent fractions")
+    assert "geology" not in selected
+    assert "[...]" in selected
+    assert estimate_tokens(selected) <= 900
+
+
+def test_fit_records_trimmed_tokens(monkeypatch):
+    monkeypatch.setitem(prompt_budget.PROMPT_BUDGETS, "unit_task", {"notes": 100})
+    before = metrics.PROMPT_TRIMMED_TOKENS.value("unit_task", "notes")
+    fitted = fit("word " * 2000, "unit_task", "notes")
+    assert estimate_tokens(fitted) <= 105
+    assert metrics.PROMPT_TRIMMED_TOKENS.value("unit_task", "notes") - before > 2000
+
+
+def test_course_prompt_stays_within_budget(monkeypatch):
+    from course_generator import CourseGenerator
+
+    captured = {}
+
+    def fake_generate_json(client, task, schema, contents):
+        captured["prompt"] = contents[0]
+        return {"courseTitle": "Fractions"}
+
+    monkeypatch.setattr("course_generator.generate_json", fake_generate_json)
+    generator = CourseGenerator.__new__(CourseGenerator)
+    generator.client = None
+    materials = filler("fractions", 400)  # ~30k tokens
+    generator.generate_course("Fractions", "Beginner", "Child", materials_text=materials)
+
+    budget = prompt_budget.PROMPT_BUDGETS["course_plan"]["materials_text"]
+    assert estimate_tokens(captured["prompt"]) < budget + 1000
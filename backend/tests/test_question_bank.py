@@ -0,0 +1,100 @@
+import os
+import sys
+import random
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import question_bank
+from question_bank import allocate, assemble, bank_rows, build_retake, question_id
+
+SUBTOPICS = ["Atoms", "Moles", "Bonds"]
+CONTEXT = {
+    "course_title": "Chemistry", "unit_title": "Basics", "unit_description": "",
+    "subtopics": SUBTOPICS, "skill_level": "Beginner", "age_group": "Adult",
+}
+
+
+def make_quiz(prefix, mcq_per_subtopic, frq_per_subtopic, subtopics=SUBTOPICS):
+    return {
+        "title": "Quiz",
+        "multipleChoice": [{"question": f"{prefix} {s} MCQ {i}?", "options": ["a", "b"], "correctAnswerIndex": 0,
+                            "explanation": "", "relatedSubtopic": s}
+                           for s in subtopics for i in range(mcq_per_subtopic)],
+        "freeResponse": [{"question": f"{prefix} {s} FRQ {i}", "sampleAnswer": "", "keyPoints": [],
+                          "maxPoints": 3, "relatedSubtopic": s}
+                         for s in subtopics for i in range(frq_per_subtopic)],
+    }
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.calls = []
+
+    def generate_module_quiz(self, subtopics, previous_weakness_data=None, **kwargs):
+        self.calls.append(subtopics)
+        return make_quiz(f"new{len(self.calls)}", 4, 1, subtopics)
+
+
+@pytest.fixture
+def banked(monkeypatch):
+    deposited = []
+    monkeypatch.setattr(question_bank, "deposit", lambda course_id, unit, quiz: deposited.append(quiz))
+    return deposited
+
+
+def test_allocation_leans_toward_weak_subtopics():
+    counts = allocate(SUBTOPICS, {"weak_subtopics": {"Moles": 0.2}}, 10)
+    assert sum(counts.values()) == 10
+    assert counts["Moles"] > counts["Atoms"] and counts["Moles"] > counts["Bonds"]
+    assert allocate(SUBTOPICS, None, 9) == {"Atoms": 3, "Moles": 3, "Bonds": 3}
+
+
+def test_question_id_is_stable_and_content_based():
+    q = {"question": "What is a mole?", "options": ["a", "b"], "explanation": "x"}
+    assert question_id("mcq", q) == question_id("mcq", {**q, "explanation": "y"})
+    assert question_id("mcq", q) != question_id("frq", q)
+
+
+def test_assemble_uses_only_unseen_questions():
+    rows = bank_rows("c", 1, make_quiz("old", 6, 2))
+    seen = {r["id"] for r in rows[:3]}
+    quiz, exhausted = assemble(rows, seen, SUBTOPICS, {"weak_subtopics": {"Bonds": 0.4}}, "Retake",
+                               random.Random(1))
+    assert exhausted == []
+    assert len(quiz["multipleChoice"]) == 10
+    assert len(quiz["freeResponse"]) == 2
+    seen_questions = {r["question"]["question"] for r in rows[:3]}
+    assert not seen_questions & {q["question"] for q in quiz["multipleChoice"]}
+
+
+def test_retake_served_from_bank_without_llm(banked):
+    generator = FakeGenerator()
+    rows = bank_rows("c", 1, make_quiz("old", 6, 2))
+    quiz = build_retake(generator, "c", 1, CONTEXT, None, rows, set(), random.Random(0))
+    assert generator.calls == []
+    assert len(quiz["multipleChoice"]) == 10
+
+
+def test_exhausted_subtopic_is_topped_up(banked):
+    generator = FakeGenerator()
+    rows = bank_rows("c", 1, make_quiz("old", 6, 2))
+    # Every Moles question has been seen already
+    seen = {r["id"] for r in rows if r["subtopic"] == "Moles"}
+    quiz = build_retake(generator, "c", 1, CONTEXT, {"weak_subtopics": {"Moles": 0.3}, "last_score": 50},
+                        rows, seen, random.Random(0))
+
+    assert generator.calls == [["Moles"]]
+    assert len(banked) == 1
+    moles = [q for q in quiz["multipleChoice"] if q["relatedSubtopic"] == "Moles"]
+    assert moles and all(q["question"].startswith("new1") for q in moles)
+
+
+def test_failed_top_up_returns_error(banked):
+    class Failing(FakeGenerator):
+        def generate_module_quiz(self, subtopics, previous_weakness_data=None, **kwargs):
+            return {"error": "503 UNAVAILABLE"}
+
+    assert build_retake(Failing(), "c", 1, CONTEXT, None, [], set()) == {"error": "503 UNAVAILABLE"}
+    assert banked == []
@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import pytest
+import jwt
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+from slowapi import Limiter, _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import rate_limit
+from rate_limit import SQLiteStorage, rate_limit_key, request_cost
+
+
+def make_token(sub="user-1", secret="test-secret-key-for-rate-limit-tests", **claims):
+    payload = {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + 3600, **claims}
+    return jwt.encode(payload, secret, algorithm="HS256")
+
+
+def test_sqlite_counters_are_shared_between_instances(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    first, second = SQLiteStorage(uri), SQLiteStorage(uri)
+    assert first.incr("k", 60, amount=5) == 5
+    assert second.incr("k", 60, amount=3) == 8
+    assert first.get("k") == 8
+    assert second.get_expiry("k") > time.time()
+    second.clear("k")
+    assert first.get("k") == 0
+
+
+def test_sqlite_counter_restarts_after_window(tmp_path):
+    storage = SQLiteStorage(f"sqlite:///{tmp_path / 'limits.db'}")
+    storage.incr("k", 1, amount=4)
+    time.sleep(1.05)
+    assert storage.get("k") == 0
+    assert storage.incr("k", 1, amount=2) == 2
+
+
+@pytest.mark.asyncio
+async def test_key_prefers_verified_user(monkeypatch):
+    monkeypatch.setenv("SUPABASE_SECRET_KEY", "test-secret-key-for-rate-limit-tests")
+    app = FastAPI()
+    keys = {}
+
+    @app.get("/whoami")
+    async def whoami(request: Request):
+        keys["key"] = rate_limit_key(request)
+        return {}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/whoami", headers={"Authorization": f"Bearer {make_token('abc')}"})
+        assert keys["key"] == "user:abc"
+        # A forged token doesn't get its own bucket
+        forged = make_token("abc", secret="wrong-secret-key-for-rate-limit-tests")
+        await client.get("/whoami", headers={"Authorization": f"Bearer {forged}"})
+        assert keys["key"].startswith("ip:")
+        client.cookies.set("access_token", make_token("def"))
+        await client.get("/whoami")
+        assert keys["key"] == "user:def"
+
+
+@pytest.mark.asyncio
+async def test_weighted_budget_is_exhausted_by_expensive_route(tmp_path, monkeypatch):
+    monkeypatch.setenv("SUPABASE_SECRET_KEY", "test-secret-key-for-rate-limit-tests")
+    monkeypatch.setattr(rate_limit, "COSTS", {"/expensive": 6})
+    limiter = Limiter(key_func=rate_limit_key, storage_uri=f"sqlite:///{tmp_path / 'limits.db'}")
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    @app.get("/expensive")
+    @limiter.shared_limit("10/minute", scope="budget", cost=request_cost)
+    async def expensive(request: Request):
+        return {}
+
+    @app.get("/cheap")
+    @limiter.shared_limit("10/minute", scope="budget", cost=request_cost)
+    async def cheap(request: Request):
+        return {}
+
+    alice = {"Authorization": f"Bearer {make_token('alice')}"}
+    bob = {"Authorization": f"Bearer {make_token('bob')}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/expensive", headers=alice)).status_code == 200
+        assert (await client.get("/cheap", headers=alice)).status_code == 200
+        # 6 + 1 used; another expensive call would take alice to 13
+        assert (await client.get("/expensive", headers=alice)).status_code == 429
+        # Fixed windows charge rejected hits too, so alice waits out the window
+        assert (await client.get("/cheap", headers=alice)).status_code == 429
+        # Same address, different user: separate budget
+        assert (await client.get("/expensive", headers=bob)).status_code == 200
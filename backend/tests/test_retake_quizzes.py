@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import pytest
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+from benchmarks.harness import load_app
+from benchmarks.scenarios import seed_course, auth_headers
+import retake_quizzes
+from retake_quizzes import ready
+
+
+def test_prefetched_retake_only_matches_latest_attempt():
+    stored = {"basedOnAttempt": 2, "quiz": {"title": "Retake"}}
+    assert ready(stored, [{"attempt_number": 2}, {"attempt_number": 1}]) == {"title": "Retake"}
+    assert ready(stored, [{"attempt_number": 3}]) is None
+    assert ready(stored, None) is None
+    assert ready(None, [{"attempt_number": 2}]) is None
+
+
+def _quiz_generations(genai):
+    return sum(1 for call in genai.calls if call["task"] == "ModuleQuizContent")
+
+
+@pytest.mark.asyncio
+async def test_failed_attempt_prefetches_retake():
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    auth_id = "00000000-0000-0000-0000-000000000042"
+    payload = genai._payload
+
+    def fresh_questions(task, prompt=""):
+        # Each generation writes different questions, so the retake is a different quiz
+        text = payload(task, prompt)
+        return text.replace("?", f" (set {_quiz_generations(genai)})?") if task == "ModuleQuizContent" else text
+    genai._payload = fresh_questions
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        course_id = seed_course(main)
+        headers = auth_headers(auth_id)
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test",
+                               headers=headers) as client:
+            quiz = (await client.post("/generate_module_quiz",
+                                      json={"courseId": course_id, "unitNumber": 1})).json()
+            response = await client.post("/evaluate_module_quiz", json={
+                "courseId": course_id, "unitNumber": 1, "auth_id": auth_id,
+                "mcqAnswers": [-1] * len(quiz["multipleChoice"]),
+                "frqAnswers": [""] * len(quiz["freeResponse"]),
+            })
+            assert response.json()["passed"] is False
+
+            retake_quizzes = main.retake_quizzes
+            key = retake_quizzes.retake_filename(course_id, 1, auth_id)
+            deadline = time.time() + 5
+            while retake_quizzes.pending(key) and time.time() < deadline:
+                time.sleep(0.01)
+            assert _quiz_generations(genai) == 2
+
+            retake = await client.post("/generate_module_quiz",
+                                       json={"courseId": course_id, "unitNumber": 1,
+                                             "retake": True, "auth_id": auth_id})
+            generations = _quiz_generations(genai)
+            mastery = (await client.get(f"/mastery/{course_id}", params={"auth_id": auth_id})).json()
+            shared = (await client.post("/generate_module_quiz",
+                                        json={"courseId": course_id, "unitNumber": 1})).json()
+            answers = {"mcqAnswers": [0] * len(retake.json()["multipleChoice"]),
+                       "frqAnswers": ["x"] * len(retake.json()["freeResponse"])}
+            graded = (await client.post("/evaluate_module_quiz", json={
+                "courseId": course_id, "unitNumber": 1, "auth_id": auth_id,
+                "quizVersion": retake.json()["quizVersion"], **answers})).json()
+        await main.progress_buffer.stop()
+
+    assert retake.status_code == 200
+    assert retake.json()["quizVersion"]
+    # The learner's retake doesn't replace the quiz everyone else takes, and is graded against itself
+    assert shared["quizVersion"] == quiz["quizVersion"] != retake.json()["quizVersion"]
+    assert graded["quizVersion"] == retake.json()["quizVersion"]
+    assert [r["question"] for r in graded["mcqResults"]] == \
+        [q["question"] for q in retake.json()["multipleChoice"]]
+    # Served from the prefetch, not generated again
+    assert generations == 2
+    # Every answer was wrong, so each quizzed subtopic is below the prior and recommended
+    assert mastery["subtopics"] and all(s["mastery"] < 0.3 for s in mastery["subtopics"])
+    assert mastery["recommended"]
+
+
+@pytest.fixture
+def one_worker(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(retake_quizzes, "_executor", executor)
+    release = threading.Event()
+    saved = {}
+
+    def job(generator, save, course_id, unit_number, auth_id, *args):
+        release.wait(5)
+        stored = {"basedOnAttempt": 1, "quiz": {"title": auth_id}}
+        key = retake_quizzes.retake_filename(course_id, unit_number, auth_id)
+        with retake_quizzes._lock:
+            if key in retake_quizzes._abandoned:
+                return None
+        save(key, stored)
+        return stored
+
+    monkeypatch.setattr(retake_quizzes, "prefetch", job)
+    yield lambda auth_id: retake_quizzes.schedule(None, saved.__setitem__, "c", 1, auth_id, {}, 1, None), \
+        release, saved
+    release.set()
+    executor.shutdown(wait=True)
+
+
+@pytest.mark.asyncio
+async def test_queued_prefetch_is_cancelled_and_slow_one_abandoned(one_worker):
+    schedule, release, saved = one_worker
+    assert schedule("running") and schedule("queued")
+    time.sleep(0.05)
+
+    # Still waiting for a worker: cancelled, the request builds the retake itself
+    assert await retake_quizzes.wait(retake_quizzes.retake_filename("c", 1, "queued")) is None
+    assert retake_quizzes._queued == 0
+    # Running but too slow: given up on, and its late result isn't saved over the inline one
+    key = retake_quizzes.retake_filename("c", 1, "running")
+    assert await retake_quizzes.wait(key, timeout=0.05) is None
+    release.set()
+    await asyncio.sleep(0.1)
+    assert saved == {}
+    assert retake_quizzes.pending(key) is None
+
+
+def test_prefetches_dropped_when_queue_is_full(one_worker, monkeypatch):
+    schedule, release, _ = one_worker
+    monkeypatch.setattr(retake_quizzes, "MAX_QUEUED", 1)
+    assert schedule("a")
+    time.sleep(0.05)
+    assert schedule("b")
+    assert not schedule("c")
+    release.set()
@@ -0,0 +1,59 @@
+import os
+import sys
+import pytest
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import startup
+from startup import Readiness, run_check
+
+
+@pytest.fixture(autouse=True)
+def fresh_readiness(monkeypatch):
+    monkeypatch.setattr(startup, "readiness", Readiness())
+
+
+@pytest.mark.asyncio
+async def test_check_success_marks_ready():
+    await run_check("bucket", lambda: None)
+    assert startup.readiness.ready
+    assert startup.readiness.report()["checks"]["bucket"]["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_check_retries_then_succeeds():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("storage unreachable")
+
+    await run_check("bucket", flaky, attempts=5, base_delay=0.001)
+    assert len(calls) == 3
+    assert startup.readiness.ready
+
+
+@pytest.mark.asyncio
+async def test_check_failure_is_reported():
+    def down():
+        raise ConnectionError("storage unreachable")
+
+    await run_check("bucket", down, attempts=2, base_delay=0.001)
+    report = startup.readiness.report()
+    assert not report["ready"]
+    assert report["checks"]["bucket"] == {"status": "error", "error": "storage unreachable", "attempts": 2}
+
+
+def test_pending_check_is_not_ready():
+    startup.readiness.register("bucket")
+    assert not startup.readiness.ready
+
+
+def test_importing_main_defers_sdks_and_network():
+    from benchmarks.startup import time_import
+
+    result = time_import()
+    assert not result["genai_loaded"]
+    assert not result["supabase_loaded"]
@@ -0,0 +1,46 @@
+import os
+import sys
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from topic_bitmap import (
+    topic_ids, topic_positions, mask_for, to_bitstring, from_bitstring,
+    topics_from_bitstring, merge_masks,
+)
+
+PLAN = {
+    "units": [
+        {"unitNumber": 1, "subtopics": ["Topic A", "Topic B"]},
+        {"unitNumber": 2, "subtopics": ["Topic C"]},
+    ]
+}
+
+
+def test_topic_ids_in_plan_order():
+    assert topic_ids(PLAN) == ["1-0", "1-1", "2-0"]
+
+
+def test_duplicates_and_unknown_ids_ignored():
+    positions = topic_positions(topic_ids(PLAN))
+    mask = mask_for(["1-0", "1-0", "9-9", "2-0"], positions)
+    assert mask == 0b101
+    assert bin(mask).count("1") == 2
+
+
+def test_bitstring_roundtrip():
+    ids = topic_ids(PLAN)
+    bits = to_bitstring(0b101, len(ids))
+    assert bits == "101"
+    assert from_bitstring(bits) == 0b101
+    assert topics_from_bitstring(bits, ids) == ["1-0", "2-0"]
+
+
+def test_merge_masks_later_delta_wins():
+    # complete topic 0, then un-complete it, then complete topic 1
+    merged = merge_masks(merge_masks((0b01, 0), (0, 0b01)), (0b10, 0))
+    assert merged == (0b10, 0b01)
+
+    stored = 0b01
+    set_mask, clear_mask = merged
+    assert (stored | set_mask) & ~clear_mask == 0b10
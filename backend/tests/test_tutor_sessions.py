@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import pytest
+from contextlib import ExitStack
+from types import SimpleNamespace
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import llm
+import quiz_helper
+import tutor_sessions
+from quiz_helper import QuizHelper
+from tutor_sessions import SessionStore, TutorSession, KEEP_RECENT_MESSAGES
+from httpx import ASGITransport, AsyncClient
+from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+from benchmarks.harness import load_app
+from benchmarks.scenarios import seed_course
+
+QUESTION = {"question": "What is 2 + 2?", "options": ["3", "4", "5", "22"]}
+KEY = ("course-1", 1, 0, "mcq")
+
+
+class RecordingClient:
+    """Fake genai client that records every request it receives."""
+
+    def __init__(self):
+        self.requests = []
+        self.caches_created = []
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+        self.caches = SimpleNamespace(create=self.create_cache)
+
+    def generate_content(self, model, contents=None, config=None):
+        self.requests.append({"model": model, "contents": contents, "config": config})
+        if isinstance(contents, list) and contents and isinstance(contents[0], str):
+            return SimpleNamespace(text="Student knows addition basics.", usage_metadata=None)
+        return SimpleNamespace(text="What happens when you count two more from two?", usage_metadata=None)
+
+    def create_cache(self, model, config=None):
+        self.caches_created.append(model)
+        return SimpleNamespace(name=f"cachedContents/{len(self.caches_created)}")
+
+
+def make_helper():
+    helper = QuizHelper.__new__(QuizHelper)
+    helper.client = RecordingClient()
+    helper._context_caches = {}
+    helper._cache_lock = quiz_helper.threading.Lock()
+    return helper
+
+
+def wait_for_compaction(session: TutorSession):
+    for _ in range(200):
+        if not session.summarizing:
+            return
+        time.sleep(0.01)
+    raise AssertionError("compaction did not finish")
+
+
+def test_store_returns_session_for_same_question_only():
+    store = SessionStore()
+    session = store.create(*KEY)
+    assert store.get(session.id, *KEY) is session
+    assert store.get(session.id, "course-1", 1, 1, "mcq") is None
+    assert store.get("unknown", *KEY) is None
+
+
+def test_store_expires_idle_sessions():
+    store = SessionStore(ttl=0)
+    session = store.create(*KEY)
+    time.sleep(0.01)
+    assert store.get(session.id, *KEY) is None
+    assert len(store) == 0
+
+
+def test_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2)
+    first = store.create(*KEY)
+    second = store.create(*KEY)
+    store.get(first.id, *KEY)
+    store.create(*KEY)
+    assert store.get(first.id, *KEY) is first
+    assert store.get(second.id, *KEY) is None
+
+
+def test_compaction_waits_for_token_threshold(monkeypatch):
+    monkeypatch.setattr(tutor_sessions, "SUMMARY_TRIGGER_TOKENS", 10_000)
+    session = TutorSession("s", *KEY)
+    for i in range(10):
+        session.append(f"question {i}", f"hint {i}")
+    assert session.start_compaction() is None
+
+
+def test_compaction_keeps_recent_turns(monkeypatch):
+    monkeypatch.setattr(tutor_sessions, "SUMMARY_TRIGGER_TOKENS", 1)
+    session = TutorSession("s", *KEY)
+    for i in range(5):
+        session.append(f"question {i}", f"hint {i}")
+    folded = session.start_compaction()
+    assert len(folded) == 10 - KEEP_RECENT_MESSAGES
+    assert session.start_compaction() is None  # already running
+
+    session.append("late question", "late hint")
+    session.finish_compaction(len(folded), "summary")
+    summary, turns = session.snapshot()
+    assert summary == "summary"
+    assert turns[0]["text"] == "question 2"
+    assert turns[-1]["text"] == "late hint"
+
+
+def test_failed_summary_keeps_history(monkeypatch):
+    monkeypatch.setattr(tutor_sessions, "SUMMARY_TRIGGER_TOKENS", 1)
+    session = TutorSession("s", *KEY)
+    for i in range(5):
+        session.append(f"question {i}", f"hint {i}")
+    folded = session.start_compaction()
+    session.finish_compaction(len(folded), None)
+    assert len(session.snapshot()[1]) == 10
+    assert not session.summarizing
+
+
+def test_session_prompt_stays_bounded(monkeypatch):
+    monkeypatch.setattr(tutor_sessions, "SUMMARY_TRIGGER_TOKENS", 40)
+    helper = make_helper()
+    session = TutorSession("s", *KEY)
+
+    for turn in range(12):
+        helper.session_help(session, QUESTION, "mcq", f"I'm stuck, hint {turn}?", "Beginner", "Child")
+        wait_for_compaction(session)
+
+    tutor_requests = [r for r in helper.client.requests if not isinstance(r["contents"][0], str)]
+    last = tutor_requests[-1]["contents"]
+    assert last[0].parts[0].text.startswith("Summary of our conversation so far:")
+    # summary + recent turns + the new message, however long the session ran
+    assert len(last) <= KEEP_RECENT_MESSAGES + 4
+    assert session.summary == "Student knows addition basics."
+
+
+def test_context_cache_is_shared_per_prompt(monkeypatch):
+    monkeypatch.setattr(quiz_helper, "CONTEXT_CACHE_MIN_TOKENS", 0)
+    helper = make_helper()
+    for i in range(3):
+        session = TutorSession(f"s{i}", *KEY)
+        helper.session_help(session, QUESTION, "mcq", "help?", "Beginner", "Child")
+
+    assert len(helper.client.caches_created) == 1
+    config = helper.client.requests[-1]["config"]
+    assert config.cached_content == "cachedContents/1"
+    assert config.system_instruction is None
+
+
+def test_cached_context_retries_on_the_cache_model(monkeypatch):
+    monkeypatch.setattr(quiz_helper, "CONTEXT_CACHE_MIN_TOKENS", 0)
+    monkeypatch.setattr(llm, "BACKOFF_BASE", 0.01)
+    helper = make_helper()
+    respond = helper.client.models.generate_content
+    failures = [ConnectionError("503 Service Unavailable")]
+
+    def flaky(model, contents=None, config=None):
+        if failures:
+            helper.client.requests.append({"model": model, "config": config})
+            raise failures.pop()
+        return respond(model, contents, config)
+    helper.client.models.generate_content = flaky
+
+    session = TutorSession("s", *KEY)
+    helper.session_help(session, QUESTION, "mcq", "help?", "Beginner", "Child")
+
+    first, retry = helper.client.requests
+    assert retry["model"] == first["model"] == helper.client.caches_created[0]
+    assert retry["config"].cached_content == first["config"].cached_content
+
+
+def test_small_prompt_is_sent_inline():
+    helper = make_helper()
+    helper.text_help(QUESTION, "mcq", [], "help?", "Beginner", "Child")
+    assert helper.client.caches_created == []
+    assert "Socratic tutor" in helper.client.requests[0]["config"].system_instruction
+
+
+@pytest.mark.asyncio
+async def test_expired_session_is_told_apart_from_missing_question():
+    genai, supabase = FakeGenaiClient(), FakeSupabase()
+    with ExitStack() as stack:
+        main = load_app(genai, supabase, stack)
+        course_id = seed_course(main)
+        help_request = {"courseId": course_id, "unitNumber": 1, "questionIndex": 0,
+                        "questionType": "mcq", "studentMessage": "Hint please?"}
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            await client.post("/generate_module_quiz", json={"courseId": course_id, "unitNumber": 1})
+            expired = await client.post("/quiz_help/text", json={**help_request, "sessionId": "gone"})
+            missing = await client.post("/quiz_help/text", json={**help_request, "questionIndex": 99,
+                                                                 "sessionId": "gone"})
+        await main.progress_buffer.stop()
+
+    assert expired.status_code == 410
+    assert expired.json()["detail"] == "session_expired"
+    assert missing.status_code == 404
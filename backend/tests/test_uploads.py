@@ -0,0 +1,155 @@
+import io
+import os
+import sys
+import pytest
+from types import SimpleNamespace
+from contextlib import ExitStack
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile, Headers
+
+# Add backend to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import metrics
+import uploads
+from uploads import is_text_upload, check_upload_size, read_text_upload, upload_to_gemini
+
+
+def make_upload(data: bytes, filename: str, content_type: str) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=len(data), filename=filename,
+                      headers=Headers({"content-type": content_type}))
+
+
+def test_text_detection():
+    assert is_text_upload(make_upload(b"", "notes.bin", "text/markdown"))
+    assert is_text_upload(make_upload(b"", "data.csv", "application/octet-stream"))
+    assert not is_text_upload(make_upload(b"", "slides.pdf", "application/pdf"))
+
+
+def test_size_cap():
+    upload = make_upload(b"x" * 2048, "big.pdf", "application/pdf")
+    assert check_upload_size(upload, max_bytes=4096) == 2048
+    with pytest.raises(HTTPException) as exc:
+        check_upload_size(upload, max_bytes=1024)
+    assert exc.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_text_is_decoded_across_chunks(monkeypatch):
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 3)
+    text = "Fractions: ½ and ¼ — naïve café"
+    upload = make_upload(text.encode("utf-8"), "notes.txt", "text/plain")
+    assert await read_text_upload(upload) == text
+
+
+@pytest.mark.asyncio
+async def test_text_is_truncated():
+    upload = make_upload(b"a" * 10_000, "notes.txt", "text/plain")
+    text = await read_text_upload(upload, max_chars=100)
+    assert text.startswith("a" * 100)
+    assert "omitted" in text
+    assert len(text) < 200
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [3, 100, 4096])
+async def test_truncation_boundary(monkeypatch, chunk_size):
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", chunk_size)
+    exact = make_upload(b"a" * 100, "notes.txt", "text/plain")
+    assert await read_text_upload(exact, max_chars=100) == "a" * 100
+    over = make_upload(b"a" * 101, "notes.txt", "text/plain")
+    assert await read_text_upload(over, max_chars=100) == "a" * 100 + "\n[... remainder of the file omitted ...]"
+
+
+def test_binary_upload_streams_file_object():
+    received = {}
+
+    def upload(file, config):
+        received["file"], received["config"] = file, config
+        return SimpleNamespace(name="files/1", uri="https://files/1", mime_type=config["mime_type"])
+
+    client = SimpleNamespace(files=SimpleNamespace(upload=upload))
+    pdf = make_upload(b"%PDF-1.7 ...", "slides.pdf", "application/pdf")
+    uploaded = upload_to_gemini(client, pdf)
+    assert received["file"] is pdf.file  # streamed from the spool, never read into memory here
+    assert uploaded.mime_type == "application/pdf"
+
+
+def test_peak_rss_sampler_records_growth():
+    if metrics.rss_bytes() is None:
+        pytest.skip("RSS not available on this platform")
+    with metrics.PeakRssSampler("/test") as rss:
+        blob = bytearray(64 * 1024 * 1024)
+        blob[::4096] = b"x" * len(blob[::4096])
+        del blob
+    assert rss.growth > 32 * 1024 * 1024
+    assert metrics.REQUEST_PEAK_RSS.count("/test") == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_course_with_uploads():
+    from httpx import ASGITransport, AsyncClient
+    from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+    from benchmarks.harness import load_app
+
+    genai = FakeGenaiClient()
+    deleted = []
+    genai.files.delete = lambda name: deleted.append(name)
+    form = {"topic": "Fractions", "skill_level": "Beginner", "age_group": "Child"}
+    with ExitStack() as stack:
+        main = load_app(genai, FakeSupabase(), stack)
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            text = await client.post("/generate_course", data=form,
+                                     files={"file": ("notes.md", b"# Halves\nA half is one of two equal parts.",
+                                                     "text/markdown")})
+            pdf = await client.post("/generate_course", data=form,
+                                    files={"file": ("slides.pdf", b"%PDF-1.7 fake", "application/pdf")})
+            stack.enter_context(pytest.MonkeyPatch.context()).setattr(uploads, "MAX_UPLOAD_BYTES", 8)
+            too_big = await client.post("/generate_course", data=form,
+                                        files={"file": ("slides.pdf", b"%PDF-1.7 fake", "application/pdf")})
+        await main.progress_buffer.stop()
+
+    assert text.status_code == 200 and "course_id" in text.json()
+    assert pdf.status_code == 200
+    assert len(deleted) == 1
+    assert too_big.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_upload_does_not_block_other_requests():
+    import asyncio
+    import time
+    from httpx import ASGITransport, AsyncClient
+    from benchmarks.fakes import FakeGenaiClient, FakeSupabase
+    from benchmarks.harness import load_app
+    from benchmarks.scenarios import seed_course
+
+    genai = FakeGenaiClient()
+    upload, finished = genai.files.upload, {}
+
+    def slow_upload(**kwargs):
+        time.sleep(0.5)
+        finished["upload"] = time.monotonic()
+        return upload(**kwargs)
+
+    genai.files.upload = slow_upload
+    form = {"topic": "Fractions", "skill_level": "Beginner", "age_group": "Child"}
+    with ExitStack() as stack:
+        main = load_app(genai, FakeSupabase(), stack)
+        course_id = seed_course(main)
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://test") as client:
+            async def read_course():
+                await asyncio.sleep(0.1)
+                response = await client.get(f"/course/{course_id}")
+                finished["course"] = time.monotonic()
+                return response
+
+            pdf, course = await asyncio.gather(
+                client.post("/generate_course", data=form,
+                            files={"file": ("slides.pdf", b"%PDF-1.7 fake", "application/pdf")}),
+                read_course(),
+            )
+        await main.progress_buffer.stop()
+
+    assert pdf.status_code == 200 and course.status_code == 200
+    assert finished["course"] < finished["upload"]
@@ -0,0 +1,92 @@
+from typing import Dict, List, Iterable, Tuple
+
+# Completed topics are stored as a bit string with one bit per subtopic, in
+# course plan order: position 0 is the first subtopic of the first unit.
+# Topic ids keep the frontend's "unitNumber-subtopicIndex" format.
+
+
+def topic_ids(course_plan: dict) -> List[str]:
+    """All topic ids of a course, in bitmap position order."""
+    ids = []
+    for unit in course_plan.get("units", []):
+        for i in range(len(unit.get("subtopics", []))):
+            ids.append(f"{unit.get('unitNumber')}-{i}")
+    return ids
+
+
+def topic_positions(ids: List[str]) -> Dict[str, int]:
+    return {topic_id: i for i, topic_id in enumerate(ids)}
+
+
+def mask_for(topics: Iterable[str], positions: Dict[str, int]) -> int:
+    """Bit mask of the given topics. Unknown and duplicate ids are ignored."""
+    mask = 0
+    for topic_id in topics:
+        position = positions.get(topic_id)
+        if position is not None:
+            mask |= 1 << position
+    return mask
+
+
+def to_bitstring(mask: int, width: int) -> str:
+    return "".join("1" if mask >> i & 1 else "0" for i in range(width))
+
+
+def from_bitstring(bits: str) -> int:
+    mask = 0
+    for i, bit in enumerate(bits):
+        if bit == "1":
+            mask |= 1 << i
+    return mask
+
+
+def topics_from_bitstring(bits: str, ids: List[str]) -> List[str]:
+    return [ids[i] for i, bit in enumerate(bits) if bit == "1" and i < len(ids)]
+
+
+def merge_masks(previous: Tuple[int, int], update: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Combine two (set_mask, clear_mask) deltas so the later one wins per bit.
+
+    Applying the result is equivalent to applying `previous` then `update`.
+    """
+    prev_set, prev_clear = previous
+    upd_set, upd_clear = update
+    return (prev_set & ~upd_clear) | upd_set, (prev_clear & ~upd_set) | upd_clear
+
+
+def migrate_completed_topics(batch_size: int = 200) -> int:
+    """
+    Backfill completed_bitmap from the legacy completed_topics lists.
+
+    Run after sql/progress_bitmap.sql. Safe to rerun: only rows without a
+    bitmap are touched.
+    """
+    from database import supabase
+    from course_cache import get_course_data
+
+    migrated = 0
+    offset = 0
+    while True:
+        rows = supabase.table("user_courses").select("id,course_id,completed_topics").is_(
+            "completed_bitmap", "null"
+        ).order("id").range(offset, offset + batch_size - 1).execute().data
+        if not rows:
+            break
+        for row in rows:
+            course_data = get_course_data(row["course_id"])
+            if not course_data:
+                # Course no longer exists; leave the row for manual cleanup
+                offset += 1
+                continue
+            ids = topic_ids(course_data.get("course_plan", {}))
+            mask = mask_for(row.get("completed_topics") or [], topic_positions(ids))
+            supabase.table("user_courses").update({
+                "completed_bitmap": to_bitstring(mask, len(ids))
+            }).eq("id", row["id"]).execute()
+            migrated += 1
+    return migrated
+
+
+if __name__ == '__main__':
+    print(f"Migrated {migrate_completed_topics()} enrollments to completed_bitmap")
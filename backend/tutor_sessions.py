@@ -0,0 +1,114 @@
+"""
+Server-side state for Socratic tutor conversations.
+
+The client sends a session id and only its new message; turns are kept here.
+Once the stored turns grow past SUMMARY_TRIGGER_TOKENS, the oldest ones are
+folded into a running summary in the background so the prompt sent to Gemini
+(and therefore turn latency) stays roughly constant over a long session.
+
+Sessions live in process memory with an idle TTL. A request for a session
+this worker doesn't know (expired, evicted or held by another worker) gets a
+410 with detail "session_expired" (main.quiz_help_text) and the client
+re-seeds it with its local history.
+"""
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from prompt_budget import estimate_tokens
+
+SESSION_TTL = int(os.getenv("TUTOR_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("TUTOR_MAX_SESSIONS", "5000"))
+SUMMARY_TRIGGER_TOKENS = int(os.getenv("TUTOR_SUMMARY_TOKENS", "1500"))
+# Most recent messages always sent verbatim (3 exchanges)
+KEEP_RECENT_MESSAGES = 6
+
+
+class TutorSession:
+    def __init__(self, session_id: str, course_id: str, unit_number: int,
+                 question_index: int, question_type: str, history: Optional[List[dict]] = None):
+        self.id = session_id
+        self.key = (course_id, unit_number, question_index, question_type)
+        self.summary = ""
+        self.turns: List[dict] = list(history or [])
+        self.summarizing = False
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+    def snapshot(self):
+        """(summary, turns) to build the next prompt from."""
+        with self.lock:
+            return self.summary, list(self.turns)
+
+    def append(self, user_text: str, model_text: str) -> None:
+        with self.lock:
+            self.turns.append({"role": "user", "text": user_text})
+            self.turns.append({"role": "model", "text": model_text})
+
+    def start_compaction(self) -> Optional[List[dict]]:
+        """
+        Claim the turns to fold into the summary, or None if the session is
+        still short or another compaction is running.
+        """
+        with self.lock:
+            if self.summarizing or len(self.turns) <= KEEP_RECENT_MESSAGES:
+                return None
+            tokens = estimate_tokens(self.summary) + sum(estimate_tokens(t["text"]) for t in self.turns)
+            if tokens <= SUMMARY_TRIGGER_TOKENS:
+                return None
+            self.summarizing = True
+            return list(self.turns[:-KEEP_RECENT_MESSAGES])
+
+    def finish_compaction(self, folded: int, summary: Optional[str]) -> None:
+        """Replace the first `folded` turns with `summary` (None if summarizing failed)."""
+        with self.lock:
+            if summary:
+                self.summary = summary
+                # New turns are only ever appended, so the folded ones are still at the front
+                del self.turns[:folded]
+            self.summarizing = False
+
+
+class SessionStore:
+    """LRU of tutor sessions with an idle TTL."""
+
+    def __init__(self, ttl: int = SESSION_TTL, max_sessions: int = MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, TutorSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, course_id: str, unit_number: int,
+            question_index: int, question_type: str) -> Optional[TutorSession]:
+        """Return the live session for this question, or None if unknown, expired or for another question."""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if now - session.last_used > self.ttl:
+                del self._sessions[session_id]
+                return None
+            if session.key != (course_id, unit_number, question_index, question_type):
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def create(self, course_id: str, unit_number: int, question_index: int,
+               question_type: str, history: Optional[List[dict]] = None) -> TutorSession:
+        session = TutorSession(uuid.uuid4().hex, course_id, unit_number, question_index, question_type, history)
+        with self._lock:
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+sessions = SessionStore()
@@ -0,0 +1,101 @@
+"""
+Course-material uploads.
+
+Starlette spools multipart file parts to a temporary file (kept in memory only
+up to 1 MB), so nothing here reads an upload into memory in one piece:
+text-like files are decoded locally in chunks and inlined into the prompt,
+everything else is streamed to the Gemini Files API and referenced by URI.
+"""
+import codecs
+import logging
+import os
+import time
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+# ~100k tokens of extracted text; the rest of a huge text file is dropped
+MAX_MATERIALS_CHARS = int(os.getenv("MAX_MATERIALS_CHARS", "400000"))
+CHUNK_SIZE = 1024 * 1024
+# How long to wait for the Files API to finish processing an upload
+FILE_ACTIVE_TIMEOUT = 60.0
+
+TEXT_MIME_TYPES = {"application/json", "application/xml", "application/x-yaml", "application/x-ndjson"}
+TEXT_EXTENSIONS = (".txt", ".md", ".markdown", ".csv", ".tsv", ".json", ".xml", ".yaml", ".yml", ".html", ".htm")
+
+
+def is_text_upload(file: UploadFile) -> bool:
+    mime_type = (file.content_type or "").split(";")[0].strip().lower()
+    if mime_type.startswith("text/") or mime_type in TEXT_MIME_TYPES:
+        return True
+    return (file.filename or "").lower().endswith(TEXT_EXTENSIONS)
+
+
+def upload_size(file: UploadFile) -> int:
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+
+def check_upload_size(file: UploadFile, max_bytes: Optional[int] = None) -> int:
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    size = upload_size(file)
+    if size > max_bytes:
+        raise HTTPException(status_code=413,
+                            detail=f"File is {size / 1e6:.1f} MB; the limit is {max_bytes / 1e6:.0f} MB")
+    return size
+
+
+async def read_text_upload(file: UploadFile, max_chars: Optional[int] = None) -> str:
+    """Decode a text-like upload chunk by chunk, stopping at `max_chars`."""
+    max_chars = max_chars or MAX_MATERIALS_CHARS
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts = []
+    total = 0
+    await file.seek(0)
+    # One character past the cap tells a truncated file from one exactly max_chars long
+    while total <= max_chars:
+        chunk = await file.read(CHUNK_SIZE)
+        text = decoder.decode(chunk, final=not chunk)
+        parts.append(text[:max_chars + 1 - total])
+        total += len(parts[-1])
+        if not chunk:
+            return "".join(parts)
+    logger.info(f"Truncated {file.filename} to {max_chars} characters")
+    return "".join(parts)[:max_chars] + "\n[... remainder of the file omitted ...]"
+
+
+def upload_to_gemini(client, file: UploadFile):
+    """Stream the spooled upload to the Files API and wait until it can be referenced."""
+    file.file.seek(0)
+    uploaded = client.files.upload(
+        file=file.file,
+        config={"mime_type": file.content_type, "display_name": file.filename or "course-material"}
+    )
+    deadline = time.monotonic() + FILE_ACTIVE_TIMEOUT
+    while getattr(getattr(uploaded, "state", None), "name", None) == "PROCESSING":
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Gemini is still processing {uploaded.name}")
+        time.sleep(1)
+        uploaded = client.files.get(name=uploaded.name)
+    return uploaded
+
+
+def delete_from_gemini(client, uploaded) -> None:
+    """Best-effort cleanup; the Files API also expires uploads after 48 hours."""
+    try:
+        client.files.delete(name=uploaded.name)
+    except Exception as e:
+        logger.warning(f"Failed to delete uploaded file {getattr(uploaded, 'name', '')}: {e}")
+
+
+def max_request_bytes() -> Optional[int]:
+    """Largest multipart body accepted: the file cap plus room for the form fields."""
+    return MAX_UPLOAD_BYTES + 2 * 1024 * 1024 if MAX_UPLOAD_BYTES else None
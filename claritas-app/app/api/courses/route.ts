@@ -20,7 +20,9 @@ export async function GET(req: NextRequest) {
       return NextResponse.json({ error: 'Not authenticated' }, { status: 401 });
     }
 
-    const response = await fetch(`${BACKEND_URL}/user/${data.user.id}/courses`);
+    const response = await fetch(`${BACKEND_URL}/user/${data.user.id}/courses`, {
+      headers: { Authorization: `Bearer ${cookie}` },
+    });
     const result = await response.json();
     return NextResponse.json(result, { status: response.status });
   } catch (err) {
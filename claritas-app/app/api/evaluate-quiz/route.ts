@@ -23,7 +23,7 @@ export async function POST(req: NextRequest) {
     const body = await req.json();
     const response = await fetch(`${BACKEND_URL}/evaluate_module_quiz`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${cookie}` },
       body: JSON.stringify({
         ...body,
         auth_id: data.user.id,
@@ -23,7 +23,7 @@ export async function POST(req: NextRequest) {
     const body = await req.json();
     const response = await fetch(`${BACKEND_URL}/update_progress`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${cookie}` },
       body: JSON.stringify({
         auth_id: data.user.id,
         course_id: body.course_id,
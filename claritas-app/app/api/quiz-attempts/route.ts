@@ -30,7 +30,7 @@ export async function GET(req: NextRequest) {
 
     const response = await fetch(
       `${BACKEND_URL}/quiz_attempts/${courseId}/${unitNumber}?auth_id=${data.user.id}`,
-      { method: 'GET' }
+      { method: 'GET', headers: { Authorization: `Bearer ${cookie}` } }
     );
 
     const result = await response.json();
@@ -29,7 +29,7 @@ export async function GET(req: NextRequest) {
 
     const response = await fetch(
       `${BACKEND_URL}/module_quiz_status/${courseId}?auth_id=${data.user.id}`,
-      { method: 'GET' }
+      { method: 'GET', headers: { Authorization: `Bearer ${cookie}` } }
     );
 
     const result = await response.json();
@@ -42,6 +42,8 @@ interface ModuleQuiz {
     title: string;
     multipleChoice: MCQQuestion[];
     freeResponse: FRQQuestion[];
+    // Sent back when grading, so a retake is graded against itself
+    quizVersion?: string;
 }
 
 interface MCQResult {
@@ -144,7 +146,8 @@ function QuizPageContent() {
                     courseId,
                     unitNumber: parseInt(unitNumber),
                     mcqAnswers: mcqArr,
-                    frqAnswers: frqArr
+                    frqAnswers: frqArr,
+                    quizVersion: quiz.quizVersion
                 })
             });
             if (!res.ok) throw new Error(await res.text() || 'Failed to evaluate quiz');
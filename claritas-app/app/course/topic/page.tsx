@@ -48,8 +48,19 @@ interface TopicContent {
     sections: TopicSection[];
     quiz: QuizQuestion[];
     searchAttribution?: string;
+    // "partial" while the rest of the lesson is still being written
+    status?: 'partial' | 'complete';
+    pendingSections?: string[];
+    // Set by /topic_status when the background job stopped; POST /generate_topic restarts it
+    stalled?: boolean;
 }
 
+// How often, and for how long, to check on a partial lesson; the interval grows
+// towards the maximum while it stays partial or the server is rate limiting
+const POLL_INTERVAL_MS = 3000;
+const MAX_POLL_INTERVAL_MS = 15000;
+const MAX_POLLS = 60;
+
 function getYouTubeId(url: string): string | null {
     const match = url.match(/(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([a-zA-Z0-9_-]{11})/);
     return match ? match[1] : null;
@@ -151,35 +162,73 @@ function TopicPageContent() {
     useEffect(() => {
         if (!courseId || !unitNumber || !subtopicIndex) return;
 
-        const fetchContent = async () => {
+        let cancelled = false;
+        let pollTimer: ReturnType<typeof setTimeout> | undefined;
+        let polls = 0;
+        let delay = POLL_INTERVAL_MS;
+
+        const later = (next: () => void, ms: number) => {
+            polls += 1;
+            pollTimer = setTimeout(next, ms);
+        };
+
+        // Only POST /generate_topic (rate limited and charged as LLM work) starts or restarts a
+        // lesson; reading a stored one and polling a partial one go to the cheap status route.
+        const generate = () => fetch(`${API_BASE_URL}/generate_topic`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                courseId,
+                unitNumber: parseInt(unitNumber),
+                subtopicIndex: parseInt(subtopicIndex)
+            })
+        });
+        const status = () => fetch(`${API_BASE_URL}/topic_status/${courseId}/${unitNumber}/${subtopicIndex}`);
+
+        const fetchContent = async (start: boolean) => {
             try {
-                // Using localhost explicitly as per main.py default
-                const res = await fetch(`${API_BASE_URL}/generate_topic`, {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({
-                        courseId,
-                        unitNumber: parseInt(unitNumber),
-                        subtopicIndex: parseInt(subtopicIndex)
-                    })
-                });
+                let res = await (start ? generate() : status());
+                if (!start && res.status === 404) res = await generate();
+                if (cancelled) return;
+
+                // Rate limited: wait and try again rather than failing the page
+                if (res.status === 429 && polls < MAX_POLLS) {
+                    const retryAfter = Number(res.headers.get('Retry-After')) * 1000;
+                    later(() => fetchContent(start), retryAfter > 0 ? retryAfter : delay);
+                    delay = Math.min(delay * 2, MAX_POLL_INTERVAL_MS);
+                    return;
+                }
 
                 if (!res.ok) {
                     const errorText = await res.text();
                     throw new Error(errorText || 'Failed to generate content');
                 }
 
-                const data = await res.json();
+                const data: TopicContent = await res.json();
+                if (cancelled) return;
                 setContent(data);
+                setLoading(false);
+
+                // The first section arrives before the rest; keep checking until the lesson is complete
+                if (data.status === 'partial' && polls < MAX_POLLS) {
+                    later(() => fetchContent(data.stalled === true), delay);
+                    delay = Math.min(delay * 1.5, MAX_POLL_INTERVAL_MS);
+                }
             } catch (err) {
                 console.error("Fetch error:", err);
-                setError(err instanceof Error ? err.message : 'An error occurred');
-            } finally {
-                setLoading(false);
+                if (!cancelled) {
+                    setError(err instanceof Error ? err.message : 'An error occurred');
+                    setLoading(false);
+                }
             }
         };
 
-        fetchContent();
+        fetchContent(false);
+
+        return () => {
+            cancelled = true;
+            clearTimeout(pollTimer);
+        };
     }, [courseId, unitNumber, subtopicIndex]);
 
     const handleOptionSelect = (qIndex: number, oIndex: number) => {
@@ -273,6 +322,17 @@ function TopicPageContent() {
                             )}
                         </div>
                     ))}
+
+                    {content?.status === 'partial' && content.pendingSections?.map((heading, idx) => (
+                        <div key={`pending-${idx}`} className="mb-10 last:mb-0">
+                            <h2 className="text-xl font-bold text-gray-800 mb-4">{heading}</h2>
+                            <div className="animate-pulse space-y-3">
+                                <div className="h-4 bg-gray-200 rounded w-full"></div>
+                                <div className="h-4 bg-gray-200 rounded w-full"></div>
+                                <div className="h-4 bg-gray-200 rounded w-2/3"></div>
+                            </div>
+                        </div>
+                    ))}
                 </div>
 
                 {/* Quiz Section */}
@@ -286,6 +346,10 @@ function TopicPageContent() {
                         <h2 className="text-2xl font-bold text-gray-900">Knowledge Check</h2>
                     </div>
 
+                    {content?.status === 'partial' && content.quiz.length === 0 && (
+                        <p className="text-gray-500 animate-pulse">Preparing questions...</p>
+                    )}
+
                     <div className="space-y-8">
                         {content?.quiz.map((q, qIdx) => (
                             <div key={qIdx} className="bg-gray-50 rounded-xl p-6">
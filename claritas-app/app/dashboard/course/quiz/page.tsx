@@ -43,6 +43,8 @@ interface ModuleQuiz {
     title: string;
     multipleChoice: MCQQuestion[];
     freeResponse: FRQQuestion[];
+    // Sent back when grading, so a retake is graded against itself
+    quizVersion?: string;
 }
 
 interface MCQResult {
@@ -169,7 +171,7 @@ function QuizPageContent() {
             // Try authenticated route first, fall back to direct backend
             let data;
             try {
-                data = await evaluateModuleQuizAuth(courseId, parseInt(unitNumber), mcqArr, frqArr);
+                data = await evaluateModuleQuizAuth(courseId, parseInt(unitNumber), mcqArr, frqArr, quiz.quizVersion);
             } catch {
                 // Fallback to direct backend (no result storage)
                 const res = await fetch(`${API_BASE_URL}/evaluate_module_quiz`, {
@@ -179,7 +181,8 @@ function QuizPageContent() {
                         courseId,
                         unitNumber: parseInt(unitNumber),
                         mcqAnswers: mcqArr,
-                        frqAnswers: frqArr
+                        frqAnswers: frqArr,
+                        quizVersion: quiz.quizVersion
                     })
                 });
                 if (!res.ok) throw new Error(await res.text() || 'Failed to evaluate quiz');
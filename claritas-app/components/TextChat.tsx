@@ -20,6 +20,7 @@ export default function TextChat({ courseId, unitNumber, questionIndex, question
     const [messages, setMessages] = useState<Message[]>([]);
     const [input, setInput] = useState('');
     const [loading, setLoading] = useState(false);
+    const [sessionId, setSessionId] = useState<string | null>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
 
     useEffect(() => {
@@ -35,22 +36,29 @@ export default function TextChat({ courseId, unitNumber, questionIndex, question
         setInput('');
         setLoading(true);
 
+        // The server keeps the conversation, so only the new message is sent while
+        // the session is alive; the local history re-seeds it if the session expired.
+        const send = (session: string | null) => fetch(`${API_BASE_URL}/quiz_help/text`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                courseId,
+                unitNumber,
+                questionIndex,
+                questionType,
+                ...(session ? { sessionId: session } : { conversationHistory: messages }),
+                studentMessage: trimmed
+            })
+        });
+
         try {
-            const res = await fetch(`${API_BASE_URL}/quiz_help/text`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    courseId,
-                    unitNumber,
-                    questionIndex,
-                    questionType,
-                    conversationHistory: messages,
-                    studentMessage: trimmed
-                })
-            });
+            let res = await send(sessionId);
+            // Only an expired session (410) is fixed by re-seeding; a 404 means the quiz is gone
+            if (res.status === 410 && sessionId) res = await send(null);
 
             if (!res.ok) throw new Error('Failed to get help');
             const data = await res.json();
+            if (data.sessionId) setSessionId(data.sessionId);
             setMessages(prev => [...prev, { role: "model", text: data.response }]);
         } catch {
             setMessages(prev => [...prev, { role: "model", text: "Sorry, I couldn't connect. Please try again." }]);
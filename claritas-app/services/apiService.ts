@@ -210,9 +210,10 @@ export const sendQuizHelpMessage = async (
     questionIndex: number,
     questionType: string,
     conversationHistory: { role: string; text: string }[],
-    studentMessage: string
-): Promise<{ response: string }> => {
-    const response = await fetch(`${API_BASE_URL}/quiz_help/text`, {
+    studentMessage: string,
+    sessionId?: string
+): Promise<{ response: string; sessionId: string }> => {
+    const send = (session?: string) => fetch(`${API_BASE_URL}/quiz_help/text`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -220,10 +221,13 @@ export const sendQuizHelpMessage = async (
             unitNumber,
             questionIndex,
             questionType,
-            conversationHistory,
+            ...(session ? { sessionId: session } : { conversationHistory }),
             studentMessage
         }),
     });
+    let response = await send(sessionId);
+    // 410 means the server-side session expired; re-seed it from the local history
+    if (response.status === 410 && sessionId) response = await send();
     if (!response.ok) {
         throw new Error(`Backend error: ${response.statusText}`);
     }
@@ -233,12 +237,13 @@ export const evaluateModuleQuiz = async (
     courseId: string,
     unitNumber: number,
     mcqAnswers: number[],
-    frqAnswers: string[]
+    frqAnswers: string[],
+    quizVersion?: string
 ): Promise<any> => {
     const response = await fetch(`${API_BASE_URL}/evaluate_module_quiz`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ courseId, unitNumber, mcqAnswers, frqAnswers }),
+        body: JSON.stringify({ courseId, unitNumber, mcqAnswers, frqAnswers, quizVersion }),
     });
     if (!response.ok) {
         throw new Error(`Backend error: ${response.statusText}`);
@@ -250,13 +255,14 @@ export const evaluateModuleQuizAuth = async (
     courseId: string,
     unitNumber: number,
     mcqAnswers: number[],
-    frqAnswers: string[]
+    frqAnswers: string[],
+    quizVersion?: string
 ): Promise<any> => {
     const response = await fetch('/api/evaluate-quiz', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         credentials: 'include',
-        body: JSON.stringify({ courseId, unitNumber, mcqAnswers, frqAnswers }),
+        body: JSON.stringify({ courseId, unitNumber, mcqAnswers, frqAnswers, quizVersion }),
     });
     if (!response.ok) {
         throw new Error(`Server responded with ${response.status}`);